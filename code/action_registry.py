@@ -0,0 +1,153 @@
+import json, os, warnings
+from importlib import metadata
+from player_action import PlayerAction
+
+# Actions shipped with the game and the default loadout
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "actions.json")
+
+# Installed packages can add patterns with entry points in this group:
+# the entry point's name is the action name, its value the automaton class ("module:ClassName")
+ENTRY_POINT_GROUP = "cell_wars.actions"
+
+# Replays store the action name with a one byte length
+MAX_NAME_BYTES = 255
+
+
+class ActionRegistry:
+    """
+    All actions that can be given to players, looked up by name.
+
+    Actions are registered with the location of their automaton ("module:ClassName")
+    instead of the class itself, so reading the registry imports no pattern module.
+    A module is only imported when an action of it is actually used
+    (see PlayerAction.automaton_class), so unused patterns cost no startup time or memory.
+    """
+
+    def __init__(self):
+        self.definitions = {} # Action name -> settings for PlayerAction
+        self.loadout = [] # Names of the actions every player gets
+
+    def register(self, name, description, automaton=None, generations=None, overwrite_neutral=None,
+                 overwrite_enemy=None, cost=1, rule=None):
+        """
+        Add an action or replace the action with the same name.
+
+        Args:
+            automaton: Automaton class or its location as "module:ClassName"
+                       (not needed for rule based actions, they use a RuleAutomaton)
+            rule: Declarative rule (see rule_automaton). Its generations and overwrite
+                  settings are used for the settings that aren't given here.
+            Other arguments as in PlayerAction (None = PlayerAction's default)
+        """
+        if rule is not None:
+            automaton = automaton or "rule_automaton:RuleAutomaton"
+            generations = rule.get("generations") if generations is None else generations
+            overwrite_neutral = rule.get("overwrite_neutral") if overwrite_neutral is None else overwrite_neutral
+            overwrite_enemy = rule.get("overwrite_enemy") if overwrite_enemy is None else overwrite_enemy
+
+        if automaton is None:
+            raise ValueError(f"Action {name} needs an automaton or a rule")
+        if len(name.encode("utf-8")) > MAX_NAME_BYTES:
+            raise ValueError(f"Action name {name[:20]}... is longer than {MAX_NAME_BYTES} bytes")
+
+        definition = {
+            "name": name,
+            "description": description,
+            "automaton_class": automaton,
+            "generations": generations,
+            "overwrite_neutral": overwrite_neutral,
+            "overwrite_enemy": overwrite_enemy,
+            "cost": cost,
+            "rule": rule
+        }
+        # Leave out unset settings, so PlayerAction's defaults apply
+        self.definitions[name] = {key: value for key, value in definition.items() if value is not None}
+
+    def configure(self, name, **settings):
+        """
+        Change settings of a registered action (e.g. generations=10), keeping the others.
+        Raises KeyError if no action with this name is registered.
+        """
+        if name not in self.definitions:
+            raise KeyError(f"Unknown action {name}")
+        self.definitions[name].update(settings)
+
+    def load_config(self, path=CONFIG_FILE):
+        """
+        Register the actions of a JSON config file and take over its loadout.
+        The file holds an "actions" list (one object per action with the arguments of
+        register()) and optionally a "loadout" list of action names.
+        """
+        with open(path, "r", encoding="utf-8") as file:
+            config = json.load(file)
+
+        for definition in config.get("actions", []):
+            self.register(**definition)
+
+        if "loadout" in config:
+            self.loadout = list(config["loadout"])
+
+    def load_entry_points(self, group=ENTRY_POINT_GROUP):
+        """
+        Register the patterns that installed packages announce as entry points.
+        Only the entry point's name and value are read, nothing is imported.
+        """
+        entry_points = metadata.entry_points()
+        if hasattr(entry_points, "select"):
+            entry_points = entry_points.select(group=group)
+        else:
+            # Python < 3.10 returns a dictionary of groups
+            entry_points = entry_points.get(group, [])
+
+        for entry_point in entry_points:
+            # Keep the settings of actions that are also described in the config file
+            if entry_point.name not in self.definitions:
+                try:
+                    self.register(entry_point.name, entry_point.name, entry_point.value)
+                except ValueError as error:
+                    # A broken plugin shouldn't keep the game from starting
+                    warnings.warn(f"Skipping action of entry point {entry_point.value}: {error}")
+
+    def get_names(self):
+        """
+        Get the names of all registered actions.
+        """
+        return list(self.definitions)
+
+    def create_action(self, name):
+        """
+        Create a PlayerAction for a registered action.
+        Raises KeyError if no action with this name is registered.
+        """
+        return PlayerAction(**self.definitions[name])
+
+    def create_loadout(self, names=None):
+        """
+        Create the actions for one player (the registry's loadout if no names are given).
+        """
+        return [self.create_action(name) for name in (names or self.loadout)]
+
+
+def create_default_registry():
+    """
+    Create a registry with the actions of the game's config file and all installed plugins.
+    """
+    registry = ActionRegistry()
+    registry.load_config()
+    registry.load_entry_points()
+    return registry
+
+
+# Registry used by the game, see get_registry()
+default_registry = None
+
+
+def get_registry():
+    """
+    Get the registry used by the game. It is created on first use, so importing this
+    module doesn't read the config file or look through the installed packages.
+    """
+    global default_registry
+    if default_registry is None:
+        default_registry = create_default_registry()
+    return default_registry
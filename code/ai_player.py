@@ -0,0 +1,355 @@
+import ctypes, multiprocessing, os, random, threading, time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from cellular_automaton import count_conquered_cells
+from automaton_cache import shared_cache
+from grid import Grid
+
+# Board shared with the worker processes of an AIPlayer's process pool (see init_pool_worker())
+pool_board = None
+pool_board_size = None
+pool_grid = None # The worker's grid, loaded from pool_board once per move
+pool_grid_move = None
+
+
+def simulate_move(grid, action, player_id, x, y, seed=None, cache=shared_cache):
+    """
+    Simulate a single move on the grid without modifying it.
+    Returns the score of the outcome: every cell won counts once and
+    every cell taken from the enemy counts a second time (the enemy loses it).
+
+    Seeded and deterministic runs are looked up in the cache first.
+    Pass cache=None to always simulate.
+    """
+    automaton = action.create_automaton(grid, player_id, seed=seed)
+    if cache is not None:
+        changes = cache.run(automaton, x, y)
+    else:
+        changes = automaton.set_starting_cell(x, y) + automaton.run()
+
+    return score_changes(grid, changes, player_id)
+
+
+def score_changes(grid, changes, player_id):
+    """
+    Score a list of changes for the given player (see simulate_move).
+    """
+    conquered = count_conquered_cells(grid, changes, player_id)
+
+    taken_from_enemy = set()
+    for x, y, _ in changes:
+        cell_state = grid.get_cell(x, y)
+        if cell_state != grid.NEUTRAL and cell_state != player_id:
+            taken_from_enemy.add((x, y))
+
+    return conquered + len(taken_from_enemy)
+
+
+def simulate_candidate(grid, action, player_id, x, y, samples, first_seed=0):
+    """
+    Run several simulations of one candidate move at once with the batched engine
+    (see CellularAutomaton.run_batch), seeded from first_seed.
+    Returns the total score (see simulate_move) and the number of simulations run.
+    """
+    automaton = action.create_automaton(grid, player_id)
+    results = automaton.run_batch(x, y, samples, seed=first_seed)
+
+    return int(results["conquered"].sum() + results["captured"].sum()), samples
+
+
+def init_pool_worker(board, width, height):
+    """
+    Initializer of the AI's worker processes: remember the shared board buffer.
+    """
+    global pool_board, pool_board_size
+    pool_board = board
+    pool_board_size = (width, height)
+
+
+def simulate_pool_task(move, action, player_id, x, y, samples, first_seed):
+    """
+    Worker process task: simulate_candidate() on the shared board. The board is only read from
+    the shared buffer by the first task of a move (numbered by the AI), not sent with every task.
+    """
+    global pool_grid, pool_grid_move
+    if move != pool_grid_move:
+        pool_grid = Grid(*pool_board_size, 1)
+        pool_grid.load_bytes(bytes(pool_board))
+        pool_grid_move = move
+
+    return simulate_candidate(pool_grid, action, player_id, x, y, samples, first_seed)
+
+
+class AIPlayer:
+    """
+    A computer opponent that chooses its moves with Monte Carlo simulation.
+
+    For every move it samples candidate start cells for each of the player's actions,
+    runs the automaton many times per candidate (Snake and Root Growth are random)
+    and picks the candidate with the best average score before the time budget runs out.
+
+    The n-th simulation of every candidate uses seed n. Comparing candidates with the
+    same random numbers reduces noise. Random patterns are simulated in batches with the
+    vectorized batch engine, deterministic ones once through the cache shared with the heatmap worker.
+    """
+
+    def __init__(self, player, time_budget=0.5, candidate_count=24, batch_size=16, use_process_pool=False, workers=None, seed=None):
+        """
+        Initialize the AI player.
+
+        Args:
+            player: The Player this AI controls
+            time_budget: Seconds the AI may think about a move
+            candidate_count: Number of start cells sampled per action
+            batch_size: Number of simulations run at once per candidate
+            use_process_pool: Whether to spread the candidates over several processes
+            workers: Number of worker processes (None = number of CPUs)
+            seed: Seed for the AI's random decisions (None = unpredictable)
+        """
+        self.player = player
+        self.time_budget = time_budget
+        self.candidate_count = candidate_count
+        self.batch_size = batch_size
+        self.use_process_pool = use_process_pool
+        self.workers = workers
+        self.random = random.Random(seed)
+
+        # Process pool is only started when it is needed for the first time, with a
+        # buffer the board is copied to once per move (see prepare_pool())
+        self.process_pool = None
+        self.pool_board = None
+        self.pool_move = 0
+
+        # Background thinking state
+        self.thinking_thread = None
+        self.chosen_move = None
+
+    def sample_candidates(self, grid, pocket_cells=None):
+        """
+        Pick the start cells worth simulating.
+        Half of the candidates are next to cells the AI already owns (growing from
+        existing territory wastes fewer cells), the rest are spread randomly over the board.
+        Cells of enclosed neutral pockets (see TerritoryAnalyzer) are added as well:
+        filling own pockets is safe, and claiming cells in enemy pockets breaks them open.
+        """
+        # Cells next to the AI's territory, found through the grid's frontier index
+        border_cells = []
+        for x, y in grid.get_frontier(self.player.player_id):
+            for dx, dy in ((0, -1), (1, 0), (0, 1), (-1, 0)):
+                if grid.get_cell(x + dx, y + dy) not in (None, self.player.player_id):
+                    border_cells.append((x + dx, y + dy))
+
+        candidates = set()
+        if pocket_cells:
+            candidates.update(self.random.sample(pocket_cells, min(len(pocket_cells), self.candidate_count // 4)))
+        if border_cells:
+            candidates.update(self.random.sample(border_cells, min(len(border_cells), self.candidate_count // 2)))
+
+        # Fill up with random cells
+        attempts = 0
+        board_size = grid.width * grid.height
+        while len(candidates) < min(self.candidate_count, board_size) and attempts < self.candidate_count * 10:
+            candidates.add((self.random.randrange(grid.width), self.random.randrange(grid.height)))
+            attempts += 1
+
+        return list(candidates)
+
+    def choose_move(self, grid, deadline=None, pocket_cells=None):
+        """
+        Choose the best move for the current board.
+        Returns a tuple (action, x, y) or None if the player has no actions.
+        pocket_cells are extra candidate cells from enclosed pockets.
+
+        Simulations are spread round robin over all candidates, so every candidate
+        gets a fair number of samples no matter when the deadline hits.
+        """
+        # Starting the pool and sharing the board don't count against the time budget
+        if self.use_process_pool:
+            self.prepare_pool(grid)
+
+        if deadline is None:
+            deadline = time.perf_counter() + self.time_budget
+
+        candidates = []
+        for action in self.player.actions:
+            for x, y in self.sample_candidates(grid, pocket_cells):
+                candidates.append((action, x, y))
+
+        if not candidates:
+            return None
+
+        # Total score and number of simulations per candidate
+        results = {candidate: [0, 0] for candidate in candidates}
+
+        if self.use_process_pool:
+            self.simulate_in_pool(grid, candidates, results, deadline)
+        else:
+            self.simulate_round_robin(grid, candidates, results, deadline)
+
+        # Pick the candidate with the best average score
+        best_move = None
+        best_score = -1
+        for candidate, (total_score, simulations) in results.items():
+            if simulations == 0:
+                continue
+            average_score = total_score / simulations
+            if average_score > best_score:
+                best_score = average_score
+                best_move = candidate
+
+        # Deadline hit before a single simulation finished: fall back to any candidate
+        if best_move is None:
+            best_move = self.random.choice(candidates)
+
+        return best_move
+
+    def simulate_round_robin(self, grid, candidates, results, deadline):
+        """
+        Simulate the candidates in this process until the deadline is reached.
+        """
+        while time.perf_counter() < deadline:
+            simulated_any = False
+
+            for candidate in candidates:
+                if time.perf_counter() >= deadline:
+                    return
+
+                action, x, y = candidate
+
+                if action.automaton_class.deterministic:
+                    # Deterministic patterns always give the same result, once is enough
+                    if results[candidate][1] > 0:
+                        continue
+                    score, simulations = simulate_move(grid, action, self.player.player_id, x, y), 1
+                else:
+                    # Continue the seeds where the last batch of this candidate ended
+                    score, simulations = simulate_candidate(grid, action, self.player.player_id, x, y,
+                                                            self.batch_size, first_seed=results[candidate][1])
+
+                results[candidate][0] += score
+                results[candidate][1] += simulations
+                simulated_any = True
+
+            # Only deterministic candidates left and they are all done
+            if not simulated_any:
+                return
+
+    def prepare_pool(self, grid):
+        """
+        Start the process pool if needed and copy the board to the buffer shared with its workers.
+        The pool is started again if the board size changed.
+        """
+        size = grid.width * grid.height
+        if self.process_pool is not None and len(self.pool_board) != size:
+            self.close()
+
+        if self.process_pool is None:
+            workers = self.workers or os.cpu_count() or 1
+            self.pool_board = multiprocessing.RawArray(ctypes.c_uint8, size)
+            self.process_pool = ProcessPoolExecutor(max_workers=workers, initializer=init_pool_worker,
+                                                    initargs=(self.pool_board, grid.width, grid.height))
+            # Wait for the worker processes, so the first move doesn't pay for starting them
+            wait([self.process_pool.submit(int) for _ in range(workers)])
+
+        memoryview(self.pool_board).cast("B")[:] = grid.to_bytes()
+        self.pool_move += 1
+
+    def simulate_in_pool(self, grid, candidates, results, deadline):
+        """
+        Simulate the candidates in the process pool (see prepare_pool()) until the deadline.
+        Like simulate_round_robin(), each task is one batch of simulations of one candidate and
+        the candidates take turns. Only a few tasks are queued at a time, so little work is
+        left running after the deadline: results arriving late are ignored.
+        """
+        max_queued = 2 * (self.workers or os.cpu_count() or 1)
+
+        def next_tasks():
+            next_seed = {candidate: 0 for candidate in candidates}
+            while True:
+                submitted_any = False
+                for candidate in candidates:
+                    action = candidate[0]
+                    if action.automaton_class.deterministic:
+                        # Deterministic patterns always give the same result, once is enough
+                        if next_seed[candidate] > 0:
+                            continue
+                        samples = 1
+                    else:
+                        samples = self.batch_size
+
+                    yield candidate, samples, next_seed[candidate]
+                    next_seed[candidate] += samples
+                    submitted_any = True
+
+                if not submitted_any:
+                    return
+
+        tasks = next_tasks()
+        futures = {}
+        while time.perf_counter() < deadline:
+            while len(futures) < max_queued:
+                task = next(tasks, None)
+                if task is None:
+                    break
+                (action, x, y), samples, first_seed = task
+                future = self.process_pool.submit(simulate_pool_task, self.pool_move, action, self.player.player_id,
+                                                  x, y, samples, first_seed)
+                futures[future] = task[0]
+
+            if not futures:
+                return
+
+            done, _ = wait(futures, timeout=max(0, deadline - time.perf_counter()), return_when=FIRST_COMPLETED)
+            for future in done:
+                candidate = futures.pop(future)
+                if future.exception() is None:
+                    total_score, simulations = future.result()
+                    results[candidate][0] += total_score
+                    results[candidate][1] += simulations
+
+        # Queued tasks are dropped, running ones finish on their own
+        for future in futures:
+            future.cancel()
+
+    def start_thinking(self, grid, territory=None):
+        """
+        Start choosing a move in a background thread, so the game window stays responsive.
+        Works on a copy of the grid, the real board can keep animating.
+        The pockets of the TerritoryAnalyzer (if given) are collected here, before the thread starts.
+        """
+        if self.thinking_thread is not None:
+            return
+
+        self.chosen_move = None
+        grid_copy = grid.copy()
+
+        pocket_cells = None
+        if territory is not None:
+            pocket_cells = []
+            for player_id in territory.region_counts:
+                pocket_cells += territory.get_pocket_cells(player_id)
+
+        def think():
+            self.chosen_move = self.choose_move(grid_copy, pocket_cells=pocket_cells)
+
+        self.thinking_thread = threading.Thread(target=think, daemon=True)
+        self.thinking_thread.start()
+
+    def get_move(self):
+        """
+        Get the move chosen by the background thread.
+        Returns None while the AI is still thinking.
+        """
+        if self.thinking_thread is None or self.thinking_thread.is_alive():
+            return None
+
+        self.thinking_thread = None
+        return self.chosen_move
+
+    def close(self):
+        """
+        Shut down the process pool (if one was started).
+        """
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
+            self.process_pool = None
+            self.pool_board = None
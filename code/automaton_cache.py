@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+
+
+class AutomatonCache:
+    """
+    Least recently used cache for automaton runs.
+
+    A run only depends on the automaton's settings, the starting cell, the seed and
+    the cells it can reach. The key therefore contains the contents of the square
+    around the starting cell the pattern can reach, not the whole board, so a result
+    can be reused as long as nothing changed nearby.
+
+    Random patterns are only cached when a seed is given. Deterministic patterns
+    ignore the seed, so one result serves every seed.
+    """
+
+    def __init__(self, max_size=8192):
+        """
+        Args:
+            max_size: Maximum number of results kept before the oldest ones are evicted
+        """
+        self.max_size = max_size
+        self.results = OrderedDict()
+        self.lock = threading.Lock() # The heatmap worker and the AI use the cache from different threads
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, automaton, x, y):
+        """
+        Build the cache key of a run or return None if the run can't be cached.
+        """
+        seed = automaton.seed
+        if automaton.deterministic:
+            seed = None
+        elif seed is None:
+            # Unseeded random runs are different every time
+            return None
+
+        reach = automaton.reach()
+        region = automaton.grid.get_region(x - reach, y - reach, x + reach + 1, y + reach + 1)
+
+        return (type(automaton), automaton.get_parameters(), automaton.player_id, x, y, region, seed)
+
+    def run(self, automaton, x, y):
+        """
+        Set the starting cell and run the automaton, or reuse the result of an identical earlier run.
+        Returns all changes including the starting cell, like set_starting_cell() + run().
+        """
+        key = self.make_key(automaton, x, y)
+
+        if key is not None:
+            with self.lock:
+                changes = self.results.get(key)
+                if changes is not None:
+                    self.results.move_to_end(key)
+                    self.hits += 1
+                    # Copy, so callers can't modify the cached result
+                    return [list(change) for change in changes]
+                self.misses += 1
+
+        changes = automaton.set_starting_cell(x, y) + automaton.run()
+
+        if key is not None:
+            with self.lock:
+                self.results[key] = tuple(tuple(change) for change in changes)
+                if len(self.results) > self.max_size:
+                    self.results.popitem(last=False)
+                    self.evictions += 1
+
+        return changes
+
+    def get_stats(self):
+        """
+        Get the cache statistics as a dictionary.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.results),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def clear(self):
+        """
+        Remove all results and reset the statistics.
+        """
+        with self.lock:
+            self.results.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+# Cache shared by the AI and the heatmap worker
+shared_cache = AutomatonCache()
@@ -0,0 +1,307 @@
+"""
+Compiled kernels for the built-in patterns (Diamond Bomb, Snake and Root Growth).
+
+The kernels walk the cells one by one like the Python automata do, which NumPy can't
+speed up, so they are only worth using when Numba is installed. The backend is detected
+at import time:
+
+    numba   - the kernels are compiled to machine code (CPU only). Compiled code is cached
+              on disk (next to this file in __pycache__), so only the very first start pays
+              for the compilation; warm_up() can do that in a background thread.
+    python  - Numba isn't installed. The automata keep using their Python/NumPy implementations.
+
+Random patterns draw from Numba's own generator, seeded per call. Seeded single runs (moves,
+replays) therefore always use the Python implementations, which give the same result on every
+machine; the kernels serve batched simulations (the AI) and deterministic patterns.
+"""
+import threading
+from importlib import util
+import numpy as np
+
+# Numba takes longer to import than the whole game engine, so it's only looked up here
+# and imported when a kernel is first used (or by warm_up())
+BACKEND = "numba" if util.find_spec("numba") is not None else "python"
+
+# Whether the automata use the kernels (can be switched off, e.g. to compare both implementations)
+enabled = BACKEND == "numba"
+
+kernel_functions = {} # Name -> Python function of every kernel
+compile_lock = threading.Lock()
+compiled = False
+
+
+def jit(function):
+    """
+    Register a kernel. With Numba, the module attribute is a stand-in that compiles all
+    kernels on its first call (see compile_kernels()), otherwise the Python function itself.
+    """
+    kernel_functions[function.__name__] = function
+    if BACKEND == "python":
+        return function
+
+    def compile_and_call(*args):
+        compile_kernels()
+        return globals()[function.__name__](*args)
+
+    compile_and_call.__name__ = function.__name__
+    compile_and_call.__doc__ = function.__doc__
+    return compile_and_call
+
+
+def compile_kernels():
+    """
+    Import Numba and replace every kernel of this module with its compiled version
+    (njit, cached on disk, releasing the GIL). The functions are compiled on their first
+    call; kernels calling each other find the compiled versions through the module's globals.
+    """
+    global compiled
+    with compile_lock:
+        if compiled or BACKEND == "python":
+            return
+
+        import numba
+        for name, function in kernel_functions.items():
+            globals()[name] = numba.njit(cache=True, nogil=True)(function)
+        compiled = True
+
+
+# Directions of the Diamond Bomb in the order of SimpleExpansion.simulate_step(): up, down, left, right
+DIAMOND_X = np.array([0, 0, -1, 1])
+DIAMOND_Y = np.array([-1, 1, 0, 0])
+
+# Directions of the snake (index = direction number, like SnakePattern.directions) and the turn table
+SNAKE_X = np.array([0, 1, 0, -1])
+SNAKE_Y = np.array([-1, 0, 1, 0])
+SNAKE_TURNS = np.array([[new_direction for new_direction in range(4) if new_direction != (direction + 2) % 4]
+                        for direction in range(4)])
+
+# The eight directions of RootGrowth.simulate_step()
+ROOT_X = np.array([0, 1, 1, 1, 0, -1, -1, -1])
+ROOT_Y = np.array([-1, -1, 0, 1, 1, 1, 0, -1])
+
+
+@jit
+def can_conquer(state, player_id, neutral, overwrite_neutral, overwrite_enemy):
+    """
+    Same rule as CellularAutomaton.can_conquer_cell() for a single cell state.
+    """
+    if state == neutral:
+        return overwrite_neutral
+    if state != player_id:
+        return overwrite_enemy
+    return False
+
+
+@jit
+def expand_diamond(board, start_x, start_y, generations, player_id, neutral, overwrite_neutral, overwrite_enemy):
+    """
+    Run the Diamond Bomb on a board window.
+    Returns the x and y arrays of the conquered cells (without the starting cell) in the order
+    of SimpleExpansion.run(), generation by generation.
+    """
+    height, width = board.shape
+    board = board.copy()
+    cells_x = np.empty(height * width, np.int64)
+    cells_y = np.empty(height * width, np.int64)
+
+    board[start_y, start_x] = player_id
+    cells_x[0] = start_x
+    cells_y[0] = start_y
+    cell_count = 1
+    frontier_start = 0
+
+    for generation in range(generations):
+        frontier_end = cell_count
+        if frontier_start == frontier_end:
+            break
+
+        for cell in range(frontier_start, frontier_end):
+            for direction in range(4):
+                x = cells_x[cell] + DIAMOND_X[direction]
+                y = cells_y[cell] + DIAMOND_Y[direction]
+                if 0 <= x < width and 0 <= y < height and can_conquer(board[y, x], player_id, neutral,
+                                                                      overwrite_neutral, overwrite_enemy):
+                    board[y, x] = player_id
+                    cells_x[cell_count] = x
+                    cells_y[cell_count] = y
+                    cell_count += 1
+
+        frontier_start = frontier_end
+
+    return cells_x[1:cell_count], cells_y[1:cell_count]
+
+
+@jit
+def walk_snakes(board, start_x, start_y, count, heads, generations, turn_chance,
+                player_id, neutral, overwrite_neutral, overwrite_enemy, seed):
+    """
+    Run count instances with heads snakes each on copies of a board window.
+    The heads of an instance move at the same time like in SnakePattern.run_snakes():
+    each head picks its cell with the rules of SnakePattern.simulate_step() on the board
+    of the last generation, and if two heads picked the same cell the first one gets it.
+    Returns x and y arrays of the cells conquered by each instance (count x moves,
+    padded with -1) and the number of moves of each instance.
+    """
+    np.random.seed(seed)
+    height, width = board.shape
+    moves_x = np.full((count, generations * heads), -1, np.int64)
+    moves_y = np.full((count, generations * heads), -1, np.int64)
+    lengths = np.zeros(count, np.int64)
+
+    position_x = np.empty(heads, np.int64)
+    position_y = np.empty(heads, np.int64)
+    direction = np.empty(heads, np.int64)
+    active = np.empty(heads, np.bool_)
+    target_x = np.empty(heads, np.int64)
+    target_y = np.empty(heads, np.int64)
+    target_direction = np.empty(heads, np.int64)
+
+    for instance in range(count):
+        work = board.copy()
+        work[start_y, start_x] = player_id
+
+        # The heads start in different directions (as long as there are enough)
+        start_directions = np.random.permutation(4)
+        for head in range(heads):
+            position_x[head] = start_x
+            position_y[head] = start_y
+            direction[head] = start_directions[head % 4]
+            active[head] = True
+
+        for generation in range(generations):
+            moving = False
+
+            # Every head picks its cell on the board of the last generation
+            for head in range(heads):
+                target_x[head] = -1
+                if not active[head]:
+                    continue
+                moving = True
+
+                # Random turn (any direction except backwards)
+                current = direction[head]
+                if np.random.random() < turn_chance:
+                    current = SNAKE_TURNS[current, np.random.randint(0, 3)]
+                direction[head] = current
+
+                # Straight ahead, or the directions that aren't backwards in a random order
+                new_direction = -1
+                x = position_x[head] + SNAKE_X[current]
+                y = position_y[head] + SNAKE_Y[current]
+                if 0 <= x < width and 0 <= y < height and can_conquer(work[y, x], player_id, neutral,
+                                                                      overwrite_neutral, overwrite_enemy):
+                    new_direction = current
+                else:
+                    order = np.random.permutation(3)
+                    for option in range(3):
+                        candidate = SNAKE_TURNS[current, order[option]]
+                        x = position_x[head] + SNAKE_X[candidate]
+                        y = position_y[head] + SNAKE_Y[candidate]
+                        if 0 <= x < width and 0 <= y < height and can_conquer(work[y, x], player_id, neutral,
+                                                                              overwrite_neutral, overwrite_enemy):
+                            new_direction = candidate
+                            break
+
+                if new_direction < 0:
+                    # Stuck for good
+                    active[head] = False
+                    continue
+
+                target_x[head] = x
+                target_y[head] = y
+                target_direction[head] = new_direction
+
+            if not moving:
+                break
+
+            # Then they move together: if two heads picked the same cell, the first one gets it
+            # and the other one waits for the next generation
+            for head in range(heads):
+                x = target_x[head]
+                y = target_y[head]
+                if x < 0 or work[y, x] == player_id:
+                    continue
+
+                direction[head] = target_direction[head]
+                position_x[head] = x
+                position_y[head] = y
+                work[y, x] = player_id
+                moves_x[instance, lengths[instance]] = x
+                moves_y[instance, lengths[instance]] = y
+                lengths[instance] += 1
+
+    return moves_x, moves_y, lengths
+
+
+@jit
+def grow_roots(board, start_x, start_y, count, generations, probability_tables,
+               player_id, neutral, overwrite_neutral, overwrite_enemy, seed):
+    """
+    Run count root systems on copies of a board window with the rules of RootGrowth.simulate_step():
+    the cells of a generation one after another, each trying its eight neighbors in a random
+    order with the probabilities of probability_tables.
+    Returns the same arrays as walk_snakes().
+    """
+    np.random.seed(seed)
+    height, width = board.shape
+    moves_x = np.full((count, height * width), -1, np.int64)
+    moves_y = np.full((count, height * width), -1, np.int64)
+    lengths = np.zeros(count, np.int64)
+    growing_generations = min(generations, probability_tables.shape[0] - 1)
+
+    for instance in range(count):
+        work = board.copy()
+        work[start_y, start_x] = player_id
+
+        # The frontier is the part of the instance's moves conquered in the last generation
+        frontier_x = np.empty(1, np.int64)
+        frontier_y = np.empty(1, np.int64)
+        frontier_x[0] = start_x
+        frontier_y[0] = start_y
+
+        for generation in range(growing_generations):
+            first_new = lengths[instance]
+
+            for cell in range(frontier_x.shape[0]):
+                order = np.random.permutation(8)
+                rank = 0
+                for option in range(8):
+                    x = frontier_x[cell] + ROOT_X[order[option]]
+                    y = frontier_y[cell] + ROOT_Y[order[option]]
+                    if 0 <= x < width and 0 <= y < height and can_conquer(work[y, x], player_id, neutral,
+                                                                          overwrite_neutral, overwrite_enemy):
+                        if np.random.random() < probability_tables[generation, rank]:
+                            work[y, x] = player_id
+                            moves_x[instance, lengths[instance]] = x
+                            moves_y[instance, lengths[instance]] = y
+                            lengths[instance] += 1
+                        rank += 1
+
+            if lengths[instance] == first_new:
+                break
+            frontier_x = moves_x[instance, first_new:lengths[instance]].copy()
+            frontier_y = moves_y[instance, first_new:lengths[instance]].copy()
+
+    return moves_x, moves_y, lengths
+
+
+def make_seed(seed=None):
+    """
+    Turn a run_batch() seed (None = unpredictable) into a seed for the kernels' generator.
+    """
+    return int(np.random.default_rng(seed).integers(2 ** 31))
+
+
+def warm_up():
+    """
+    Compile (or load from the disk cache) all kernels on a tiny board, so the first real
+    call doesn't have to wait. Does nothing without Numba.
+    """
+    if BACKEND == "python":
+        return
+
+    # Same argument types as the automata use (board windows are read-only views of the grid)
+    board = np.frombuffer(bytes(9), dtype=np.uint8).reshape(3, 3)
+    expand_diamond(board, 1, 1, 1, 1, 0, True, False)
+    walk_snakes(board, 1, 1, 1, 1, 1, 0.1, 1, 0, True, True, 0)
+    grow_roots(board, 1, 1, 1, 2, np.ones((2, 8)), 1, 0, True, False, 0)
@@ -1,11 +1,16 @@
-import pygame, time
 import random
+from collections import deque
+import numpy as np
+import automaton_kernels
 
 class CellularAutomaton:
     """
     Base class for all cellular automaton patterns.
     """
-    def __init__(self, grid, player_id, generations=5, overwrite_neutral=True, overwrite_enemy=False):
+    # Set to True by patterns that always produce the same result for the same board
+    deterministic = False
+
+    def __init__(self, grid, player_id, generations=5, overwrite_neutral=True, overwrite_enemy=False, seed=None):
         """
         Initialize the cellular automaton.
 
@@ -15,6 +20,7 @@ class CellularAutomaton:
             generations: Number of evolution steps to perform
             overwrite_neutral: Whether this pattern can take over neutral cells
             overwrite_enemy: Whether this pattern can take over enemy cells
+            seed: Seed for the random number generator (None = unpredictable)
 
         Default values are defined as fallback inheritance values.
 
@@ -28,6 +34,24 @@ class CellularAutomaton:
         self.possible_cells = set()  # Cells that are currently being processed
         self.current_generation = 0
 
+        # Every automaton draws from its own random generator, so a run can be repeated with the same seed
+        self.seed = seed
+        self.random = random.Random(seed)
+
+    def get_parameters(self):
+        """
+        Get all settings that influence the outcome of a run (used as part of cache keys).
+        Subclasses with additional settings extend this tuple.
+        """
+        return (self.generations, self.overwrite_neutral, self.overwrite_enemy)
+
+    def reach(self):
+        """
+        Maximum distance (in cells, diagonals count as one) from the starting cell
+        that a run can look at or conquer. Every pattern here grows by at most one cell per generation.
+        """
+        return self.generations
+
     def set_starting_cell(self, x, y):
         """
         Set the starting cell coordinate.
@@ -75,16 +99,13 @@ class CellularAutomaton:
         Simulates and collects changes without applying them to the grid.
         """
         # Create a temporary grid for simulation
-        temp_grid = []
-        for y in range(self.grid.height):
-            row = []
-            for x in range(self.grid.width):
-                row.append(self.grid.get_cell(x, y))
-            temp_grid.append(row)
+        # Only the cells changed by the simulation are stored ({(x, y): state}), all other
+        # cells are read from the real grid, so the cost doesn't depend on the board size
+        temp_grid = {}
 
         # Set the initial cell in our temp grid
         for x, y in self.possible_cells:
-            temp_grid[y][x] = self.player_id
+            temp_grid[(x, y)] = self.player_id
 
         # Store all changes
         all_changes = []
@@ -94,7 +115,9 @@ class CellularAutomaton:
             if not (0 <= x < self.grid.width and 0 <= y < self.grid.height):
                 return False
 
-            cell_state = temp_grid[y][x]
+            cell_state = temp_grid.get((x, y))
+            if cell_state is None:
+                cell_state = self.grid.get_cell(x, y)
 
             # Neutral cell
             if cell_state == self.grid.NEUTRAL:
@@ -108,11 +131,14 @@ class CellularAutomaton:
             return False
 
         # Run for specified generations
-        for _ in range(self.generations):
+        for generation in range(self.generations):
             # If no possible cells remain, stop early
             if not self.possible_cells:
                 break
 
+            # All cells of possible_cells were conquered in the same generation
+            self.current_generation = generation
+
             # Create temp storage for this generation's changes
             next_gen_cells = set()
             generation_changes = []
@@ -132,6 +158,96 @@ class CellularAutomaton:
 
         return all_changes
 
+    def create_instance(self, seed=None):
+        """
+        Create a fresh automaton with the same settings and a different seed.
+        """
+        return type(self)(self.grid, self.player_id, self.generations,
+                          self.overwrite_neutral, self.overwrite_enemy, seed=seed)
+
+    def can_conquer_states(self, states):
+        """
+        Vectorized version of can_conquer_cell(): takes an array of cell states
+        and returns a boolean array telling which of them could be conquered.
+        """
+        neutral = states == self.grid.NEUTRAL
+        enemy = ~neutral & (states != self.player_id)
+        return (neutral & self.overwrite_neutral) | (enemy & self.overwrite_enemy)
+
+    def get_batch_window(self, x, y):
+        """
+        Get the part of the board a run starting at (x, y) can reach as a 2-D uint8 array.
+        Returns the array and the grid coordinates of its top left cell.
+        Batched runs work on this window, so their cost doesn't depend on the board size.
+        """
+        reach = self.reach()
+        x0, y0 = max(0, x - reach), max(0, y - reach)
+        x1, y1 = min(self.grid.width, x + reach + 1), min(self.grid.height, y + reach + 1)
+
+        window = np.frombuffer(self.grid.get_region(x0, y0, x1, y1), dtype=np.uint8).reshape(y1 - y0, x1 - x0)
+        return window, x0, y0
+
+    def run_batch(self, x, y, count, seed=None, collect_changes=False):
+        """
+        Run count independent instances of this automaton from the starting cell (x, y).
+
+        Instance i is seeded with seed + i (or unpredictable if seed is None).
+        This base version runs the instances one by one (deterministic patterns only
+        run once), subclasses replace it with vectorized versions.
+
+        Returns a dictionary with:
+            conquered: int array, cells won by each instance
+            captured: int array, how many of those were taken from the enemy
+            changes: list of change lists per instance (None unless collect_changes is set)
+        """
+        conquered = np.zeros(count, dtype=np.int64)
+        captured = np.zeros(count, dtype=np.int64)
+        all_changes = [] if collect_changes else None
+
+        runs = 1 if self.deterministic else count
+        for i in range(runs):
+            instance = self.create_instance(None if seed is None else seed + i)
+            changes = instance.set_starting_cell(x, y) + instance.run()
+
+            conquered[i] = count_conquered_cells(self.grid, changes, self.player_id)
+            captured[i] = len({(change_x, change_y) for change_x, change_y, _ in changes
+                               if self.grid.get_cell(change_x, change_y) not in (self.grid.NEUTRAL, self.player_id)})
+            if collect_changes:
+                all_changes.append(changes)
+
+        # Deterministic patterns: every instance has the same result
+        if runs < count:
+            conquered[runs:] = conquered[0]
+            captured[runs:] = captured[0]
+            if collect_changes:
+                all_changes += [[list(change) for change in all_changes[0]] for _ in range(count - runs)]
+
+        return {"conquered": conquered, "captured": captured, "changes": all_changes}
+
+    def make_batch_result(self, x, y, window, x0, y0, moves_x, moves_y, lengths, collect_changes=False):
+        """
+        Build the run_batch() result from the output of a compiled kernel (see automaton_kernels):
+        the window coordinates of the cells each instance conquered after the starting cell.
+        """
+        start_state = window[y - y0, x - x0]
+        enemy = (window != self.grid.NEUTRAL) & (window != self.player_id)
+
+        # Moves past an instance's length are padding
+        valid = np.arange(moves_x.shape[1]) < lengths[:, np.newaxis]
+        enemy_moves = enemy[np.clip(moves_y, 0, None), np.clip(moves_x, 0, None)] & valid
+
+        conquered = lengths + (start_state != self.player_id)
+        captured = enemy_moves.sum(axis=1) + (start_state not in (self.grid.NEUTRAL, self.player_id))
+
+        all_changes = None
+        if collect_changes:
+            all_changes = []
+            for instance_x, instance_y, length in zip(moves_x + x0, moves_y + y0, lengths.tolist()):
+                all_changes.append([[x, y, self.player_id]] + [[change_x, change_y, self.player_id] for change_x, change_y
+                                                               in zip(instance_x[:length].tolist(), instance_y[:length].tolist())])
+
+        return {"conquered": conquered.astype(np.int64), "captured": captured.astype(np.int64), "changes": all_changes}
+
 class SimpleExpansion(CellularAutomaton):
     """
     A simple cellular automaton that expands to adjacent cells.
@@ -142,6 +258,24 @@ class SimpleExpansion(CellularAutomaton):
     Subclass of CellularAutomaton.
      """
 
+    # No random decisions are made, so the outcome only depends on the board
+    deterministic = True
+
+    def run(self):
+        """
+        Use the compiled kernel if Numba is available (same result, it's deterministic),
+        otherwise the Python implementation.
+        """
+        if not automaton_kernels.enabled or len(self.possible_cells) != 1:
+            return super().run()
+
+        x, y = next(iter(self.possible_cells))
+        window, x0, y0 = self.get_batch_window(x, y)
+        cells_x, cells_y = automaton_kernels.expand_diamond(window, x - x0, y - y0, self.generations, self.player_id,
+                                                            self.grid.NEUTRAL, self.overwrite_neutral, self.overwrite_enemy)
+        self.possible_cells = set()
+        return [[cell_x, cell_y, self.player_id] for cell_x, cell_y in zip((cells_x + x0).tolist(), (cells_y + y0).tolist())]
+
     def simulate_step(self, current_x, current_y, temp_grid, can_conquer_func, next_gen_cells):
         """
         Simulate one step of the simple expansion automaton for a specific cell.
@@ -150,25 +284,25 @@ class SimpleExpansion(CellularAutomaton):
 
         # Check cell above
         if can_conquer_func(current_x, current_y - 1):
-            temp_grid[current_y - 1][current_x] = self.player_id
+            temp_grid[(current_x, current_y - 1)] = self.player_id
             next_gen_cells.add((current_x, current_y - 1))
             changes.append([current_x, current_y - 1, self.player_id])
 
         # Check cell below
         if can_conquer_func(current_x, current_y + 1):
-            temp_grid[current_y + 1][current_x] = self.player_id
+            temp_grid[(current_x, current_y + 1)] = self.player_id
             next_gen_cells.add((current_x, current_y + 1))
             changes.append([current_x, current_y + 1, self.player_id])
 
         # Check cell left
         if can_conquer_func(current_x - 1, current_y):
-            temp_grid[current_y][current_x - 1] = self.player_id
+            temp_grid[(current_x - 1, current_y)] = self.player_id
             next_gen_cells.add((current_x - 1, current_y))
             changes.append([current_x - 1, current_y, self.player_id])
 
         # Check cell right
         if can_conquer_func(current_x + 1, current_y):
-            temp_grid[current_y][current_x + 1] = self.player_id
+            temp_grid[(current_x + 1, current_y)] = self.player_id
             next_gen_cells.add((current_x + 1, current_y))
             changes.append([current_x + 1, current_y, self.player_id])
 
@@ -186,23 +320,33 @@ class SnakePattern(CellularAutomaton):
     Subclass of CellularAutomaton.
     """
 
-    def __init__(self, grid, player_id, generations=10, overwrite_neutral=True, overwrite_enemy=True):
+    # Define the four possible directions the snake can move:
+    # (0, -1) is UP: x stays the same, y decreases by 1
+    # (1, 0) is RIGHT: x increases by 1, y stays the same
+    # (0, 1) is DOWN: x stays the same, y increases by 1
+    # (-1, 0) is LEFT: x decreases by 1, y stays the same
+    # The snake's direction is stored as an index into this list (0 = up, 1 = right, ...)
+    directions = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+
+    # The directions a snake may take from each direction: every direction except going backwards
+    # (the opposite of direction d is d + 2), in the order of the directions list
+    turn_table = [[new_direction for new_direction in range(4) if new_direction != (direction + 2) % 4]
+                  for direction in range(4)]
+
+    def __init__(self, grid, player_id, generations=10, overwrite_neutral=True, overwrite_enemy=True, seed=None):
         # Call the parent class's initialization method
         # We're explicitly setting overwrite_enemy=True to allow the snake to take over enemy cells
-        super().__init__(grid, player_id, generations, overwrite_neutral, overwrite_enemy)
+        super().__init__(grid, player_id, generations, overwrite_neutral, overwrite_enemy, seed)
 
-        # Define the four possible directions the snake can move:
-        # (0, -1) is UP: x stays the same, y decreases by 1
-        # (1, 0) is RIGHT: x increases by 1, y stays the same
-        # (0, 1) is DOWN: x stays the same, y increases by 1
-        # (-1, 0) is LEFT: x decreases by 1, y stays the same
-        self.directions = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+        # How many cells of the snake's path are kept in snake_segments
+        # 0 = no history (the game doesn't need it), None = the whole path, n = the last n cells
+        self.max_segments = 0
 
-        # This list will store the history of where our snake has been
-        self.snake_segments = []
+        # This stores the history of where our snake has been (see max_segments)
+        self.snake_segments = deque(maxlen=self.max_segments)
 
-        # This variable stores which direction the snake is currently moving
-        self.current_direction = None
+        # This variable stores which direction the snake is currently moving (index into directions)
+        self.direction = None
 
         # The chance that the snake will randomly change direction
         # A value of 0.1 means there's a 10% chance on each step
@@ -213,6 +357,10 @@ class SnakePattern(CellularAutomaton):
         self.overwrite_neutral = True
         self.overwrite_enemy = True
 
+    def get_parameters(self):
+        """Add the turn chance to the base parameters"""
+        return super().get_parameters() + (self.random_turn_chance,)
+
     def set_starting_cell(self, x, y):
         """
         Initialize the snake's starting position and direction.
@@ -225,12 +373,11 @@ class SnakePattern(CellularAutomaton):
             # Add the starting position to the set of cells we're processing
             self.possible_cells = set([(x, y)])
 
-            # Add the starting position to our snake's history
-            self.snake_segments = [(x, y)]
+            # Start the snake's history
+            self.snake_segments = deque([(x, y)], maxlen=self.max_segments)
 
             # Choose a random direction to start moving in
-            # random.choice picks a random item from a list
-            self.current_direction = random.choice(self.directions)
+            self.direction = self.random.randrange(len(self.directions))
 
             # Return the change to be applied to the grid
             # This is a list with one element, which is [x, y, player_id]
@@ -249,115 +396,247 @@ class SnakePattern(CellularAutomaton):
 
         Args:
             current_x, current_y: The current position we're growing from
-            temp_grid: A temporary grid we're working with
+            temp_grid: The cells changed so far in this simulation ({(x, y): state})
             can_conquer_func: A function that tells us if we can take over a cell
             next_gen_cells: A set where we'll put the cells for the next step
 
         Returns:
             A list of the changes we want to make to the grid
         """
-        # This list will store all the changes we want to make
-        changes = []
+        # Without a direction the snake was never started
+        if self.direction is None:
+            return []
 
         # Check if we should randomly change direction
         # random.random() gives a number between 0.0 and 1.0
-        if random.random() < self.random_turn_chance:
-            # Decide to make a random turn!
-
-            # Get the possible directions we can turn to
-            # We don't want to reverse direction completely, so we exclude the opposite
-            possible_new_directions = []
-
-            # For each of the four possible directions
-            for direction in self.directions:
-                # Check if this direction is the opposite of our current direction
-                # To do this, we add the x components and y components
-                # If both sum to 0, then the directions are opposite
-                is_opposite = False
-                if self.current_direction:  # Only check if we have a current direction
-                    dx1, dy1 = direction
-                    dx2, dy2 = self.current_direction
-                    if dx1 + dx2 == 0 and dy1 + dy2 == 0:
-                        is_opposite = True
-
-                # If it's not the opposite direction, it's a valid turn
-                if not is_opposite:
-                    possible_new_directions.append(direction)
-
-            # Choose a random direction from the valid options
-            if possible_new_directions:
-                self.current_direction = random.choice(possible_new_directions)
-
-        # If we have a current direction, try to move in that direction
-        if self.current_direction:
-            # Get the movement values from our current direction
-            dx, dy = self.current_direction
-
-            # Calculate the new position
-            new_x = current_x + dx
-            new_y = current_y + dy
+        if self.random.random() < self.random_turn_chance:
+            # Decide to make a random turn! Any direction except backwards (this includes going straight)
+            self.direction = self.random.choice(self.turn_table[self.direction])
+
+        # Try to move in the current direction first
+        dx, dy = self.directions[self.direction]
+        if can_conquer_func(current_x + dx, current_y + dy):
+            return self.move_to(current_x + dx, current_y + dy, temp_grid, next_gen_cells)
+
+        # We can't move in our current direction, so we need to turn
+        # Try the directions that aren't backwards in a random order until we find one that works
+        possible_directions = list(self.turn_table[self.direction])
+        self.random.shuffle(possible_directions)
+
+        for direction in possible_directions:
+            dx, dy = self.directions[direction]
+            if can_conquer_func(current_x + dx, current_y + dy):
+                self.direction = direction
+                return self.move_to(current_x + dx, current_y + dy, temp_grid, next_gen_cells)
+
+        # If we couldn't find any valid direction, the snake is stuck and stops growing
+        return []
 
-            # Check if we can move to this new position
-            if can_conquer_func(new_x, new_y):
-                # We can move here! Update the temporary grid
-                temp_grid[new_y][new_x] = self.player_id
+    def move_to(self, new_x, new_y, temp_grid, next_gen_cells):
+        """
+        Move the snake's head to a new cell and return the change.
+        """
+        # Update the temporary grid
+        temp_grid[(new_x, new_y)] = self.player_id
+
+        # Add this cell to the set for the next generation
+        next_gen_cells.add((new_x, new_y))
+
+        # Update our snake's history
+        self.snake_segments.append((new_x, new_y))
+
+        return [[new_x, new_y, self.player_id]]
+
+    def run_batch(self, x, y, count, seed=None, collect_changes=False):
+        """
+        Run count snakes from the same starting cell at once (see run_snakes()).
+        Instances use a shared NumPy generator, so unlike run() instance i is not
+        the same as a run seeded with seed + i, only the distribution of outcomes is the same.
+        Uses the compiled kernel if Numba is available.
+        """
+        if automaton_kernels.enabled:
+            return self.run_compiled_snakes(x, y, count, 1, seed, collect_changes)
+        return self.run_snakes(x, y, count, 1, np.random.default_rng(seed), collect_changes)
+
+    def run_compiled_snakes(self, x, y, count, heads, seed=None, collect_changes=False):
+        """
+        Like run_snakes(), but with the compiled kernel (same rules, its own random numbers).
+        """
+        if not (0 <= x < self.grid.width and 0 <= y < self.grid.height) or count == 0:
+            return self.run_snakes(x, y, count, heads, None, collect_changes)
 
-                # Add this cell to the set for the next generation
-                next_gen_cells.add((new_x, new_y))
+        window, x0, y0 = self.get_batch_window(x, y)
+        moves_x, moves_y, lengths = automaton_kernels.walk_snakes(
+            window, x - x0, y - y0, count, heads, self.generations, self.random_turn_chance, self.player_id,
+            self.grid.NEUTRAL, self.overwrite_neutral, self.overwrite_enemy, automaton_kernels.make_seed(seed))
+        return self.make_batch_result(x, y, window, x0, y0, moves_x, moves_y, lengths, collect_changes)
 
-                # Add this change to our list of changes
-                changes.append([new_x, new_y, self.player_id])
+    def run_snakes(self, x, y, count, heads, rng, collect_changes=False):
+        """
+        Run count instances with heads snakes each, all starting at (x, y).
+
+        Every instance gets its own copy of the reachable board window, stacked into one
+        3-D array (count x height x width). The heads of an instance share its board.
+        Each generation moves all snakes that aren't stuck with a handful of array operations
+        and vectorized random draws, so the cost barely grows with the number of snakes.
+        The rules are the same as in simulate_step(): a random turn with random_turn_chance,
+        and if the way ahead is blocked, a random free direction that isn't backwards.
+        If two heads of an instance want the same cell, the first one gets it and
+        the other one waits for the next generation.
+
+        Returns the same dictionary as run_batch().
+        """
+        conquered = np.zeros(count, dtype=np.int64)
+        captured = np.zeros(count, dtype=np.int64)
+        all_changes = [[] for _ in range(count)] if collect_changes else None
+
+        if not (0 <= x < self.grid.width and 0 <= y < self.grid.height) or count == 0:
+            return {"conquered": conquered, "captured": captured, "changes": all_changes}
+
+        window, x0, y0 = self.get_batch_window(x, y)
+        height, width = window.shape
+        boards = np.repeat(window[np.newaxis], count, axis=0)
+
+        # Directions as numbers 0-3 (up, right, down, left), like self.directions
+        direction_x = np.array([dx for dx, dy in self.directions])
+        direction_y = np.array([dy for dx, dy in self.directions])
+        turn_table = np.array(self.turn_table)
+
+        # Starting cell
+        start_x, start_y = x - x0, y - y0
+        start_state = window[start_y, start_x]
+        conquered[:] = start_state != self.player_id
+        captured[:] = start_state not in (self.grid.NEUTRAL, self.player_id)
+        boards[:, start_y, start_x] = self.player_id
+        if collect_changes:
+            for changes in all_changes:
+                changes.append([x, y, self.player_id])
+
+        # One entry per snake, the heads of an instance are next to each other
+        instance = np.repeat(np.arange(count), heads)
+        position_x = np.full(count * heads, start_x)
+        position_y = np.full(count * heads, start_y)
+        # The heads of an instance start in different directions (as long as there are enough)
+        direction = rng.random((count, 4)).argsort(axis=1)[:, np.arange(heads) % 4].reshape(-1)
+        active = np.ones(count * heads, dtype=bool)
 
-                # Update our snake's history
-                self.snake_segments.append((new_x, new_y))
-            else:
-                # We can't move in our current direction, so we need to turn
+        for _ in range(self.generations):
+            snakes = np.nonzero(active)[0]
+            if snakes.size == 0:
+                break
 
-                # Create a list of all possible directions
-                possible_directions = []
+            # Random turns (any direction except backwards)
+            current_direction = direction[snakes]
+            turning = rng.random(snakes.size) < self.random_turn_chance
+            turns = turn_table[current_direction, rng.integers(3, size=snakes.size)]
+            current_direction = np.where(turning, turns, current_direction)
+            direction[snakes] = current_direction
+
+            # Straight ahead first, then the two other directions that aren't backwards
+            options = np.column_stack((current_direction, (current_direction + 1) % 4, (current_direction + 3) % 4))
+            target_x = position_x[snakes, np.newaxis] + direction_x[options]
+            target_y = position_y[snakes, np.newaxis] + direction_y[options]
+            inside = (target_x >= 0) & (target_x < width) & (target_y >= 0) & (target_y < height)
+            boards_of_snakes = instance[snakes, np.newaxis]
+            target_states = boards[boards_of_snakes, np.clip(target_y, 0, height - 1), np.clip(target_x, 0, width - 1)]
+            free = inside & self.can_conquer_states(target_states)
+
+            # Go straight if possible, otherwise pick a random free direction
+            keys = rng.random(free.shape)
+            keys[:, 0] = -1
+            keys[~free] = 2
+            choice = keys.argmin(axis=1)
+            rows = np.arange(snakes.size)
+            moved = free[rows, choice]
+
+            # Snakes without a free direction are stuck for good
+            active[snakes[~moved]] = False
+
+            snakes, choice, rows = snakes[moved], choice[moved], rows[moved]
+            new_x, new_y = target_x[rows, choice], target_y[rows, choice]
+
+            if heads > 1:
+                # Only the first head that wants a cell gets it
+                cells = (instance[snakes] * height + new_y) * width + new_x
+                first = np.zeros(snakes.size, dtype=bool)
+                first[np.unique(cells, return_index=True)[1]] = True
+                snakes, choice, rows = snakes[first], choice[first], rows[first]
+                new_x, new_y = new_x[first], new_y[first]
+
+            boards_of_snakes = instance[snakes]
+            np.add.at(captured, boards_of_snakes, target_states[rows, choice] != self.grid.NEUTRAL)
+            np.add.at(conquered, boards_of_snakes, 1)
+            boards[boards_of_snakes, new_y, new_x] = self.player_id
+            position_x[snakes], position_y[snakes] = new_x, new_y
+            direction[snakes] = options[rows, choice]
+
+            if collect_changes:
+                for board, change_x, change_y in zip(boards_of_snakes.tolist(), (new_x + x0).tolist(), (new_y + y0).tolist()):
+                    all_changes[board].append([change_x, change_y, self.player_id])
+
+        return {"conquered": conquered, "captured": captured, "changes": all_changes}
 
-                # Add all directions except the opposite of our current direction
-                for direction in self.directions:
-                    dx1, dy1 = direction
-                    dx2, dy2 = self.current_direction
+    # We've removed the try_branch_from_segment method since we no longer need it
+    # The snake will now simply stop growing when it can't find a valid move
 
-                    # Check if this is the opposite direction
-                    if dx1 + dx2 != 0 or dy1 + dy2 != 0:
-                        possible_directions.append(direction)
 
-                # Shuffle the directions to try them in a random order
-                random.shuffle(possible_directions)
+class MultiHeadSnake(SnakePattern):
+    """
+    Several snakes that start from the same cell in different directions
+    and grow at the same time.
 
-                # Try each direction until we find one that works
-                found_direction = False
-                for dx, dy in possible_directions:
-                    new_x = current_x + dx
-                    new_y = current_y + dy
+    All heads move together with the vectorized snake engine (see SnakePattern.run_snakes()),
+    so more heads hardly cost more time.
 
-                    if can_conquer_func(new_x, new_y):
-                        # This direction works! Update everything
-                        temp_grid[new_y][new_x] = self.player_id
-                        next_gen_cells.add((new_x, new_y))
-                        changes.append([new_x, new_y, self.player_id])
-                        self.snake_segments.append((new_x, new_y))
+    Subclass of SnakePattern.
+    """
 
-                        # Update our current direction
-                        self.current_direction = (dx, dy)
+    def __init__(self, grid, player_id, generations=8, overwrite_neutral=True, overwrite_enemy=True, seed=None):
+        super().__init__(grid, player_id, generations, overwrite_neutral, overwrite_enemy, seed)
 
-                        found_direction = True
-                        break
+        # Use the given settings, SnakePattern always overwrites enemy cells
+        self.overwrite_neutral = overwrite_neutral
+        self.overwrite_enemy = overwrite_enemy
 
-                # If we couldn't find any valid direction, the snake is stuck
-                if not found_direction:
-                    # We're completely stuck, so the snake stops growing
-                    # Use 'pass' to explicitly indicate we're doing nothing here
-                    pass  # The snake's movement ends
+        # Number of snakes
+        self.heads = 3
 
-        # Return all the changes we want to make
-        return changes
+        self.start_cell = None
 
-    # We've removed the try_branch_from_segment method since we no longer need it
-    # The snake will now simply stop growing when it can't find a valid move
+    def get_parameters(self):
+        """Add the number of heads to the snake parameters"""
+        return super().get_parameters() + (self.heads,)
+
+    def set_starting_cell(self, x, y):
+        """
+        Remember the starting cell. The heads' directions are chosen in run().
+        """
+        if 0 <= x < self.grid.width and 0 <= y < self.grid.height:
+            self.start_cell = (x, y)
+            return [[x, y, self.player_id]]
+        return []
+
+    def run(self):
+        """
+        Grow all heads for the specified number of generations.
+        Returns the changes without the starting cell, like run() of the other patterns.
+        """
+        if self.start_cell is None:
+            return []
+
+        # Draw the engine's seed from the automaton's own generator, so seeded runs can be repeated
+        rng = np.random.default_rng(self.random.getrandbits(64))
+        x, y = self.start_cell
+        return self.run_snakes(x, y, 1, self.heads, rng, collect_changes=True)["changes"][0][1:]
+
+    def run_batch(self, x, y, count, seed=None, collect_changes=False):
+        """
+        Run count multi-head snakes from the same starting cell at once.
+        Uses the compiled kernel if Numba is available.
+        """
+        if automaton_kernels.enabled:
+            return self.run_compiled_snakes(x, y, count, self.heads, seed, collect_changes)
+        return self.run_snakes(x, y, count, self.heads, np.random.default_rng(seed), collect_changes)
 
 
 class RootGrowth(CellularAutomaton):
@@ -369,9 +648,9 @@ class RootGrowth(CellularAutomaton):
     Subclass of CellularAutomaton.
     """
 
-    def __init__(self, grid, player_id, generations=7, overwrite_neutral=True, overwrite_enemy=False):
+    def __init__(self, grid, player_id, generations=7, overwrite_neutral=True, overwrite_enemy=False, seed=None):
         # Call the parent class constructor to set up basic properties
-        super().__init__(grid, player_id, generations, overwrite_neutral, overwrite_enemy)
+        super().__init__(grid, player_id, generations, overwrite_neutral, overwrite_enemy, seed)
 
         # The initial conquest probability for the first cell (90% chance)
         self.initial_probability = 0.9
@@ -385,14 +664,36 @@ class RootGrowth(CellularAutomaton):
         # Maximum generation - roots stop growing after this many steps
         self.max_generations = generations
 
-        # Dictionary to track each cell's generation number
-        self.cell_generations = {}
+        # Conquest probabilities as lookup tables (see build_probability_tables)
+        self.probability_tables = self.build_probability_tables()
+
+    def get_parameters(self):
+        """Add the probability settings to the base parameters"""
+        return super().get_parameters() + (self.initial_probability, self.probability_decrease, self.generation_decrease)
+
+    def build_probability_tables(self):
+        """
+        Precompute the conquest probabilities.
+        Returns a 2-D array: row g holds the probability for the first, second, ... eighth
+        conquerable neighbor of a cell of generation g. The values are calculated exactly
+        like the step by step decrease, so the outcome of a seeded run doesn't change.
+        """
+        tables = np.zeros((max(1, self.max_generations), 8))
+
+        for generation in range(len(tables)):
+            # Each successive generation has a lower starting probability
+            probability = max(0.1, self.initial_probability - (generation * self.generation_decrease))
+            for rank in range(8):
+                tables[generation, rank] = probability
+                # Every further direction is less likely, which makes branching rare
+                probability = max(0.05, probability - self.probability_decrease)
+
+        return tables
 
     def set_starting_cell(self, x, y):
-        """Override to initialize the root's starting position and generation tracking"""
+        """Override to initialize the root's starting position"""
         if 0 <= x < self.grid.width and 0 <= y < self.grid.height:
             self.possible_cells = set([(x, y)])
-            self.cell_generations[(x, y)] = 0  # Starting cell is generation 0
             return [[x, y, self.player_id]]
         return []
 
@@ -403,17 +704,14 @@ class RootGrowth(CellularAutomaton):
         # This list will store all changes we make
         changes = []
 
-        # Get this cell's generation number
-        current_generation = self.cell_generations.get((current_x, current_y), 0)
+        # All cells processed in a generation were conquered in the previous one,
+        # so the cell's generation number is the automaton's current generation
+        current_generation = self.current_generation
 
         # If we've reached the maximum generation, stop growing from this cell
         if current_generation >= self.max_generations - 1:
             return []
 
-        # Calculate the starting probability for this cell
-        # Each successive generation has a lower starting probability
-        start_probability = max(0.1, self.initial_probability - (current_generation * self.generation_decrease))
-
         # Define all eight possible directions we can grow in (orthogonal and diagonal)
         # The eight directions are: Up, Up-Right, Right, Down-Right, Down, Down-Left, Left, Up-Left
         all_directions = [
@@ -422,10 +720,11 @@ class RootGrowth(CellularAutomaton):
 
         # Shuffle the directions to randomize which one we try first
         # This creates more natural, unpredictable growth patterns
-        random.shuffle(all_directions)
+        self.random.shuffle(all_directions)
 
-        # Keep track of our current conquest probability
-        current_probability = start_probability
+        # Probabilities for the first, second, ... conquerable direction
+        probabilities = self.probability_tables[current_generation]
+        rank = 0
 
         # Try each direction with decreasing probability
         for dx, dy in all_directions:
@@ -436,9 +735,9 @@ class RootGrowth(CellularAutomaton):
             # Check if we can grow to this cell (is it empty or can we take it over?)
             if can_conquer_func(new_x, new_y):
                 # Roll a random number to see if we conquer this cell
-                if random.random() < current_probability:
+                if self.random.random() < probabilities[rank]:
                     # Success! Mark this cell as belonging to our player
-                    temp_grid[new_y][new_x] = self.player_id
+                    temp_grid[(new_x, new_y)] = self.player_id
 
                     # Add this cell to the next generation set
                     # This means this cell will be active in the next step
@@ -447,12 +746,126 @@ class RootGrowth(CellularAutomaton):
                     # Record the change for animation
                     changes.append([new_x, new_y, self.player_id])
 
-                    # Mark this new cell as being one generation higher than its parent
-                    self.cell_generations[(new_x, new_y)] = current_generation + 1
-
-                # Decrease the probability for the next direction we check
-                # This makes it less likely to grow in multiple directions
-                current_probability = max(0.05, current_probability - self.probability_decrease)
+                # The next direction we check gets the next (lower) probability
+                rank += 1
 
         # Return all the changes we made during this step
-        return changes
\ No newline at end of file
+        return changes
+
+    def run_batch(self, x, y, count, seed=None, collect_changes=False):
+        """
+        Run count root systems from the same starting cell at once.
+
+        Like SnakePattern.run_batch(), every instance gets its own copy of the reachable
+        board window in one 3-D array. Each generation handles the whole frontier of all
+        instances with array operations: a random order of the eight directions per cell
+        (argsort of random keys), the rank of each conquerable direction in that order,
+        the probability for that rank from the lookup table and one random draw per direction.
+
+        Frontier cells of one instance compete for their common neighbors, so they are
+        not independent. The frontier is therefore processed in nine groups by (x % 3, y % 3):
+        cells of a group are at least three cells apart, their neighborhoods don't overlap
+        and the group is exactly equivalent to handling its cells one after another.
+        run() processes the cells in set order instead, which is just another order,
+        so the distribution of outcomes is the same.
+        With Numba the compiled kernel is used instead.
+        """
+        conquered = np.zeros(count, dtype=np.int64)
+        captured = np.zeros(count, dtype=np.int64)
+        all_changes = [[] for _ in range(count)] if collect_changes else None
+
+        if not (0 <= x < self.grid.width and 0 <= y < self.grid.height) or count == 0:
+            return {"conquered": conquered, "captured": captured, "changes": all_changes}
+
+        window, x0, y0 = self.get_batch_window(x, y)
+
+        if automaton_kernels.enabled:
+            # The compiled kernel processes the cells one after another, exactly like run()
+            moves_x, moves_y, lengths = automaton_kernels.grow_roots(
+                window, x - x0, y - y0, count, self.generations, self.probability_tables, self.player_id,
+                self.grid.NEUTRAL, self.overwrite_neutral, self.overwrite_enemy, automaton_kernels.make_seed(seed))
+            return self.make_batch_result(x, y, window, x0, y0, moves_x, moves_y, lengths, collect_changes)
+
+        rng = np.random.default_rng(seed)
+        height, width = window.shape
+        boards = np.repeat(window[np.newaxis], count, axis=0)
+
+        # The eight directions in the same order as in simulate_step()
+        direction_x = np.array([0, 1, 1, 1, 0, -1, -1, -1])
+        direction_y = np.array([-1, -1, 0, 1, 1, 1, 0, -1])
+
+        # Starting cell
+        start_x, start_y = x - x0, y - y0
+        start_state = window[start_y, start_x]
+        conquered[:] = start_state != self.player_id
+        captured[:] = start_state not in (self.grid.NEUTRAL, self.player_id)
+        boards[:, start_y, start_x] = self.player_id
+        if collect_changes:
+            for changes in all_changes:
+                changes.append([x, y, self.player_id])
+
+        # Frontier: instance, x and y of every cell conquered in the last generation.
+        # All of them have the same generation number, the loop counter.
+        frontier_instance = np.arange(count)
+        frontier_x = np.full(count, start_x)
+        frontier_y = np.full(count, start_y)
+
+        for generation in range(min(self.generations, self.max_generations - 1)):
+            if frontier_instance.size == 0:
+                break
+
+            probabilities = self.probability_tables[generation]
+            groups = (frontier_y % 3) * 3 + frontier_x % 3
+            next_instance, next_x, next_y = [], [], []
+
+            for group in np.unique(groups):
+                cells = groups == group
+                instances = frontier_instance[cells]
+                cell_x, cell_y = frontier_x[cells], frontier_y[cells]
+
+                # Random order of the eight directions for every cell
+                order = rng.random((instances.size, 8)).argsort(axis=1)
+                target_x = cell_x[:, np.newaxis] + direction_x[order]
+                target_y = cell_y[:, np.newaxis] + direction_y[order]
+                inside = (target_x >= 0) & (target_x < width) & (target_y >= 0) & (target_y < height)
+                target_states = boards[instances[:, np.newaxis], np.clip(target_y, 0, height - 1), np.clip(target_x, 0, width - 1)]
+                free = inside & self.can_conquer_states(target_states)
+
+                # The k-th conquerable direction of a cell gets the k-th probability
+                rank = np.cumsum(free, axis=1) - 1
+                grows = free & (rng.random(free.shape) < probabilities[np.maximum(rank, 0)])
+
+                rows, columns = np.nonzero(grows)
+                grown_instance = instances[rows]
+                grown_x, grown_y = target_x[rows, columns], target_y[rows, columns]
+
+                conquered += np.bincount(grown_instance, minlength=count)
+                captured += np.bincount(grown_instance[target_states[rows, columns] != self.grid.NEUTRAL], minlength=count)
+                boards[grown_instance, grown_y, grown_x] = self.player_id
+
+                next_instance.append(grown_instance)
+                next_x.append(grown_x)
+                next_y.append(grown_y)
+
+                if collect_changes:
+                    for instance, change_x, change_y in zip(grown_instance.tolist(), (grown_x + x0).tolist(), (grown_y + y0).tolist()):
+                        all_changes[instance].append([change_x, change_y, self.player_id])
+
+            frontier_instance = np.concatenate(next_instance)
+            frontier_x = np.concatenate(next_x)
+            frontier_y = np.concatenate(next_y)
+
+        return {"conquered": conquered, "captured": captured, "changes": all_changes}
+
+def count_conquered_cells(grid, changes, player_id):
+    """
+    Count how many cells a list of changes would win for a player.
+    Cells the player already owns and duplicate changes are not counted.
+    """
+    conquered = set()
+
+    for x, y, _ in changes:
+        if grid.get_cell(x, y) != player_id:
+            conquered.add((x, y))
+
+    return len(conquered)
@@ -1,17 +1,28 @@
-import pygame
-from cellular_automaton import SimpleExpansion, SnakePattern, RootGrowth
+import random
+from action_registry import get_registry
 from player import Player
-from grid import Grid
-from player_action import PlayerAction
+from grid import Grid, TiledGrid
+from replay import ReplayRecorder
+from territory import TerritoryAnalyzer
 
 
 class GameManager:
-    def __init__(self, grid_width, grid_height, cell_size, network_manager = None):
-        self.grid = Grid(grid_width, grid_height, cell_size) #Initializes the grid
+    def __init__(self, grid_width, grid_height, cell_size, network_manager = None, tiled_grid = False,
+                 total_turns = 5, step_delay = 50, changes_per_step = 1, territory_stats = None):
+        # Initializes the grid (very large boards use a TiledGrid that only stores claimed chunks)
+        if tiled_grid:
+            self.grid = TiledGrid(grid_width, grid_height, cell_size)
+        else:
+            self.grid = Grid(grid_width, grid_height, cell_size)
         self.players = []
         self.current_player_index = 0
+        # Connected regions and enclosed pockets per player (by default not for tiled boards, their
+        # territory can grow too large to keep the statistics up to date with every move)
+        if territory_stats is None:
+            territory_stats = not tiled_grid
+        self.territory = TerritoryAnalyzer(self.grid) if territory_stats else None
         self.selected_action = None # Stores the selected action as object
-        self.total_turns = 5
+        self.total_turns = total_turns
         self.current_turn = 1
         self.game_over = False
 
@@ -19,9 +30,9 @@ class GameManager:
         self.animation_in_progress = False
         self.animation_changes = None # List of all changes to animate (format: [[x1,y1,player_id], [x2,y2,player_id], ...])
         self.animation_index = 0
-        self.step_delay = 50  # milliseconds between animation steps
+        self.step_delay = step_delay  # milliseconds between animation steps
         self.next_step_time = 0
-        self.changes_per_step = 1  # Number of cells to update per animation step
+        self.changes_per_step = changes_per_step  # Number of cells to update per animation step
 
         # Network properties
         self.network_manager = network_manager
@@ -29,10 +40,19 @@ class GameManager:
         self.is_client = network_manager is not None and network_manager.__class__.__name__ == 'NetworkClient'
         self.is_networked = network_manager is not None
         self.waiting_for_remote = False # True when waiting for the other player to take their turn
+        self.expected_hash = None # Board hash the other player had after the animated move
+        self.desync_detected = False # The boards of both players differed after a move
+
+        # AI properties
+        self.ai_players = {} # Maps a player index to the AIPlayer controlling that player
 
-    def initialize_players(self, player1_name, player2_name):
+        # Replay properties
+        self.replay_recorder = None # Set by start_recording()
+
+    def initialize_players(self, player1_name, player2_name, action_names=None):
         """
         Create the two Players.
+        action_names selects the players' actions from the action registry (None = the configured loadout).
         """
         #Colors
         player1_color = (0, 175, 185)  # Verdigris
@@ -41,42 +61,10 @@ class GameManager:
         player1 = Player(1, player1_name, player1_color)
         player2 = Player(2, player2_name, player2_color)
 
-        """
-        Player action.
-        Creates the actions each player can chose.
-        Name, description, CA to use, number of generations, if can overwrite neutral tiles, if can overwrite enemy tiles, price
-        """
-        simple_expansion = PlayerAction(
-            "Diamond Bomb",
-            "Expands in a diamond shape",
-            SimpleExpansion,
-            generations = 3
-        )
-
-        snake_pattern = PlayerAction(
-            "Snake Attack",
-            "Slithers like a snake",
-            SnakePattern,
-            generations = 20,
-            overwrite_neutral = True,
-            overwrite_enemy = True
-        )
-
-        root_growth = PlayerAction(
-            "Root Growth",
-            "Spread like a tree root",
-            RootGrowth,
-            generations = 7
-        )
-
-        # Add actions to players
-        player1.add_action(simple_expansion)
-        player1.add_action(snake_pattern)
-        player1.add_action(root_growth)
-
-        player2.add_action(simple_expansion)
-        player2.add_action(snake_pattern)
-        player2.add_action(root_growth)
+        # Actions both players can choose (imported lazily, see action_registry)
+        for action in get_registry().create_loadout(action_names):
+            player1.add_action(action)
+            player2.add_action(action)
 
         self.players = [player1, player2]
 
@@ -140,8 +128,9 @@ class GameManager:
 
         current_player = self.get_current_player()
 
-        # Create the automaton
-        automaton = self.selected_action.create_automaton(self.grid, current_player.player_id)
+        # Create the automaton (the seed makes the move reproducible in replays)
+        seed = random.getrandbits(32)
+        automaton = self.selected_action.create_automaton(self.grid, current_player.player_id, seed=seed)
 
         # Set starting cell and get initial grid changes
         initial_grid_changes = automaton.set_starting_cell(grid_x, grid_y)
@@ -149,6 +138,9 @@ class GameManager:
         # Run and capture all changes
         all_changes = initial_grid_changes + automaton.run()
 
+        # Record the move for the replay
+        self.record_move(current_player.player_id, self.selected_action.name, grid_x, grid_y, seed, all_changes)
+
         # If in networked mode, send to other player
         if self.is_networked:
             message = {
@@ -156,7 +148,9 @@ class GameManager:
                 "action_name": self.selected_action.name,
                 "grid_x": grid_x,
                 "grid_y": grid_y,
-                "changes": all_changes
+                "seed": seed,
+                "changes": all_changes,
+                "board_hash": self.grid.get_hash_after(all_changes) # Lets the other player check its board
             }
             self.network_manager.send_message(message)
 
@@ -165,28 +159,78 @@ class GameManager:
 
         return True
 
-    def update_cell_count(self):
+    def set_ai_player(self, player_index, ai_player):
         """
-        Count and update the number of cells owned by each player.
+        Let an AIPlayer take control of the player at the given index (local games only).
         """
 
-        counts = {1: 0, 2: 0}
+        self.ai_players[player_index] = ai_player
+
+    def is_ai_turn(self):
+        """
+        Check if the current player is controlled by the computer.
+        """
 
-        for y in range(self.grid.height):
-            for x in range(self.grid.width):
-                cell_state = self.grid.get_cell(x, y)
-                if cell_state in counts:
-                    counts[cell_state] += 1
+        return self.current_player_index in self.ai_players
+
+    def update_ai_turn(self):
+        """
+        Let the AI take its turn.
+        - Starts the AI thinking in the background when it's its turn
+        - Applies the chosen move as soon as the AI has decided
+        """
+
+        if self.game_over or self.animation_in_progress or self.is_networked or not self.is_ai_turn():
+            return
+
+        ai_player = self.ai_players[self.current_player_index]
+        ai_player.start_thinking(self.grid, self.territory)
+
+        move = ai_player.get_move()
+        if move:
+            action, grid_x, grid_y = move
+            self.select_action(action)
+            self.apply_action(grid_x, grid_y)
+
+    def start_recording(self, path, keyframe_interval=10):
+        """
+        Start recording all moves of this game to a replay file.
+        """
+
+        self.replay_recorder = ReplayRecorder(path, self.grid, keyframe_interval)
+
+    def record_move(self, player_id, action_name, grid_x, grid_y, seed, changes):
+        """
+        Record a move if a replay is being recorded.
+        Has to be called before the move's changes are applied to the grid.
+        """
+
+        if self.replay_recorder:
+            self.replay_recorder.record_move(player_id, action_name, grid_x, grid_y, seed, changes)
+
+    def stop_recording(self):
+        """
+        Finish the replay file.
+        """
+
+        if self.replay_recorder:
+            self.replay_recorder.close()
+            self.replay_recorder = None
+
+    def update_cell_count(self):
+        """
+        Count and update the number of cells owned by each player.
+        """
 
         for player in self.players:
-            player.update_cells_conquered(counts.get(player.player_id, 0))
+            player.update_cells_conquered(self.grid.count_cells(player.player_id))
 
     def start_animation_playback(self, changes):
         """
         Start animation playback.
         - Takes a list of cell changes to animate.
         - Sets up the animation state (resets index, marks animation as in progress).
-        - Schedules the first animation step.
+        - The first animation step is scheduled by the next update_animation() call.
         - Clears the selected action.
         """
 
@@ -194,7 +238,11 @@ class GameManager:
         self.animation_changes = changes
         self.animation_index = 0
         self.animation_in_progress = True
-        self.next_step_time = pygame.time.get_ticks() + self.step_delay
+        self.next_step_time = None # The caller's clock isn't known here, see update_animation()
+
+        # The pockets are recalculated once the whole move is applied
+        if self.territory is not None:
+            self.territory.begin_changes()
 
         # Clear selected action
         self.selected_action = None
@@ -212,6 +260,11 @@ class GameManager:
         if not self.animation_in_progress or not self.animation_changes:
             return
 
+        # First call after start_animation_playback(): schedule the first step
+        if self.next_step_time is None:
+            self.next_step_time = current_time + self.step_delay
+            return
+
         if current_time >= self.next_step_time:
             # Apply next batch of changes
             changes_applied = 0
@@ -221,8 +274,11 @@ class GameManager:
                 change = self.animation_changes[self.animation_index]
                 x, y, player_id = change
 
-                # Apply the change
+                # Apply the change and update the territory statistics
+                old_state = self.grid.get_cell(x, y)
                 self.grid.set_cell(x, y, player_id)
+                if self.territory is not None:
+                    self.territory.cell_changed(x, y, old_state, player_id)
 
                 # Update counters
                 self.animation_index += 1
@@ -236,10 +292,28 @@ class GameManager:
                 # Animation complete
                 self.animation_in_progress = False
                 self.animation_changes = None
+                if self.territory is not None:
+                    self.territory.end_changes()
+                self.check_sync()
 
                 # Move to next turn
                 self.next_turn()
 
+    def check_sync(self):
+        """
+        Compare the board with the hash the other player sent with the move that was just
+        applied. The hashes differ if the boards went out of sync (e.g. a lost or changed message).
+        """
+
+        if self.expected_hash is None:
+            return
+
+        if self.grid.get_hash() != self.expected_hash:
+            self.desync_detected = True
+            print(f"Board out of sync after turn {self.current_turn}: "
+                  f"hash {self.grid.get_hash():016x}, the other player has {self.expected_hash:016x}")
+        self.expected_hash = None
+
     def is_my_turn(self):
         """
         Check if it's this client's turn in a networked game.
@@ -258,7 +332,8 @@ class GameManager:
         Process any pending network messages.
         - Checks if there are any new messages from the network_manager.
         - Handles "action_result" messages by extracting the changes.
-        - Starts the animation playback with those changes.
+        - Starts the animation playback with those changes, the board is compared with the
+          sender's board hash when it ends (see check_sync()).
         """
 
         if not self.is_networked or not self.network_manager:
@@ -272,8 +347,12 @@ class GameManager:
         if message.get("type") == "action_result" and "changes" in message:
             # Extract data
             changes = message["changes"]
+            # Record the other player's move for the replay
+            self.record_move(self.get_current_player().player_id, message.get("action_name", ""),
+                             message.get("grid_x", 0), message.get("grid_y", 0), message.get("seed"), changes)
             # Start animated playback
             self.start_animation_playback(changes)
+            self.expected_hash = message.get("board_hash") # Missing if the other player's version doesn't send it
         else:
             print(f"Received unknown message type: {message}")
 
@@ -296,10 +375,14 @@ class GameManager:
         - Acts as the main update method called every frame
         - First checks for network messages
         - Then updates any ongoing animation
+        - Finally lets the AI move if it's its turn
         """
 
         # Check for network messages
         self.process_network_messages()
 
         # Update animation
-        self.update_animation(current_time)
\ No newline at end of file
+        self.update_animation(current_time)
+
+        # Let the computer move if it's its turn
+        self.update_ai_turn()
\ No newline at end of file
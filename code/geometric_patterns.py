@@ -0,0 +1,163 @@
+"""
+Deterministic patterns from documentation/move_ideas.md: Spiral Growth, Checkerboard and Line Sweeper.
+This module is only imported when one of its actions is used (see action_registry).
+"""
+from cellular_automaton import CellularAutomaton
+
+
+class SpiralGrowth(CellularAutomaton):
+    """
+    A single arm that winds outward in a square spiral around the starting cell.
+    The legs of the spiral grow by two cells every half turn, so a free line is left
+    between the rings. The arm keeps following its path when a cell can't be conquered,
+    so it wraps around obstacles instead of stopping.
+
+    Subclass of CellularAutomaton.
+    """
+
+    # No random decisions are made, so the outcome only depends on the board
+    deterministic = True
+
+    # Right, down, left, up - the spiral turns clockwise
+    directions = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+
+    def __init__(self, grid, player_id, generations=24, overwrite_neutral=True, overwrite_enemy=False, seed=None):
+        super().__init__(grid, player_id, generations, overwrite_neutral, overwrite_enemy, seed)
+
+        # Position on the spiral: current direction, length of the current leg and cells walked on it
+        self.direction = 0
+        self.leg_length = 2
+        self.leg_progress = 0
+
+    def simulate_step(self, current_x, current_y, temp_grid, can_conquer_func, next_gen_cells):
+        """
+        Move the arm one cell along the spiral and conquer that cell if possible.
+        """
+        # Turn at the end of a leg, every second turn the legs get longer
+        if self.leg_progress == self.leg_length:
+            self.direction = (self.direction + 1) % 4
+            self.leg_progress = 0
+            if self.direction % 2 == 0:
+                self.leg_length += 2
+
+        dx, dy = self.directions[self.direction]
+        new_x, new_y = current_x + dx, current_y + dy
+        self.leg_progress += 1
+
+        # The arm moves on in any case, but only conquers cells it is allowed to
+        next_gen_cells.add((new_x, new_y))
+        if can_conquer_func(new_x, new_y):
+            temp_grid[(new_x, new_y)] = self.player_id
+            return [[new_x, new_y, self.player_id]]
+
+        return []
+
+
+class Checkerboard(CellularAutomaton):
+    """
+    Expands diagonally from every cell, which conquers every second cell in a
+    checkerboard configuration. Covers a larger area than the Diamond Bomb, but
+    with half the density - the gaps can be filled in later.
+
+    Subclass of CellularAutomaton.
+    """
+
+    # No random decisions are made, so the outcome only depends on the board
+    deterministic = True
+
+    def simulate_step(self, current_x, current_y, temp_grid, can_conquer_func, next_gen_cells):
+        """
+        Conquer the four diagonal neighbors of a cell.
+        """
+        changes = []
+
+        for dx, dy in ((-1, -1), (1, -1), (1, 1), (-1, 1)):
+            new_x, new_y = current_x + dx, current_y + dy
+            if can_conquer_func(new_x, new_y):
+                temp_grid[(new_x, new_y)] = self.player_id
+                next_gen_cells.add((new_x, new_y))
+                changes.append([new_x, new_y, self.player_id])
+
+        return changes
+
+
+class LineSweeper(CellularAutomaton):
+    """
+    A line across the starting cell that is pushed forward, converting every cell in its path.
+    The line sweeps in the direction where it can conquer the most cells right away.
+    Parts of the line that hit a cell they can't conquer stop there, the rest moves on.
+
+    Subclass of CellularAutomaton.
+    """
+
+    # No random decisions are made, so the outcome only depends on the board
+    deterministic = True
+
+    # Up, right, down, left (also the order in which ties are broken)
+    directions = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+
+    def __init__(self, grid, player_id, generations=4, overwrite_neutral=True, overwrite_enemy=False, seed=None):
+        super().__init__(grid, player_id, generations, overwrite_neutral, overwrite_enemy, seed)
+
+        # The line reaches this many cells to each side of the starting cell
+        self.half_width = 2
+
+        # Direction the line moves in, chosen in set_starting_cell()
+        self.direction = None
+
+    def get_parameters(self):
+        """Add the line width to the base parameters"""
+        return super().get_parameters() + (self.half_width,)
+
+    def reach(self):
+        """The line is half_width cells wide to each side and moves one cell per generation"""
+        return max(self.generations, self.half_width)
+
+    def get_line(self, x, y, direction):
+        """
+        Get the cells of a line through (x, y) that is perpendicular to a direction.
+        """
+        dx, dy = self.directions[direction]
+        # Perpendicular to (dx, dy) is (dy, dx)
+        return [(x + offset * dy, y + offset * dx) for offset in range(-self.half_width, self.half_width + 1)]
+
+    def set_starting_cell(self, x, y):
+        """
+        Choose the sweeping direction and place the line.
+        Returns the changes of the starting cell and the line cells that can be conquered.
+        """
+        if not (0 <= x < self.grid.width and 0 <= y < self.grid.height):
+            return []
+
+        # Sweep where the line can conquer the most cells with its first step
+        best_count = -1
+        for direction, (dx, dy) in enumerate(self.directions):
+            count = sum(1 for line_x, line_y in self.get_line(x, y, direction)
+                        if self.can_conquer_cell(line_x + dx, line_y + dy))
+            if count > best_count:
+                best_count = count
+                self.direction = direction
+
+        changes = [[x, y, self.player_id]]
+        self.possible_cells = set([(x, y)])
+
+        for line_x, line_y in self.get_line(x, y, self.direction):
+            if (line_x, line_y) != (x, y) and self.can_conquer_cell(line_x, line_y):
+                self.possible_cells.add((line_x, line_y))
+                changes.append([line_x, line_y, self.player_id])
+
+        return changes
+
+    def simulate_step(self, current_x, current_y, temp_grid, can_conquer_func, next_gen_cells):
+        """
+        Push one cell of the line forward.
+        """
+        dx, dy = self.directions[self.direction]
+        new_x, new_y = current_x + dx, current_y + dy
+
+        if can_conquer_func(new_x, new_y):
+            temp_grid[(new_x, new_y)] = self.player_id
+            next_gen_cells.add((new_x, new_y))
+            return [[new_x, new_y, self.player_id]]
+
+        return []
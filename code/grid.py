@@ -1,4 +1,37 @@
-import pygame
+import mmap, struct
+
+# Zobrist hashing: every (cell, state) pair has a fixed random 64 bit key and the hash of a board
+# is the XOR of the keys of its cells, so changing a cell updates the hash with two XORs.
+# The keys are calculated (splitmix64 of the cell index and state) instead of stored in a table,
+# which would need more memory than the board itself. Neutral cells have no key (0).
+ZOBRIST_SEED = 0x5EED_CE11_3A75
+HASH_MASK = (1 << 64) - 1
+
+
+def zobrist_key(index, state):
+    """
+    Get the hash key of a cell (index = y * width + x) in a (non neutral) state.
+    """
+    z = (index * 256 + state + ZOBRIST_SEED + 0x9E3779B97F4A7C15) & HASH_MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & HASH_MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & HASH_MASK
+    return z ^ (z >> 31)
+
+
+def zobrist_hash(indices, states):
+    """
+    Get the XOR of the hash keys of many cells at once (NumPy arrays of cell indices and states),
+    same keys as zobrist_key().
+    """
+    import numpy as np
+
+    # uint64 array arithmetic wraps around like the masked Python version
+    z = indices.astype(np.uint64) * np.uint64(256) + states.astype(np.uint64) + np.uint64(ZOBRIST_SEED + 0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return int(np.bitwise_xor.reduce(z)) if z.size else 0
+
 
 class Grid:
     # Cell states
@@ -6,11 +39,35 @@ class Grid:
     PLAYER1 = 1
     PLAYER2 = 2
 
+    # Snapshot file format (little endian):
+    # "CWGD", version (u16), width (u32), height (u32), number of colors (u8),
+    # one RGB triple per cell state, then one byte per cell (row by row)
+    FILE_MAGIC = b"CWGD"
+    FILE_VERSION = 1
+    FILE_HEADER = struct.Struct("<4sHIIB")
+
     def __init__(self, width, height, cell_size):
         self.width = width
         self.height = height
         self.cell_size = cell_size
-        self.cells = [[self.NEUTRAL for x in range(width)] for y in range(height)]
+
+        # One byte per cell, row by row: the cell (x, y) is at index y * width + x
+        # A bytearray (or a memory mapped snapshot, see load()) keeps large boards compact
+        self.cells = bytearray(width * height)
+
+        # Border cells of every player: owned cells next to at least one cell that isn't theirs
+        # Kept up to date by set_cell(), so territory queries don't have to scan the board
+        # (None after the cells were replaced as a whole, until get_frontier() rebuilds them)
+        self.frontiers = {}
+
+        # Incremented on every change of a cell or color, so views can tell when to redraw
+        self.version = 0
+
+        # Zobrist hash of the cells (see get_hash()), None while it has to be calculated again
+        self.board_hash = 0
+
+        # Objects that keep data derived from the cells up to date (see add_observer())
+        self.observers = []
 
         """
         Default colors, will be updated by Game Manager
@@ -22,13 +79,281 @@ class Grid:
             self.PLAYER2: (255,200,150) # Yellow
         }
 
+    def copy(self):
+        """
+        Create an independent copy of the grid.
+        Used to simulate moves (e.g. in a background thread) without touching the real board.
+        """
+
+        grid_copy = Grid(self.width, self.height, self.cell_size)
+        grid_copy.cells = bytearray(self.cells)
+        if self.frontiers is not None:
+            grid_copy.frontiers = {state: set(cells) for state, cells in self.frontiers.items()}
+        else:
+            grid_copy.frontiers = None
+        grid_copy.colors = dict(self.colors)
+        grid_copy.board_hash = self.board_hash
+        return grid_copy
+
+    def to_bytes(self):
+        """
+        Get all cell states as bytes, row by row (one byte per cell).
+        """
+
+        return bytes(self.cells)
+
+    def load_bytes(self, data):
+        """
+        Replace all cell states with the states from to_bytes().
+        """
+
+        if len(data) != self.width * self.height:
+            raise ValueError(f"Expected {self.width * self.height} cells, got {len(data)}")
+
+        self.cells[:] = data
+        self.version += 1
+        self.board_hash = None
+        self.frontiers = None # Only rebuilt when needed, see get_frontier()
+        for observer in self.observers:
+            observer.cells_reloaded()
+
+    def save(self, path):
+        """
+        Save the grid to a snapshot file.
+        The cells are written as one block, no matter how large the board is.
+        """
+
+        palette_size = max(self.colors) + 1
+
+        with open(path, "wb") as file:
+            file.write(self.FILE_HEADER.pack(self.FILE_MAGIC, self.FILE_VERSION, self.width, self.height, palette_size))
+            for state in range(palette_size):
+                file.write(bytes(self.colors.get(state, (0, 0, 0))))
+            self.write_cells(file)
+
+    def write_cells(self, file):
+        """
+        Write all cell states to a file, one byte per cell, row by row.
+        """
+
+        file.write(self.cells)
+
+    @classmethod
+    def load(cls, path, cell_size):
+        """
+        Load a grid from a snapshot file.
+
+        The file is memory mapped and used as the grid's cells directly, so loading
+        takes the same time for any board size. The mapping is copy on write:
+        changing the grid never changes the file.
+        """
+
+        with open(path, "rb") as file:
+            mapped_file = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        width, height, colors, cells_offset = cls.read_snapshot_header(mapped_file, path)
+
+        grid = cls(0, 0, cell_size)
+        grid.width = width
+        grid.height = height
+        grid.cells = memoryview(mapped_file)[cells_offset:]
+        grid.board_hash = None # Only calculated when needed, so loading stays independent of the board size
+        grid.colors.update(colors)
+        grid.frontiers = None # Only rebuilt when needed, see get_frontier()
+        return grid
+
+    @classmethod
+    def read_snapshot_header(cls, data, path):
+        """
+        Check the header of a snapshot file's contents.
+        Returns the board's width, height and colors and the offset of the cells.
+        """
+
+        magic, version, width, height, palette_size = cls.FILE_HEADER.unpack_from(data, 0)
+        if magic != cls.FILE_MAGIC:
+            raise ValueError(f"{path} is not a Cell Wars grid snapshot")
+        if version != cls.FILE_VERSION:
+            raise ValueError(f"Unsupported grid snapshot version {version}")
+
+        cells_offset = cls.FILE_HEADER.size + palette_size * 3
+        if len(data) - cells_offset != width * height:
+            raise ValueError(f"{path} is truncated")
+
+        colors = {}
+        for state in range(palette_size):
+            offset = cls.FILE_HEADER.size + state * 3
+            colors[state] = tuple(data[offset:offset + 3])
+        return width, height, colors, cells_offset
+
+    def diff(self, other):
+        """
+        Get the coordinates of all cells that differ from another grid of the same size.
+        """
+
+        changed_cells = []
+        for y in range(self.height):
+            row_start = y * self.width
+            row = self.cells[row_start:row_start + self.width]
+            other_row = other.cells[row_start:row_start + self.width]
+
+            # Comparing whole rows first skips unchanged rows quickly
+            if row != other_row:
+                for x in range(self.width):
+                    if row[x] != other_row[x]:
+                        changed_cells.append((x, y))
+        return changed_cells
+
+    def get_region(self, x0, y0, x1, y1):
+        """
+        Get the states of all cells in a rectangle as bytes (row by row).
+        The rectangle is clipped to the grid, x1 and y1 are exclusive.
+        """
+
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.width, x1), min(self.height, y1)
+
+        region = bytearray()
+        for y in range(y0, y1):
+            region += self.cells[y * self.width + x0:y * self.width + x1]
+        return bytes(region)
+
+    def to_array(self):
+        """
+        Get the cells as a 2-D NumPy array (height x width) of uint8.
+        The array shares memory with the grid, no cells are copied.
+        """
+
+        import numpy as np
+        return np.frombuffer(self.cells, dtype=np.uint8).reshape(self.height, self.width)
+
+    def get_claimed_blocks(self, block_size):
+        """
+        Get the positions (block x, block y) of the blocks of block_size x block_size cells
+        that contain at least one claimed (non neutral) cell.
+        """
+
+        import numpy as np
+        claimed = self.to_array() != self.NEUTRAL
+        blocks_high, blocks_wide = -(-self.height // block_size), -(-self.width // block_size)
+        padded = np.zeros((blocks_high * block_size, blocks_wide * block_size), dtype=bool)
+        padded[:self.height, :self.width] = claimed
+        block_y, block_x = np.nonzero(padded.reshape(blocks_high, block_size, blocks_wide, block_size).any(axis=(1, 3)))
+        return list(zip(block_x.tolist(), block_y.tolist()))
+
+    def count_cells(self, state):
+        """
+        Count the cells in the given state.
+        """
+
+        if isinstance(self.cells, memoryview):
+            return self.cells.tobytes().count(state)
+        return self.cells.count(state)
+
     def set_cell(self, x, y, state):
         """
         Set the state of a cell at a given coordinate.
         """
 
         if 0 <= x < self.width and 0 <= y < self.height:
-            self.cells[y][x] = state
+            old_state = self.get_cell(x, y)
+            if old_state == state:
+                return
+
+            self.write_cell(x, y, state)
+            self.version += 1
+
+            if self.board_hash is not None:
+                index = y * self.width + x
+                if old_state != self.NEUTRAL:
+                    self.board_hash ^= zobrist_key(index, old_state)
+                if state != self.NEUTRAL:
+                    self.board_hash ^= zobrist_key(index, state)
+
+            # Only the cell and its neighbors can enter or leave a frontier
+            if self.frontiers is not None:
+                if old_state != self.NEUTRAL:
+                    self.frontiers[old_state].discard((x, y))
+                self.update_frontier(x, y)
+                self.update_frontier(x, y - 1)
+                self.update_frontier(x + 1, y)
+                self.update_frontier(x, y + 1)
+                self.update_frontier(x - 1, y)
+
+            for observer in self.observers:
+                observer.cell_changed(x, y, old_state, state)
+
+    def get_hash(self):
+        """
+        Get the Zobrist hash of the cells: boards with the same cells have the same hash
+        (on every machine), different boards almost certainly not.
+        Kept up to date by set_cell() in constant time, only reloaded cells are hashed again.
+        """
+
+        if self.board_hash is None:
+            self.board_hash = self.calculate_hash()
+        return self.board_hash
+
+    def calculate_hash(self):
+        """
+        Hash all cells from scratch (vectorized).
+        """
+
+        import numpy as np
+        cells = np.frombuffer(self.cells, dtype=np.uint8)
+        indices = np.flatnonzero(cells != self.NEUTRAL)
+        return zobrist_hash(indices, cells[indices])
+
+    def get_hash_after(self, changes):
+        """
+        Get the hash the board will have once a list of changes ([[x, y, state], ...]) is applied,
+        without applying them. Takes time in proportion to the number of changes.
+        """
+
+        board_hash = self.get_hash()
+        new_states = {} # Index -> state of the cells changed by earlier changes of the list
+
+        for x, y, state in changes:
+            if not (0 <= x < self.width and 0 <= y < self.height):
+                continue
+            index = y * self.width + x
+            old_state = new_states.get(index)
+            if old_state is None:
+                old_state = self.get_cell(x, y)
+            if old_state == state:
+                continue
+
+            if old_state != self.NEUTRAL:
+                board_hash ^= zobrist_key(index, old_state)
+            if state != self.NEUTRAL:
+                board_hash ^= zobrist_key(index, state)
+            new_states[index] = state
+
+        return board_hash
+
+    def add_observer(self, observer):
+        """
+        Keep an object informed about changes of the cells. The observer needs two methods:
+        cell_changed(x, y, old_state, new_state), called by set_cell() after a cell changed, and
+        cells_reloaded(), called after all cells were replaced (load_bytes()).
+        Copies of the grid don't take over the observers.
+        """
+
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        """
+        Stop informing an observer about changes.
+        """
+
+        self.observers.remove(observer)
+
+    def write_cell(self, x, y, state):
+        """
+        Store a cell state. Coordinates are already checked by set_cell().
+        Grids with a different storage override this method.
+        """
+
+        self.cells[y * self.width + x] = state
 
     def get_cell(self, x, y):
         """
@@ -36,13 +361,89 @@ class Grid:
         """
 
         if 0 <= x < self.width and 0 <= y < self.height:
-            return self.cells[y][x]
+            return self.cells[y * self.width + x]
         return None
 
+    def is_frontier_cell(self, x, y):
+        """
+        Check if a cell is owned by a player and has a neighbor that isn't owned by the same player.
+        Cells outside the grid don't count as neighbors.
+        """
+
+        state = self.get_cell(x, y)
+        if state is None or state == self.NEUTRAL:
+            return False
+
+        for neighbor_x, neighbor_y in ((x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y)):
+            neighbor_state = self.get_cell(neighbor_x, neighbor_y)
+            if neighbor_state is not None and neighbor_state != state:
+                return True
+        return False
+
+    def update_frontier(self, x, y):
+        """
+        Add a cell to or remove it from its owner's frontier.
+        """
+
+        state = self.get_cell(x, y)
+        if state is None or state == self.NEUTRAL:
+            return
+
+        frontier = self.frontiers.setdefault(state, set())
+        if self.is_frontier_cell(x, y):
+            frontier.add((x, y))
+        else:
+            frontier.discard((x, y))
+
+    def rebuild_frontiers(self):
+        """
+        Rebuild all frontiers from scratch, after the cells were replaced as a whole.
+        Completely neutral rows are skipped.
+        """
+
+        self.frontiers = {}
+        for y in range(self.height):
+            row = bytes(self.cells[y * self.width:(y + 1) * self.width])
+            if row.count(self.NEUTRAL) == self.width:
+                continue
+            for x in range(self.width):
+                if row[x] != self.NEUTRAL:
+                    self.update_frontier(x, y)
+
+    def get_frontier(self, player_id):
+        """
+        Get the border cells of a player (don't modify the returned set).
+        After the cells were replaced as a whole, the first call rebuilds the frontiers.
+        """
+
+        if self.frontiers is None:
+            self.rebuild_frontiers()
+        return self.frontiers.get(player_id, set())
+
+    def find_nearest_cell(self, x, y, player_id):
+        """
+        Find the cell of a player closest to (x, y) or None if the player has no cells.
+        The closest cell is always a border cell (or (x, y) itself), so only the frontier is searched.
+        """
+
+        if self.get_cell(x, y) == player_id:
+            return (x, y)
+
+        nearest_cell = None
+        nearest_distance = None
+        for cell_x, cell_y in self.get_frontier(player_id):
+            distance = (cell_x - x) ** 2 + (cell_y - y) ** 2
+            if nearest_distance is None or distance < nearest_distance:
+                nearest_distance = distance
+                nearest_cell = (cell_x, cell_y)
+        return nearest_cell
+
     def draw(self, surface, linecolor):
         """
         Draw the grid on the given surface.
         """
+        # Only drawing needs pygame, the rest of the grid works without it
+        import pygame
 
         for y in range(self.height):
             for x in range(self.width):
@@ -52,7 +453,7 @@ class Grid:
                     self.cell_size,
                     self.cell_size
                 )
-                pygame.draw.rect(surface, self.colors[self.cells[y][x]], rect)
+                pygame.draw.rect(surface, self.colors[self.cells[y * self.width + x]], rect)
                 pygame.draw.rect(surface, linecolor, rect, 1)  # Grid lines
 
     def update_player_colors(self, player1_color, player2_color):
@@ -61,4 +462,340 @@ class Grid:
         """
 
         self.colors[self.PLAYER1] = player1_color
-        self.colors[self.PLAYER2] = player2_color
\ No newline at end of file
+        self.colors[self.PLAYER2] = player2_color
+        self.version += 1
+
+
+class TiledGrid(Grid):
+    """
+    A grid for very large boards that only stores the parts players have claimed.
+
+    The board is split into square chunks. A chunk is allocated the first time one
+    of its cells is set to a non neutral state and freed again when it is completely
+    neutral, so memory grows with the conquered territory and not with the board size.
+    Each chunk counts how many cells every state owns.
+
+    Subclass of Grid with the same get_cell/set_cell/draw contract.
+    """
+
+    def __init__(self, width, height, cell_size, chunk_size=64):
+        # Skip Grid.__init__'s cell buffer, that is exactly what this class avoids
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.chunk_size = chunk_size
+
+        self.chunks = {} # (chunk x, chunk y) -> bytearray of chunk_size * chunk_size cells
+        self.chunk_counts = {} # (chunk x, chunk y) -> {state: number of non neutral cells}
+        self.state_counts = {} # state -> number of cells on the whole board (neutral excluded)
+        self.frontiers = {}
+        self.version = 0
+        self.board_hash = 0
+        self.observers = []
+
+        self.colors = {
+            self.NEUTRAL: (100,100,100), # Gray
+            self.PLAYER1: (255,150,150), # Pink
+            self.PLAYER2: (255,200,150) # Yellow
+        }
+
+    def copy(self):
+        """
+        Create an independent copy of the grid (only the allocated chunks are copied).
+        """
+
+        grid_copy = TiledGrid(self.width, self.height, self.cell_size, self.chunk_size)
+        grid_copy.chunks = {key: bytearray(chunk) for key, chunk in self.chunks.items()}
+        grid_copy.chunk_counts = {key: dict(counts) for key, counts in self.chunk_counts.items()}
+        grid_copy.state_counts = dict(self.state_counts)
+        if self.frontiers is not None:
+            grid_copy.frontiers = {state: set(cells) for state, cells in self.frontiers.items()}
+        else:
+            grid_copy.frontiers = None
+        grid_copy.colors = dict(self.colors)
+        grid_copy.board_hash = self.board_hash
+        return grid_copy
+
+    def get_cell(self, x, y):
+        """
+        Get the state of a cell at the given coordinates.
+        """
+
+        if 0 <= x < self.width and 0 <= y < self.height:
+            chunk = self.chunks.get((x // self.chunk_size, y // self.chunk_size))
+            if chunk is None:
+                return self.NEUTRAL
+            return chunk[(y % self.chunk_size) * self.chunk_size + x % self.chunk_size]
+        return None
+
+    def write_cell(self, x, y, state):
+        """
+        Store a cell state, allocating or freeing its chunk when needed.
+        """
+
+        key = (x // self.chunk_size, y // self.chunk_size)
+        chunk = self.chunks.get(key)
+
+        if chunk is None:
+            if state == self.NEUTRAL:
+                return
+            chunk = bytearray(self.chunk_size * self.chunk_size)
+            self.chunks[key] = chunk
+            self.chunk_counts[key] = {}
+
+        index = (y % self.chunk_size) * self.chunk_size + x % self.chunk_size
+        old_state = chunk[index]
+        if old_state == state:
+            return
+        chunk[index] = state
+
+        counts = self.chunk_counts[key]
+        if old_state != self.NEUTRAL:
+            counts[old_state] -= 1
+            self.state_counts[old_state] -= 1
+        if state != self.NEUTRAL:
+            counts[state] = counts.get(state, 0) + 1
+            self.state_counts[state] = self.state_counts.get(state, 0) + 1
+
+        # Free chunks that went back to neutral
+        if not any(counts.values()):
+            del self.chunks[key]
+            del self.chunk_counts[key]
+
+    def get_claimed_blocks(self, block_size):
+        """
+        Get the positions (block x, block y) of the blocks of block_size x block_size cells
+        that contain at least one claimed (non neutral) cell. Only allocated chunks are looked at,
+        blocks overlapping a chunk with claimed cells are listed even if their part of it is neutral.
+        """
+
+        blocks = set()
+        size = self.chunk_size
+        for (chunk_x, chunk_y), chunk in self.chunks.items():
+            if chunk.count(self.NEUTRAL) == len(chunk):
+                continue
+
+            # Blocks overlapping the chunk
+            left, top = chunk_x * size, chunk_y * size
+            for block_y in range(top // block_size, (min(top + size, self.height) - 1) // block_size + 1):
+                for block_x in range(left // block_size, (min(left + size, self.width) - 1) // block_size + 1):
+                    blocks.add((block_x, block_y))
+        return sorted(blocks)
+
+    def count_cells(self, state):
+        """
+        Count the cells in the given state (without looking at a single cell).
+        """
+
+        if state == self.NEUTRAL:
+            return self.width * self.height - sum(self.state_counts.values())
+        return self.state_counts.get(state, 0)
+
+    def get_row(self, y, x0, x1):
+        """
+        Get the states of the cells x0 to x1 (exclusive) in row y as a bytearray.
+        """
+
+        row = bytearray(x1 - x0)
+        local_y = (y % self.chunk_size) * self.chunk_size
+        chunk_y = y // self.chunk_size
+
+        for chunk_x in range(x0 // self.chunk_size, (x1 - 1) // self.chunk_size + 1):
+            chunk = self.chunks.get((chunk_x, chunk_y))
+            if chunk is None:
+                continue
+            start = max(x0, chunk_x * self.chunk_size)
+            end = min(x1, (chunk_x + 1) * self.chunk_size)
+            local_x = start - chunk_x * self.chunk_size
+            row[start - x0:end - x0] = chunk[local_y + local_x:local_y + local_x + end - start]
+
+        return row
+
+    def get_region(self, x0, y0, x1, y1):
+        """
+        Get the states of all cells in a rectangle as bytes (row by row).
+        The rectangle is clipped to the grid, x1 and y1 are exclusive.
+        """
+
+        import numpy as np
+
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.width, x1), min(self.height, y1)
+        if x1 <= x0 or y1 <= y0:
+            return b""
+
+        # Copy the overlapping part of every allocated chunk, the rest stays neutral
+        region = np.full((y1 - y0, x1 - x0), self.NEUTRAL, dtype=np.uint8)
+        size = self.chunk_size
+        for chunk_y in range(y0 // size, (y1 - 1) // size + 1):
+            for chunk_x in range(x0 // size, (x1 - 1) // size + 1):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk is None:
+                    continue
+                top, bottom = max(y0, chunk_y * size), min(y1, (chunk_y + 1) * size)
+                left, right = max(x0, chunk_x * size), min(x1, (chunk_x + 1) * size)
+                cells = np.frombuffer(chunk, dtype=np.uint8).reshape(size, size)
+                region[top - y0:bottom - y0, left - x0:right - x0] = \
+                    cells[top - chunk_y * size:bottom - chunk_y * size, left - chunk_x * size:right - chunk_x * size]
+
+        return region.tobytes()
+
+    def to_bytes(self):
+        """
+        Get all cell states as bytes, row by row (one byte per cell).
+        """
+
+        return self.get_region(0, 0, self.width, self.height)
+
+    def to_array(self):
+        """
+        Get the cells as a 2-D NumPy array (height x width) of uint8.
+        Unlike Grid.to_array() this builds a copy of the whole board.
+        """
+
+        import numpy as np
+        return np.frombuffer(self.to_bytes(), dtype=np.uint8).reshape(self.height, self.width)
+
+    def write_cells(self, file):
+        """
+        Write all cell states to a file row by row, without building the whole board in memory.
+        """
+
+        for y in range(self.height):
+            file.write(self.get_row(y, 0, self.width))
+
+    def load_bytes(self, data):
+        """
+        Replace all cell states with the states from to_bytes().
+        """
+
+        if len(data) != self.width * self.height:
+            raise ValueError(f"Expected {self.width * self.height} cells, got {len(data)}")
+        self.load_rows(data)
+
+    @classmethod
+    def load(cls, path, cell_size, chunk_size=64):
+        """
+        Load a grid from a snapshot file written by save() (of a Grid or a TiledGrid).
+
+        The file is memory mapped and read row by row, only chunks with claimed cells are allocated.
+        """
+
+        with open(path, "rb") as file:
+            mapped_file = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            width, height, colors, cells_offset = cls.read_snapshot_header(mapped_file, path)
+            grid = cls(width, height, cell_size, chunk_size)
+            grid.colors.update(colors)
+            grid.load_rows(mapped_file, cells_offset)
+        finally:
+            mapped_file.close()
+        return grid
+
+    def load_rows(self, data, offset=0):
+        """
+        Replace all cell states with the states stored row by row in data (bytes or a mapped file),
+        starting at offset.
+        """
+
+        self.chunks = {}
+        self.chunk_counts = {}
+        self.state_counts = {}
+
+        for y in range(self.height):
+            row = data[offset + y * self.width:offset + (y + 1) * self.width]
+            # Skip completely neutral rows
+            if row.count(self.NEUTRAL) == self.width:
+                continue
+            for x, state in enumerate(row):
+                if state != self.NEUTRAL:
+                    self.write_cell(x, y, state)
+
+        self.version += 1
+        self.board_hash = None
+        self.frontiers = None # Only rebuilt when needed, see get_frontier()
+        for observer in self.observers:
+            observer.cells_reloaded()
+
+    def calculate_hash(self):
+        """
+        Hash all cells from scratch, only looking at allocated chunks (neutral cells have no key).
+        """
+
+        import numpy as np
+
+        board_hash = 0
+        size = self.chunk_size
+        for (chunk_x, chunk_y), chunk in self.chunks.items():
+            cells = np.frombuffer(chunk, dtype=np.uint8)
+            local = np.flatnonzero(cells != self.NEUTRAL)
+            indices = (chunk_y * size + local // size) * self.width + chunk_x * size + local % size
+            board_hash ^= zobrist_hash(indices, cells[local])
+        return board_hash
+
+    def rebuild_frontiers(self):
+        """
+        Rebuild all frontiers from scratch, only looking at allocated chunks.
+        """
+
+        self.frontiers = {}
+        for (chunk_x, chunk_y), chunk in self.chunks.items():
+            for index, state in enumerate(chunk):
+                if state != self.NEUTRAL:
+                    self.update_frontier(chunk_x * self.chunk_size + index % self.chunk_size,
+                                         chunk_y * self.chunk_size + index // self.chunk_size)
+
+    def diff(self, other):
+        """
+        Get the coordinates of all cells that differ from another TiledGrid of the same size.
+        Only chunks allocated in one of the grids are compared.
+        """
+
+        changed_cells = []
+        empty_chunk = bytes(self.chunk_size * self.chunk_size)
+
+        for key in set(self.chunks) | set(other.chunks):
+            chunk = self.chunks.get(key, empty_chunk)
+            other_chunk = other.chunks.get(key, empty_chunk)
+            if chunk == other_chunk:
+                continue
+
+            chunk_x, chunk_y = key
+            for index in range(len(chunk)):
+                if chunk[index] != other_chunk[index]:
+                    changed_cells.append((chunk_x * self.chunk_size + index % self.chunk_size,
+                                          chunk_y * self.chunk_size + index // self.chunk_size))
+
+        return changed_cells
+
+    def draw(self, surface, linecolor):
+        """
+        Draw the grid on the given surface.
+        Only the cells covered by the surface are drawn, and neutral cells are drawn
+        as one background fill, so the cost depends on the surface and the claimed chunks.
+        """
+
+        import pygame
+
+        visible_width = min(self.width, surface.get_width() // self.cell_size + 1)
+        visible_height = min(self.height, surface.get_height() // self.cell_size + 1)
+
+        # Neutral background
+        surface.fill(self.colors[self.NEUTRAL], pygame.Rect(0, 0, visible_width * self.cell_size, visible_height * self.cell_size))
+
+        # Claimed cells
+        for (chunk_x, chunk_y), chunk in self.chunks.items():
+            if chunk_x * self.chunk_size >= visible_width or chunk_y * self.chunk_size >= visible_height:
+                continue
+            for index, state in enumerate(chunk):
+                if state != self.NEUTRAL:
+                    x = chunk_x * self.chunk_size + index % self.chunk_size
+                    y = chunk_y * self.chunk_size + index // self.chunk_size
+                    surface.fill(self.colors[state], pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size))
+
+        # Grid lines
+        for y in range(visible_height):
+            for x in range(visible_width):
+                rect = pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size)
+                pygame.draw.rect(surface, linecolor, rect, 1)
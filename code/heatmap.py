@@ -0,0 +1,380 @@
+import threading, time
+import numpy as np
+from ai_player import simulate_move
+
+# Width and height of the blocks of cells the results are stored in
+TILE_SIZE = 32
+
+# Shortest time between two redraws of a heatmap that is being refined, in seconds
+REDRAW_INTERVAL = 0.25
+
+
+class Heatmap:
+    """
+    Expected gain of one action for every possible starting cell of the board.
+    The values are refined sample by sample, so a rough heatmap is available early.
+
+    Only the cells of the area the worker is asked for are sampled (the visible cells), and
+    the results are stored in tiles of TILE_SIZE x TILE_SIZE cells that are allocated when one
+    of their cells is sampled, so memory and time don't grow with the size of the board.
+    """
+
+    def __init__(self, board, action, player_id, samples):
+        """
+        Args:
+            board: Copy of the board the heatmap is calculated for (see HeatmapWorker)
+            action: The PlayerAction to sample
+            player_id: The player using the action
+            samples: Number of simulations per cell
+        """
+        self.action = action
+        self.player_id = player_id
+        self.samples = samples
+
+        # Distance around a changed cell in which results are no longer valid
+        self.reach = action.create_automaton(board, player_id).reach()
+
+        # (tile x, tile y) -> [totals, counts, epochs]: sum of all scores and number of simulations
+        # per cell, and a counter incremented when a cell is invalidated, so results of simulations
+        # that were already running for the old board are thrown away
+        self.tiles = {}
+
+        # Highest average gain so far (at least 1, for scaling)
+        self.max_value = 1
+
+        # Cells with the fewest samples in the area, simulated in this order (progressive refinement)
+        self.queue = None
+        self.queue_area = None
+        self.queue_position = 0
+
+        # Incremented whenever a value changes
+        self.version = 0
+
+        # Version that was last handed out for redrawing, see get_redraw_version()
+        self.redraw_version = 0
+        self.redraw_time = 0
+
+    def get_tile(self, x, y):
+        """
+        Get the arrays of the tile containing a cell, allocating them on first use.
+        """
+        key = (x // TILE_SIZE, y // TILE_SIZE)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = [np.zeros((TILE_SIZE, TILE_SIZE)), np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.int32),
+                    np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.int32)]
+            self.tiles[key] = tile
+        return tile
+
+    def get_area_arrays(self, x0, y0, x1, y1):
+        """
+        Get the totals and counts of a rectangle of cells (x1 and y1 exclusive) as 2-D arrays.
+        """
+        totals = np.zeros((y1 - y0, x1 - x0))
+        counts = np.zeros((y1 - y0, x1 - x0), dtype=np.int32)
+
+        for tile_y in range(y0 // TILE_SIZE, -(-y1 // TILE_SIZE)):
+            for tile_x in range(x0 // TILE_SIZE, -(-x1 // TILE_SIZE)):
+                tile = self.tiles.get((tile_x, tile_y))
+                if tile is None:
+                    continue
+
+                # Overlap of the tile and the rectangle
+                left, top = max(x0, tile_x * TILE_SIZE), max(y0, tile_y * TILE_SIZE)
+                right, bottom = min(x1, (tile_x + 1) * TILE_SIZE), min(y1, (tile_y + 1) * TILE_SIZE)
+                tile_slice = (slice(top - tile_y * TILE_SIZE, bottom - tile_y * TILE_SIZE),
+                              slice(left - tile_x * TILE_SIZE, right - tile_x * TILE_SIZE))
+                area_slice = (slice(top - y0, bottom - y0), slice(left - x0, right - x0))
+                totals[area_slice] = tile[0][tile_slice]
+                counts[area_slice] = tile[1][tile_slice]
+
+        return totals, counts
+
+    def is_complete(self, area):
+        """
+        Check if every cell of an area (x0, y0, x1, y1) has all its samples.
+        """
+        return self.get_area_arrays(*area)[1].min(initial=self.samples) >= self.samples
+
+    def invalidate(self, changed_cells):
+        """
+        Reset the cells whose result could be affected by the changed cells (list of (x, y)).
+        """
+        # Only sampled tiles have anything to reset
+        changed = np.array(changed_cells)
+        for (tile_x, tile_y), (totals, counts, epochs) in self.tiles.items():
+            left, top = tile_x * TILE_SIZE, tile_y * TILE_SIZE
+            near = changed[(changed[:, 0] >= left - self.reach) & (changed[:, 0] < left + TILE_SIZE + self.reach)
+                           & (changed[:, 1] >= top - self.reach) & (changed[:, 1] < top + TILE_SIZE + self.reach)]
+            if not len(near):
+                continue
+
+            reset = np.zeros((TILE_SIZE, TILE_SIZE), dtype=bool)
+            for changed_x, changed_y in near.tolist():
+                reset[max(0, changed_y - self.reach - top):changed_y + self.reach + 1 - top,
+                      max(0, changed_x - self.reach - left):changed_x + self.reach + 1 - left] = True
+            totals[reset] = 0
+            counts[reset] = 0
+            epochs[reset] += 1
+
+        # The highest value may have been reset
+        self.max_value = 1
+        for totals, counts, epochs in self.tiles.values():
+            sampled = counts > 0
+            if sampled.any():
+                self.max_value = max(self.max_value, float((totals[sampled] / counts[sampled]).max()))
+
+        self.queue = None
+        self.version += 1
+
+    def next_cell(self, area):
+        """
+        Get the next cell of an area (x0, y0, x1, y1) to simulate: the cells with the fewest
+        samples, row by row. This refines the area evenly (progressive refinement).
+        Returns None if the area is complete.
+        """
+        if area != self.queue_area:
+            self.queue = None
+            self.queue_area = area
+
+        while True:
+            if self.queue is None:
+                # Next round: all cells of the area with the fewest samples
+                x0, y0, x1, y1 = area
+                counts = self.get_area_arrays(x0, y0, x1, y1)[1]
+                lowest = counts.min(initial=self.samples)
+                rows, columns = np.nonzero(counts == lowest) if lowest < self.samples else ((), ())
+                self.queue = list(zip((columns + x0).tolist(), (rows + y0).tolist())) if len(rows) else []
+                self.queue_position = 0
+
+            while self.queue_position < len(self.queue):
+                x, y = self.queue[self.queue_position]
+                self.queue_position += 1
+                if self.get_tile(x, y)[1][y % TILE_SIZE, x % TILE_SIZE] < self.samples:
+                    return (x, y)
+
+            if not self.queue:
+                return None
+            self.queue = None
+
+    def add_sample(self, x, y, epoch, score):
+        """
+        Add the score of a simulation started at (x, y), unless the cell was invalidated
+        since the simulation started (its epoch changed).
+        """
+        totals, counts, epochs = self.get_tile(x, y)
+        tile_x, tile_y = x % TILE_SIZE, y % TILE_SIZE
+        if epochs[tile_y, tile_x] != epoch:
+            return
+
+        totals[tile_y, tile_x] += score
+        counts[tile_y, tile_x] += 1
+        self.max_value = max(self.max_value, float(totals[tile_y, tile_x] / counts[tile_y, tile_x]))
+        self.version += 1
+
+    def get_redraw_version(self):
+        """
+        Get the version views should redraw for: it follows version, but while samples arrive
+        at most every REDRAW_INTERVAL seconds, so a heatmap being refined doesn't redraw the board
+        every frame. Views have to ask every frame to see the last samples.
+        """
+        now = time.monotonic()
+        if self.version != self.redraw_version and now - self.redraw_time >= REDRAW_INTERVAL:
+            self.redraw_version = self.version
+            self.redraw_time = now
+        return self.redraw_version
+
+    def get_value(self, x, y):
+        """
+        Get the average gain of starting at (x, y) or None if no sample is ready yet.
+        """
+        tile = self.tiles.get((x // TILE_SIZE, y // TILE_SIZE))
+        if tile is None or tile[1][y % TILE_SIZE, x % TILE_SIZE] == 0:
+            return None
+        return tile[0][y % TILE_SIZE, x % TILE_SIZE] / tile[1][y % TILE_SIZE, x % TILE_SIZE]
+
+    def get_values(self, x0, y0, x1, y1):
+        """
+        Get the average gains of a rectangle of cells (x1 and y1 exclusive) as a 2-D array,
+        NaN where no sample is ready yet.
+        """
+        totals, counts = self.get_area_arrays(x0, y0, x1, y1)
+        values = np.full(totals.shape, np.nan)
+        np.divide(totals, counts, out=values, where=counts > 0)
+        return values
+
+    def get_max_value(self):
+        """
+        Get the highest average gain on the board (at least 1, so it can be used for scaling).
+        """
+        return self.max_value
+
+
+class HeatmapWorker:
+    """
+    Calculates heatmaps for a player's actions in a background thread.
+
+    The selected action is refined first, the player's other actions afterwards,
+    so a heatmap is usually ready before an action is even selected.
+    Heatmaps are cached per player and action, and a board change only
+    invalidates the cells in reach of the changed cells.
+    Only the area given to update() (usually the visible cells) is sampled.
+
+    All heatmaps are calculated on one copy of the board. The worker observes the real board
+    (see Grid.add_observer()) and the background thread applies the changed cells to its copy
+    between two simulations, so the board is only copied once (and again if it is reloaded).
+    """
+
+    def __init__(self, samples=8):
+        self.samples = samples
+
+        self.heatmaps = {} # (player_id, action name) -> Heatmap
+        self.targets = [] # Heatmaps to work on, most important first
+        self.area = None # Cells to sample as x0, y0, x1, y1 (x1 and y1 exclusive)
+
+        self.grid = None # Observed board
+        self.board = None # The worker's copy of the board, only changed by the background thread
+        self.changes = [] # Cells changed on the board since the copy was updated, as (x, y, state)
+
+        self.lock = threading.Lock()
+        self.work_available = threading.Event()
+        self.thread = None
+        self.running = False
+
+    def cell_changed(self, x, y, old_state, new_state):
+        """
+        Called by the observed grid (see Grid.add_observer()).
+        """
+        with self.lock:
+            self.changes.append((x, y, new_state))
+
+    def cells_reloaded(self):
+        """
+        Called by the observed grid after all its cells were replaced: start over with a new copy.
+        """
+        with self.lock:
+            self.copy_board()
+
+    def copy_board(self):
+        """
+        Copy the observed board. The heatmaps of the old board are dropped, running simulations
+        add their results to the dropped heatmaps. Call with the lock held.
+        """
+        self.board = self.grid.copy()
+        self.changes = []
+        self.heatmaps = {}
+        self.targets = []
+
+    def update(self, grid, player_id, actions, selected_action=None, area=None):
+        """
+        Tell the worker what to calculate - call this every frame.
+        The area (x0, y0, x1, y1) is the rectangle of cells to sample, default the whole board.
+        Starts the background thread on first use.
+        """
+        with self.lock:
+            if grid is not self.grid:
+                if self.grid is not None:
+                    self.grid.remove_observer(self)
+                self.grid = grid
+                grid.add_observer(self)
+                self.copy_board()
+
+            self.area = area if area is not None else (0, 0, grid.width, grid.height)
+            targets = []
+            for action in actions:
+                key = (player_id, action.name)
+                heatmap = self.heatmaps.get(key)
+                if heatmap is None:
+                    heatmap = Heatmap(self.board, action, player_id, self.samples)
+                    self.heatmaps[key] = heatmap
+
+                if action is selected_action:
+                    targets.insert(0, heatmap)
+                else:
+                    targets.append(heatmap)
+
+            self.targets = targets
+
+        self.work_available.set()
+
+        if self.thread is None:
+            self.running = True
+            self.thread = threading.Thread(target=self.work, daemon=True)
+            self.thread.start()
+
+    def pause(self):
+        """
+        Stop working until update() is called again (e.g. during animations).
+        """
+        with self.lock:
+            self.targets = []
+
+    def get_heatmap(self, player_id, action):
+        """
+        Get the (possibly still incomplete) heatmap of an action or None.
+        """
+        with self.lock:
+            return self.heatmaps.get((player_id, action.name))
+
+    def apply_changes(self):
+        """
+        Apply the cells changed on the observed board to the worker's copy and invalidate
+        the heatmaps around them. Called by the background thread with the lock held.
+        """
+        if not self.changes:
+            return
+
+        changed_cells = set()
+        for x, y, state in self.changes:
+            self.board.set_cell(x, y, state)
+            changed_cells.add((x, y))
+        self.changes = []
+
+        changed_cells = list(changed_cells)
+        for heatmap in self.heatmaps.values():
+            heatmap.invalidate(changed_cells)
+
+    def work(self):
+        """
+        Background thread: simulate one cell at a time for the most important unfinished heatmap.
+        """
+        while self.running:
+            with self.lock:
+                self.apply_changes()
+
+                job = None
+                for heatmap in self.targets:
+                    cell = heatmap.next_cell(self.area)
+                    if cell is not None:
+                        x, y = cell
+                        totals, counts, epochs = heatmap.get_tile(x, y)
+                        tile_x, tile_y = x % TILE_SIZE, y % TILE_SIZE
+                        # The n-th sample of a cell uses seed n, like the AI does, so both share cached runs
+                        job = (heatmap, self.board, x, y, int(epochs[tile_y, tile_x]), int(counts[tile_y, tile_x]))
+                        break
+
+                if job is None:
+                    self.work_available.clear()
+
+            if job is None:
+                # Nothing left to do, sleep until update() is called
+                self.work_available.wait()
+                continue
+
+            heatmap, board, x, y, epoch, seed = job
+            score = simulate_move(board, heatmap.action, heatmap.player_id, x, y, seed)
+
+            with self.lock:
+                # The result is thrown away if the cell was invalidated in the meantime
+                heatmap.add_sample(x, y, epoch, score)
+
+    def stop(self):
+        """
+        Stop the background thread and the observing of the board.
+        """
+        self.running = False
+        self.work_available.set()
+        with self.lock:
+            if self.grid is not None:
+                self.grid.remove_observer(self)
+                self.grid = None
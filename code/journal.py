@@ -0,0 +1,166 @@
+"""
+Undo, redo and checkpoints for the cells of a grid.
+"""
+
+
+class ChangeJournal:
+    """
+    Records every change of a grid's cells together with the cell's previous state, grouped
+    into moves, so moves can be taken back and made again in O(changed cells) instead of
+    copying the board. Search and previews can apply a move, look at the board and undo it.
+
+    The journal observes its grid (see Grid.add_observer()), so it records changes no matter
+    who makes them. Undo and redo use set_cell(), other observers see them like any change.
+
+    History is linear: a change made after an undo starts a new branch and drops the moves
+    that could have been redone. Checkpoints mark a point in the history to return to.
+
+           Arguments:
+            grid (Grid): The grid to record (a Grid or TiledGrid)
+    """
+    def __init__(self, grid):
+        self.grid = grid
+        self.changes = [] # (x, y, old_state, new_state) in the order they were made
+        self.move_starts = [] # Index of the first change of every move (applied and undone ones)
+        self.move_ids = [] # Unique number of every move, to recognize checkpoints
+        self.move_count = 0 # Number of applied moves, the moves after them can be redone
+        self.next_move_id = 0
+        self.move_open = False # Changes are added to the last applied move
+        self.replaying = False # Undo or redo is changing the cells
+        self.history = 0 # Counts clear() calls, checkpoints of a cleared history can't be restored
+        grid.add_observer(self)
+
+    def close(self):
+        """
+        Stop recording the grid.
+        """
+        self.grid.remove_observer(self)
+
+    def clear(self):
+        """
+        Forget the whole history.
+        """
+        self.changes = []
+        self.move_starts = []
+        self.move_ids = []
+        self.move_count = 0
+        self.move_open = False
+        self.history += 1
+
+    def begin_move(self):
+        """
+        Start a new move: the following changes are undone and redone together.
+        """
+        self.drop_redo()
+        self.move_starts.append(len(self.changes))
+        self.move_ids.append(self.next_move_id)
+        self.next_move_id += 1
+        self.move_count += 1
+        self.move_open = True
+
+    def apply(self, changes):
+        """
+        Apply a list of changes ([[x, y, state], ...], as automata return them) as one move.
+        """
+        self.begin_move()
+        for x, y, state in changes:
+            self.grid.set_cell(x, y, state)
+        self.move_open = False
+
+    def drop_redo(self):
+        """
+        Drop the undone moves (a new branch of the history starts).
+        """
+        if self.move_count < len(self.move_starts):
+            del self.changes[self.move_starts[self.move_count]:]
+            del self.move_starts[self.move_count:]
+            del self.move_ids[self.move_count:]
+
+    def cell_changed(self, x, y, old_state, new_state):
+        """
+        Record a change. Called by the grid.
+        """
+        if self.replaying:
+            return
+        if not self.move_open:
+            self.begin_move()
+        self.changes.append((x, y, old_state, new_state))
+
+    def cells_reloaded(self):
+        """
+        All cells were replaced, the recorded changes don't fit the board anymore. Called by the grid.
+        """
+        self.clear()
+
+    def get_move_changes(self, move_index):
+        """
+        Get the recorded changes of a move.
+        """
+        end = self.move_starts[move_index + 1] if move_index + 1 < len(self.move_starts) else len(self.changes)
+        return self.changes[self.move_starts[move_index]:end]
+
+    def get_redo_count(self):
+        """
+        Get the number of undone moves that can be redone.
+        """
+        return len(self.move_starts) - self.move_count
+
+    def undo(self):
+        """
+        Take back the last applied move.
+        Returns False if there is nothing to undo.
+        """
+        if self.move_count == 0:
+            return False
+
+        self.replaying = True
+        try:
+            for x, y, old_state, new_state in reversed(self.get_move_changes(self.move_count - 1)):
+                self.grid.set_cell(x, y, old_state)
+        finally:
+            self.replaying = False
+
+        self.move_count -= 1
+        self.move_open = False
+        return True
+
+    def redo(self):
+        """
+        Make the last undone move again.
+        Returns False if there is nothing to redo.
+        """
+        if self.move_count == len(self.move_starts):
+            return False
+
+        self.replaying = True
+        try:
+            for x, y, old_state, new_state in self.get_move_changes(self.move_count):
+                self.grid.set_cell(x, y, new_state)
+        finally:
+            self.replaying = False
+
+        self.move_count += 1
+        self.move_open = False
+        return True
+
+    def checkpoint(self):
+        """
+        Mark the current board state. Later changes start a new move, so restore() can return here.
+        """
+        self.move_open = False
+        return (self.history, self.move_count, self.move_ids[self.move_count - 1] if self.move_count else None)
+
+    def restore(self, checkpoint):
+        """
+        Undo (or redo) moves until the board is in the state of a checkpoint.
+        Raises ValueError if the checkpoint's moves were dropped by a new branch or clear().
+        """
+        history, move_count, move_id = checkpoint
+        if (history != self.history or move_count > len(self.move_starts)
+                or (move_count and self.move_ids[move_count - 1] != move_id)):
+            raise ValueError("The checkpoint is no longer part of the history")
+
+        while self.move_count > move_count:
+            self.undo()
+        while self.move_count < move_count:
+            self.redo()
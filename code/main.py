@@ -1,6 +1,20 @@
-import pygame, sys
+import sys, os, time
+from settings import load_settings, apply_action_settings #Imports the settings loader
+
+# Read the settings file and command line options (before anything slow is loaded, so --help is instant)
+settings = load_settings()
+if settings["display"]["video_driver"]:
+    os.environ["SDL_VIDEODRIVER"] = settings["display"]["video_driver"]
+
+import numpy as np
+import pygame
 from game_manager import GameManager #Imports GameManager class
-from ui import Button #Imports Button class
+from ui import Button, HitIndex, Label, LazyFont, Panel, UILayer, render_text, wait_for_events #Imports the UI classes and helpers
+from heatmap import HeatmapWorker #Imports HeatmapWorker class
+from preview import PreviewWorker #Imports PreviewWorker class
+from viewport import Viewport #Imports Viewport class
+from ownership_pyramid import OwnershipPyramid #Imports OwnershipPyramid class
+from minimap import Minimap #Imports Minimap class
 
 # Initialize Pygame
 pygame.init()
@@ -10,18 +24,27 @@ pygame.init()
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 WINDOW_TITLE = "Cell Wars"
-GRID_SIZE = 20  # Number of cells in each dimension
-CELL_SIZE = 20  # Size of each cell in pixels
+GRID_WIDTH = settings["board"]["width"]  # Number of cells in each dimension (boards larger than the viewport can be zoomed and panned)
+GRID_HEIGHT = settings["board"]["height"]
+CELL_SIZE = settings["board"]["cell_size"]  # Initial size of each cell in pixels
+VIEWPORT_SIZE = 400  # Size of the board area between the player panels in pixels
+MINIMAP_SIZE = 100  # Size of the overview of the whole board in pixels
+REPLAY_FOLDER = "replays"  # Folder where every game is recorded
+FRAME_RATE = settings["animation"]["frame_rate"]  # Frames per second of the game loop while something is moving
+NETWORK_PORT = settings["network"]["port"]
+
+# == Events
+NETWORK_EVENT = pygame.event.custom_type()  # Posted when a network message arrives or the connection changes
 
 # == Colors
 BLACK = (34,35,35)
 WHITE = (240, 246, 239)
 GREEN = (0,255,0)
 
-# == Font
-font = pygame.font.Font("font/mondwest.ttf", 24)
-title_font = pygame.font.Font("font/mondwest.ttf", 32)
-button_font = pygame.font.Font("font/mondwest.ttf", 18)
+# == Font (loaded on first use)
+font = LazyFont("font/mondwest.ttf", 24)
+title_font = LazyFont("font/mondwest.ttf", 32)
+button_font = LazyFont("font/mondwest.ttf", 18)
 
 # == Game window
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
@@ -30,39 +53,81 @@ pygame.display.set_caption(WINDOW_TITLE)
 
 # ==================== FUNCTION DEFINITIONS ==================== #
 
-def handle_input(mouse_pos, grid_x, grid_y, game_manager, action_buttons):
+def post_network_event(*args):
     """
-    Handles user input and events.
-    Returns True if the game is still running and grid coordinates.
+    Wake up the screen waiting in wait_for_events(). Called from network threads.
     """
+    # The network can still report a closed connection while the game shuts down
+    if pygame.display.get_init():
+        pygame.event.post(pygame.event.Event(NETWORK_EVENT))
 
-    # Calculate grid coordinates from mouse position
-    mouse_grid_x = (mouse_pos[0] - grid_x) // CELL_SIZE
-    mouse_grid_y = (mouse_pos[1] - grid_y) // CELL_SIZE
 
-    # Checks and updates button hover state according to mouse position
-    for button in action_buttons:
-        button.hover = button.is_over(mouse_pos)
+def get_idle_timeout(game_manager, current_time):
+    """
+    Get how long the game loop may sleep in milliseconds, because nothing happens on its own
+    until then (None = until the next event). Input and network messages wake it up earlier.
+    """
+    # The next animation step
+    if game_manager.animation_in_progress:
+        if game_manager.next_step_time is None:
+            return 0
+        return max(0, game_manager.next_step_time - current_time)
+
+    # The other player's move arrives as a NETWORK_EVENT
+    if (game_manager.is_networked and game_manager.waiting_for_remote and not game_manager.game_over
+            and not game_manager.network_manager.has_messages()):
+        return None
+
+    # The computer's move, the heatmaps and the player's input are checked every frame
+    return 0
+
+
+def handle_input(events, mouse_pos, viewport, minimap, game_manager, action_buttons, hit_index):
+    """
+    Handles user input and events (from wait_for_events()).
+    Returns True if the game is still running and grid coordinates (-1 if the mouse isn't over a cell).
+    """
+
+    # Look up what the mouse is over and update the hover state of the buttons it left and entered
+    previous = hit_index.hovered
+    hovered = hit_index.hover(mouse_pos)
+    if hovered is not previous:
+        for entry, hover in ((previous, False), (hovered, True)):
+            if isinstance(entry, tuple):
+                entry[0].hover = hover
+
+    # Calculate grid coordinates from mouse position
+    mouse_grid_x, mouse_grid_y = (hovered is viewport and get_mouse_cell(mouse_pos, viewport, minimap)) or (-1, -1)
 
     # Handle events
-    for event in pygame.event.get():
+    for event in events:
         # Quit
         if event.type == pygame.QUIT:
             return False, mouse_grid_x, mouse_grid_y
+        elif event.type in (pygame.MOUSEWHEEL, pygame.MOUSEMOTION, pygame.KEYDOWN):
+            handle_viewport_input(event, mouse_pos, viewport)
         elif event.type == pygame.MOUSEBUTTONDOWN:
+            # Left click on the minimap moves the view there
+            if event.button == 1 and minimap.is_over(mouse_pos):
+                minimap.center_viewport(mouse_pos)
+
             # Left click
-            if event.button == 1 and not game_manager.game_over and not game_manager.animation_in_progress:
+            elif event.button == 1 and not game_manager.game_over and not game_manager.animation_in_progress:
 
                 # Check for network turn (add this block)
                 if game_manager.is_networked and not game_manager.is_my_turn():
                     # Not our turn in network game, ignore input
                     continue
 
+                # The computer is playing this turn, ignore input
+                if game_manager.is_ai_turn():
+                    continue
+
                 # Check if an action button was clicked
-                handle_button_click(action_buttons, mouse_pos, game_manager)
+                handle_button_click(action_buttons, hovered, game_manager)
 
                 # Check if grid was clicked and action was selected
-                if game_manager.selected_action and (0 <= mouse_grid_x < GRID_SIZE and 0 <= mouse_grid_y < GRID_SIZE):
+                if game_manager.selected_action and mouse_grid_x >= 0:
                     game_manager.apply_action(mouse_grid_x, mouse_grid_y)
 
                     # Clear button selection
@@ -72,38 +137,92 @@ def handle_input(mouse_pos, grid_x, grid_y, game_manager, action_buttons):
     return True, mouse_grid_x, mouse_grid_y
 
 
-def handle_button_click(action_buttons, mouse_pos, game_manager):
+def get_mouse_cell(mouse_pos, viewport, minimap):
     """
-    Handles button clicks for action selection.
+    Get the cell under the mouse, or None if the mouse isn't over the board (or over the minimap on top of it).
     """
+    if minimap.is_over(mouse_pos):
+        return None
+    return viewport.screen_to_cell(mouse_pos)
 
-    action_length = len(game_manager.players[0].actions)
+
+def handle_viewport_input(event, mouse_pos, viewport):
+    """
+    Zoom and pan the board: mouse wheel over the board, dragging with the right or middle
+    mouse button, arrow keys, +/- and Home to show the whole board.
+    """
+    if event.type == pygame.MOUSEWHEEL:
+        if viewport.rect.collidepoint(mouse_pos):
+            if event.y > 0:
+                viewport.zoom_in(mouse_pos)
+            elif event.y < 0:
+                viewport.zoom_out(mouse_pos)
+
+    elif event.type == pygame.MOUSEMOTION:
+        # Middle or right button held down
+        if event.buttons[1] or event.buttons[2]:
+            viewport.pan(*event.rel)
+
+    elif event.type == pygame.KEYDOWN:
+        step = VIEWPORT_SIZE // 4
+        if event.key == pygame.K_LEFT:
+            viewport.pan(step, 0)
+        elif event.key == pygame.K_RIGHT:
+            viewport.pan(-step, 0)
+        elif event.key == pygame.K_UP:
+            viewport.pan(0, step)
+        elif event.key == pygame.K_DOWN:
+            viewport.pan(0, -step)
+        elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+            viewport.zoom_in()
+        elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            viewport.zoom_out()
+        elif event.key == pygame.K_HOME:
+            viewport.fit_board()
+
+
+def handle_button_click(action_buttons, hovered, game_manager):
+    """
+    Handles button clicks for action selection.
+    hovered is what the mouse is over (see create_hit_index()).
+    """
 
     # Clear selection on all buttons
     for button in action_buttons:
         button.selected = False
 
-    for i, button in enumerate(action_buttons):
-        if button.is_over(mouse_pos):
-            # Determine which player the button belongs to
-            player_idx = i // action_length # This will be 0 if player 1 and 1 if player 2 (so clever)
+    if isinstance(hovered, tuple):
+        button, player_idx, action = hovered
+
+        # Only allow current players button to be clicked
+        if player_idx == game_manager.current_player_index:
+            # Pass the action to GameManager
+            game_manager.select_action(action)
+            print(f"Selected action {action.name}")
+            button.selected = True
 
-            # Only allow current players button to be clicked
-            if player_idx == game_manager.current_player_index:
-                action_idx = i % action_length # Modulo leaves the reminder of division, but if a < b it just equals a
 
-                # Get the action object
-                action = game_manager.players[player_idx].actions[action_idx]
+def create_hit_index(action_buttons, game_manager, viewport):
+    """
+    Index the areas the mouse can point at, for finding the one under the mouse without testing all of them:
+    the board (the viewport) and every action button as (button, player index, action).
+    """
+    hit_index = HitIndex((SCREEN_WIDTH, SCREEN_HEIGHT))
+    hit_index.add(viewport.rect, viewport)
+
+    action_length = len(game_manager.players[0].actions)
+    for i, button in enumerate(action_buttons):
+        # Determine which player the button belongs to
+        player_idx = i // action_length # This will be 0 if player 1 and 1 if player 2 (so clever)
+        action_idx = i % action_length # Modulo leaves the reminder of division, but if a < b it just equals a
+        hit_index.add(button.rect, (button, player_idx, game_manager.players[player_idx].actions[action_idx]))
 
-                # Pass the action to GameManager
-                game_manager.select_action(action)
-                print(f"Selected action {action.name}")
-                button.selected = True
+    return hit_index
 
 
-def draw_player_infos(screen, game_manager, action_buttons, font):
+def create_player_infos(game_ui, game_manager, action_buttons, font):
     """
-    Draws player's portraits, names, buttons and stats.
+    Add player's portraits, names, buttons and stats to the game UI.
     """
 
     for i in range(2):
@@ -112,65 +231,87 @@ def draw_player_infos(screen, game_manager, action_buttons, font):
         # Portrait Pos
         x_pos = 50 if i == 0 else SCREEN_WIDTH - 180
 
-        # Portrait area
+        # Portrait area, highlighted for the current player
         portrait_rect = pygame.Rect(x_pos, 105, 130, 130)
-        pygame.draw.rect(screen, next_player.color, portrait_rect)
+
+        def draw_portrait(surface, player=next_player, index=i, portrait_rect=portrait_rect):
+            pygame.draw.rect(surface, player.color, portrait_rect)
+            if index == game_manager.current_player_index:
+                pygame.draw.rect(surface, WHITE, portrait_rect.inflate(10,10), 3)
+
+        game_ui.add(Panel(portrait_rect.inflate(10, 10), draw_portrait,
+                          lambda index=i: index == game_manager.current_player_index))
 
         # Player name
-        name_surface = font.render(next_player.name, True, WHITE)
-        name_rect = name_surface.get_rect(center=(portrait_rect.centerx, portrait_rect.bottom - 160))
-        screen.blit(name_surface, name_rect)
+        game_ui.add(Label(font, next_player.name, WHITE, center=(portrait_rect.centerx, portrait_rect.bottom - 160)))
 
         # Player score
-        score_text = f"Cells: {next_player.cells_conquered}"
-        score_surface = font.render(score_text, True, WHITE)
-        score_rect = score_surface.get_rect(center=(portrait_rect.centerx, portrait_rect.centery + 310))
-        screen.blit(score_surface, score_rect)
+        game_ui.add(Label(font, lambda player=next_player: f"Cells: {player.cells_conquered}", WHITE,
+                          center=(portrait_rect.centerx, portrait_rect.centery + 310)))
+
+        # Territory statistics (not tracked on tiled boards)
+        if game_manager.territory is None:
+            continue
+
+        def get_territory_text(player=next_player):
+            territory = game_manager.territory.get_stats(player.player_id)
+            return f"Regions: {territory['regions']}  Largest: {territory['largest_region']}"
 
-        # Highlight current player
-        if i == game_manager.current_player_index:
-            pygame.draw.rect(screen, WHITE, portrait_rect.inflate(10,10), 3)
+        def get_pockets_text(player=next_player):
+            territory = game_manager.territory.get_stats(player.player_id)
+            return f"Pockets: {territory['enclosed_pockets']} ({territory['enclosed_cells']} cells)"
+
+        game_ui.add(Label(button_font, get_territory_text, WHITE, center=(portrait_rect.centerx, portrait_rect.centery + 340)))
+        game_ui.add(Label(button_font, get_pockets_text, WHITE, center=(portrait_rect.centerx, portrait_rect.centery + 362)))
 
     for i, button in enumerate(action_buttons):
-        button.draw(screen, button_font)
+        button.font = button_font
+        game_ui.add(button)
 
 
-def draw_game_info(screen, game_manager, font, title_font):
+def create_game_info(game_ui, game_manager, font, title_font):
     """
-    Draw game information.
-    When rendering text both _surface and _rect are needed.
-    Surface is the image, and rect identifies where to put the image.
+    Add game information to the game UI.
+    The title never changes, so it is part of the background.
     """
 
     # Game title
-    title_surface = title_font.render("Cell Wars", True, WHITE)
-    title_rect = title_surface.get_rect(center=(SCREEN_WIDTH // 2, 30))
-    screen.blit(title_surface, title_rect)
+    def draw_title(surface):
+        title_surface = render_text(title_font, "Cell Wars", WHITE)
+        title_rect = title_surface.get_rect(center=(SCREEN_WIDTH // 2, 30))
+        surface.blit(title_surface, title_rect)
+
+    game_ui.add_static(draw_title)
 
     # Turn counter
-    turn_text = f"Turn: {game_manager.current_turn}/{game_manager.total_turns}"
-    turn_surface = font.render(turn_text, True, WHITE)
-    turn_rect = turn_surface.get_rect(center=(SCREEN_WIDTH // 2, 60))
-    screen.blit(turn_surface, turn_rect)
+    game_ui.add(Label(font, lambda: f"Turn: {game_manager.current_turn}/{game_manager.total_turns}", WHITE,
+                      center=(SCREEN_WIDTH // 2, 60)))
 
     # Select starting cell indicator
-    if game_manager.selected_action:
-        action_text = "Select starting cell"
-        action_surface = font.render(action_text, True, WHITE)
-        action_rect = action_surface.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 30))
-        screen.blit(action_surface, action_rect)
+    game_ui.add(Label(font, lambda: "Select starting cell" if game_manager.selected_action else None, WHITE,
+                      center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 30)))
+
+    # AI status
+    def get_ai_status():
+        if game_manager.is_ai_turn() and not game_manager.animation_in_progress and not game_manager.game_over:
+            return "Computer is thinking..."
+        return None
+
+    game_ui.add(Label(font, get_ai_status, (255, 200, 100), midtop=(SCREEN_WIDTH // 2, 75)))
 
     # Network status (if networked)
     if game_manager.is_networked:
-        if game_manager.waiting_for_remote:
-            status_text = "Waiting for other player..."
-            status_color = (255, 200, 100)  # Orange-yellow
-        else:
-            status_text = "Your turn"
-            status_color = (100, 255, 100)  # Light green
+        def get_network_status():
+            if game_manager.waiting_for_remote:
+                return "Waiting for other player..."
+            return "Your turn"
+
+        def get_network_status_color():
+            if game_manager.waiting_for_remote:
+                return (255, 200, 100)  # Orange-yellow
+            return (100, 255, 100)  # Light green
 
-        status_surface = font.render(status_text, True, status_color)
-        screen.blit(status_surface, (SCREEN_WIDTH // 2 - status_surface.get_width() // 2, 75))
+        game_ui.add(Label(font, get_network_status, get_network_status_color, midtop=(SCREEN_WIDTH // 2, 75)))
 
 
 def show_game_over_screen(screen, game_manager, title_font, font):
@@ -211,6 +352,9 @@ def show_game_over_screen(screen, game_manager, title_font, font):
     # Duration before auto-exit (5 seconds) for both network and local games
     screen_duration = 5000
 
+    # The game is finished, close the replay file
+    game_manager.stop_recording()
+
     # Get the scores
     player1_score = f"{player1.name}: {player1.cells_conquered} cells"
     player2_score = f"{player2.name}: {player2.cells_conquered} cells"
@@ -220,12 +364,13 @@ def show_game_over_screen(screen, game_manager, title_font, font):
 
     # Game over screen loop
     showing_game_over = True
+    events = []
 
     while showing_game_over:
         current_time = pygame.time.get_ticks()
 
         # Handle events
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -287,71 +432,179 @@ def show_game_over_screen(screen, game_manager, title_font, font):
         screen.blit(exit_text, exit_rect)
 
         pygame.display.flip()
-        pygame.time.delay(10)  # Prevent high CPU usage
+
+        # Nothing changes until the countdown goes down (or the player presses a key)
+        events = wait_for_events(1000 - (current_time - start_time) % 1000)
 
     # For local games, return to allow continuing
     return
 
 
-def draw_grid(screen, game_manager, grid_x, grid_y, mouse_grid_x, mouse_grid_y):
+def create_grid_panel(game_ui, game_manager, heatmap_worker, preview_worker, viewport, pyramid, minimap):
     """
-    Draw the center grid and cursor highlight.
+    Add the grid to the game UI. It is only redrawn when the board, the view, the heatmap
+    of the selected action, the move preview or the cell under the mouse changed.
     """
-    grid_dimension = GRID_SIZE * CELL_SIZE
+    def get_heatmap():
+        if not game_manager.selected_action:
+            return None
+        return heatmap_worker.get_heatmap(game_manager.get_current_player().player_id, game_manager.selected_action)
+
+    def get_grid_state():
+        heatmap = get_heatmap()
+        heatmap_state = (id(heatmap), heatmap.get_redraw_version()) if heatmap else None
+        preview = preview_worker.get_preview()
+        return (game_manager.grid.version, viewport.get_state(), heatmap_state, preview.key if preview else None,
+                get_mouse_cell(pygame.mouse.get_pos(), viewport, minimap))
+
+    def draw_grid_panel(surface):
+        mouse_cell = get_mouse_cell(pygame.mouse.get_pos(), viewport, minimap) or (-1, -1)
+        draw_grid(surface, game_manager, heatmap_worker, preview_worker, viewport, pyramid, *mouse_cell)
+
+    game_ui.add(Panel(viewport.rect, draw_grid_panel, get_grid_state))
+
 
+def draw_grid(screen, game_manager, heatmap_worker, preview_worker, viewport, pyramid, mouse_grid_x, mouse_grid_y):
+    """
+    Draw the visible part of the grid, the heatmap of the selected action, the move preview and cursor highlight.
+    """
     #Draw Grid
-    grid_surface = pygame.Surface((grid_dimension, grid_dimension))
-    game_manager.grid.draw(grid_surface, BLACK)
-    screen.blit(grid_surface, (grid_x, grid_y))
+    viewport.draw(screen, game_manager.grid, BLACK, pyramid)
+
+    # Draw expected gain of the selected action
+    if game_manager.selected_action:
+        heatmap = heatmap_worker.get_heatmap(game_manager.get_current_player().player_id, game_manager.selected_action)
+        if heatmap:
+            draw_heatmap(screen, heatmap, viewport)
+
+    # Draw where the selected action would spread from the cell under the mouse
+    preview = preview_worker.get_preview()
+    if preview:
+        draw_preview(screen, preview, viewport, game_manager.get_current_player().color)
 
     # Draw cursor highlight if mouse is over the grid
-    if (0 <= mouse_grid_x < GRID_SIZE and 0 <= mouse_grid_y < GRID_SIZE):
-        highlight_rect = pygame.Rect(
-            grid_x + mouse_grid_x * CELL_SIZE,
-            grid_y + mouse_grid_y * CELL_SIZE,
-            CELL_SIZE,
-            CELL_SIZE
-        )
-        pygame.draw.rect(screen, GREEN, highlight_rect, 2)
+    if mouse_grid_x >= 0:
+        previous_clip = screen.get_clip()
+        screen.set_clip(viewport.rect)
+        pygame.draw.rect(screen, GREEN, viewport.get_cell_rect(mouse_grid_x, mouse_grid_y), 2)
+        screen.set_clip(previous_clip)
 
 
-def draw_action_description(screen, font, game_manager, action_buttons, mouse_pos):
+def draw_heatmap(screen, heatmap, viewport):
     """
-    Draw the description of an action when hovering over its button.
+    Draw a heatmap as a translucent overlay on the visible cells of the grid.
+    The brighter a cell, the more cells the action is expected to conquer when started there.
+    Heatmaps aren't drawn when the view is zoomed out so far that cells are smaller than a pixel.
     """
-    action_length = len(game_manager.players[0].actions)
+    if viewport.get_block_size() > 1:
+        return
 
-    for i, button in enumerate(action_buttons):
-        if button.hover:
-            # Determine which player's button this is
-            player_idx = i // action_length
-            button_idx = i % action_length
+    x0, y0, x1, y1 = viewport.get_visible_cells()
+    if x1 <= x0 or y1 <= y0:
+        return
 
-            # Get Button
-            action = game_manager.players[player_idx].actions[button_idx]
+    # Scale transparency with the expected gain, one pixel per cell (cells without samples stay transparent)
+    values = heatmap.get_values(x0, y0, x1, y1)
+    alpha = np.zeros(values.shape, dtype=np.uint8)
+    sampled = ~np.isnan(values)
+    alpha[sampled] = (160 * values[sampled] / heatmap.get_max_value()).astype(int)
 
-            # Draw description
-            description_surface = font.render(action.description, True, WHITE)
-            description_rectangle = description_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 60))
-            screen.blit(description_surface, description_rectangle)
-            break
+    overlay = pygame.Surface((x1 - x0, y1 - y0), pygame.SRCALPHA)
+    overlay.fill((255, 255, 255, 0))
+    pygame.surfarray.pixels_alpha(overlay)[:] = alpha.T
+    zoom = int(viewport.zoom)
+    overlay = pygame.transform.scale(overlay, ((x1 - x0) * zoom, (y1 - y0) * zoom))
 
+    previous_clip = screen.get_clip()
+    screen.set_clip(viewport.rect)
+    screen.blit(overlay, viewport.get_cell_rect(x0, y0).topleft)
+    screen.set_clip(previous_clip)
 
-def render_game(screen, game_manager, font, title_font, action_buttons, grid_x, grid_y, mouse_grid_x, mouse_grid_y):
+
+def draw_preview(screen, preview, viewport, color):
     """
-    Render the game screen.
+    Draw the cells a move would conquer as a translucent ghost in the player's color.
     """
-    # Fill the screen
-    screen.fill(BLACK)
+    overlay = pygame.Surface(viewport.rect.size, pygame.SRCALPHA)
+    x0, y0, x1, y1 = viewport.get_visible_cells()
+
+    for x, y in preview.cells:
+        if x0 <= x < x1 and y0 <= y < y1:
+            overlay.fill((*color, 120), viewport.get_cell_rect(x, y).move(-viewport.rect.x, -viewport.rect.y))
+
+    screen.blit(overlay, viewport.rect)
+
+
+def update_preview(game_manager, preview_worker, mouse_grid_x, mouse_grid_y):
+    """
+    Let the preview worker simulate the selected action at the cell under the mouse while a human is choosing a move.
+    """
+    human_choosing = (not game_manager.game_over and not game_manager.animation_in_progress
+                      and not game_manager.is_ai_turn() and game_manager.is_my_turn())
+
+    if human_choosing and game_manager.selected_action and mouse_grid_x >= 0:
+        preview_worker.request(game_manager.grid, game_manager.get_current_player().player_id,
+                               game_manager.selected_action, mouse_grid_x, mouse_grid_y)
+    else:
+        preview_worker.clear()
 
-    # Draw each component
-    draw_grid(screen, game_manager, grid_x, grid_y, mouse_grid_x, mouse_grid_y)
-    draw_player_infos(screen, game_manager, action_buttons, font)
-    draw_game_info(screen, game_manager, font, title_font)
-    draw_action_description(screen, font, game_manager, action_buttons, mouse_pos)
+
+def update_heatmaps(game_manager, heatmap_worker, viewport):
+    """
+    Keep the heatmap worker busy with the current player's actions while a human is choosing a move.
+    Only the visible cells are sampled, and nothing while the view is zoomed out too far to show heatmaps.
+    """
+    human_choosing = (not game_manager.game_over and not game_manager.animation_in_progress
+                      and not game_manager.is_ai_turn() and game_manager.is_my_turn())
+
+    if human_choosing and viewport.get_block_size() == 1:
+        current_player = game_manager.get_current_player()
+        heatmap_worker.update(game_manager.grid, current_player.player_id, current_player.actions,
+                              game_manager.selected_action, viewport.get_visible_cells())
+    else:
+        heatmap_worker.pause()
+
+
+def create_action_description(game_ui, font, hit_index):
+    """
+    Add the description of the action whose button the mouse is over to the game UI.
+    """
+    def get_description():
+        hovered = hit_index.hovered
+        if isinstance(hovered, tuple):
+            button, player_idx, action = hovered
+            return action.description
+        return None
+
+    game_ui.add(Label(font, get_description, WHITE, center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 60)))
+
+
+def create_game_ui(game_manager, heatmap_worker, preview_worker, font, title_font, action_buttons, viewport, pyramid, minimap, hit_index):
+    """
+    Create the retained game screen: a static background and the widgets on top of it.
+    """
+    game_ui = UILayer((SCREEN_WIDTH, SCREEN_HEIGHT), BLACK)
+
+    # Add each component (the minimap lies on top of the grid)
+    create_grid_panel(game_ui, game_manager, heatmap_worker, preview_worker, viewport, pyramid, minimap)
+    game_ui.add(minimap)
+    create_player_infos(game_ui, game_manager, action_buttons, font)
+    create_game_info(game_ui, game_manager, font, title_font)
+    create_action_description(game_ui, font, hit_index)
+
+    return game_ui
+
+
+def render_game(screen, game_ui):
+    """
+    Render the game screen.
+    Only the widgets that changed are redrawn and sent to the display.
+    """
+    changed_areas = game_ui.render(screen)
 
     # Update the display
-    pygame.display.flip()
+    if changed_areas:
+        pygame.display.update(changed_areas)
 
 
 def show_main_menu():
@@ -362,24 +615,12 @@ def show_main_menu():
     local_button = pygame.Rect(SCREEN_WIDTH // 2 - 100, 200, 200, 50)
     host_button = pygame.Rect(SCREEN_WIDTH // 2 - 100, 270, 200, 50)
     join_button = pygame.Rect(SCREEN_WIDTH // 2 - 100, 340, 200, 50)
+    ai_button = pygame.Rect(SCREEN_WIDTH // 2 - 100, 410, 200, 50)
 
     # Main menu loop
+    # The menu only changes when something happens, so it sleeps until the next event
     menu_running = True
     while menu_running:
-        # Handle events
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = pygame.mouse.get_pos()
-                if local_button.collidepoint(mouse_pos):
-                    return "local"
-                elif host_button.collidepoint(mouse_pos):
-                    return "host"
-                elif join_button.collidepoint(mouse_pos):
-                    return "join"
-
         # Draw menu
         screen.fill(BLACK)
 
@@ -406,11 +647,30 @@ def show_main_menu():
         screen.blit(join_text, (join_button.centerx - join_text.get_width() // 2,
                                 join_button.centery - join_text.get_height() // 2))
 
+        pygame.draw.rect(screen, (0, 175, 185), ai_button)
+        pygame.draw.rect(screen, WHITE, ai_button, 2)  # White border
+        ai_text = font.render("Versus AI", True, WHITE)
+        screen.blit(ai_text, (ai_button.centerx - ai_text.get_width() // 2,
+                              ai_button.centery - ai_text.get_height() // 2))
+
         # Update display
         pygame.display.flip()
 
-        # Cap framerate
-        pygame.time.Clock().tick(30)
+        # Handle events
+        for event in wait_for_events():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                mouse_pos = pygame.mouse.get_pos()
+                if local_button.collidepoint(mouse_pos):
+                    return "local"
+                elif host_button.collidepoint(mouse_pos):
+                    return "host"
+                elif join_button.collidepoint(mouse_pos):
+                    return "join"
+                elif ai_button.collidepoint(mouse_pos):
+                    return "ai"
 
 
 def host_game_screen():
@@ -433,16 +693,18 @@ def host_game_screen():
     connected = [False]
 
     def start_hosting():
-        connected[0] = network.host_game()
+        connected[0] = network.host_game(NETWORK_PORT)
+        # Wake up the waiting screen
+        post_network_event()
 
     import threading
     hosting_thread = threading.Thread(target=start_hosting, daemon=True)
     hosting_thread.start()
 
     # Wait for connection
-    clock = pygame.time.Clock()
     dots = ""
     dot_time = 0
+    events = []
 
     while not connected[0] and hosting_thread.is_alive():
         current_time = pygame.time.get_ticks()
@@ -453,7 +715,7 @@ def host_game_screen():
             dot_time = current_time
 
         # Handle events
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 network.disconnect()
                 pygame.quit()
@@ -464,7 +726,7 @@ def host_game_screen():
 
         title = title_font.render("Hosting Game", True, WHITE)
         ip_text = font.render(f"Your IP: {local_ip}", True, WHITE)
-        port_text = font.render(f"Port: {network.default_port}", True, WHITE)
+        port_text = font.render(f"Port: {NETWORK_PORT}", True, WHITE)
         waiting_text = font.render(f"Waiting for player to connect{dots}", True, WHITE)
 
         screen.blit(title, (SCREEN_WIDTH // 2 - title.get_width() // 2, 100))
@@ -473,7 +735,9 @@ def host_game_screen():
         screen.blit(waiting_text, (SCREEN_WIDTH // 2 - waiting_text.get_width() // 2, 280))
 
         pygame.display.flip()
-        clock.tick(30)
+
+        # Sleep until the next dot, an event or the connection (see start_hosting())
+        events = wait_for_events(dot_time + 501 - current_time)
 
     # Check result
     if connected[0]:
@@ -492,11 +756,11 @@ def join_game_screen():
     ip_text = ""
 
     # Input loop
-    clock = pygame.time.Clock()
+    events = []
 
     while True:
         # Handle events
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -512,7 +776,7 @@ def join_game_screen():
 
                         # Try to connect
                         network = NetworkClient()
-                        if network.join_game(ip_text):
+                        if network.join_game(ip_text, NETWORK_PORT):
                             return network
                         else:
                             # Show error briefly
@@ -548,7 +812,9 @@ def join_game_screen():
         screen.blit(hint, (SCREEN_WIDTH // 2 - hint.get_width() // 2, 280))
 
         pygame.display.flip()
-        clock.tick(30)
+
+        # The screen only changes on input
+        events = wait_for_events()
 
 
 def handle_network_disconnection(screen, game_manager, font, title_font):
@@ -564,9 +830,10 @@ def handle_network_disconnection(screen, game_manager, font, title_font):
     start_time = pygame.time.get_ticks()
 
     # Display disconnection message until duration expires
+    events = []
     while pygame.time.get_ticks() - start_time < DISCONNECT_MESSAGE_DURATION:
         # Handle quit events
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -591,7 +858,9 @@ def handle_network_disconnection(screen, game_manager, font, title_font):
         screen.blit(exit_text, exit_rect)
 
         pygame.display.flip()
-        pygame.time.delay(10)  # Prevent high CPU usage
+
+        # The message doesn't change, sleep until it expires (or the window is closed)
+        events = wait_for_events(DISCONNECT_MESSAGE_DURATION - (pygame.time.get_ticks() - start_time))
 
     # Exit game
     pygame.quit()
@@ -599,6 +868,21 @@ def handle_network_disconnection(screen, game_manager, font, title_font):
 
 # ==================== GAME MENU & NETWORK MODE ==================== #
 
+# == Compile the automaton kernels while the menu is shown (only with Numba, cached on disk after the first start)
+import threading, automaton_kernels
+automaton_kernels.enabled = automaton_kernels.enabled and settings["engine"]["kernels"]
+if automaton_kernels.enabled:
+    threading.Thread(target=automaton_kernels.warm_up, daemon=True).start()
+
+# == Actions of the settings (an extra actions file, generations and the loadout)
+from action_registry import get_registry
+try:
+    apply_action_settings(get_registry(), settings["actions"])
+except (OSError, ValueError, KeyError) as error:
+    print(f"Invalid action settings: {error}")
+    pygame.quit()
+    sys.exit(1)
+
 # == Show main menu first
 game_mode = show_main_menu()
 
@@ -615,15 +899,31 @@ elif game_mode == "join":
         pygame.quit()
         sys.exit()
 
+# Let the network wake up the game loop
+if network_manager:
+    network_manager.on_message = post_network_event
+    network_manager.on_disconnect = post_network_event
+
 
 # ==================== GAME SETUP ==================== #
 
 # == Create the game manager
-game_manager = GameManager(GRID_SIZE, GRID_SIZE, CELL_SIZE, network_manager)
-game_manager.initialize_players("Player 1", "Player 2")
+game_manager = GameManager(GRID_WIDTH, GRID_HEIGHT, CELL_SIZE, network_manager, settings["board"]["tiled"],
+                           settings["game"]["turns"], settings["animation"]["step_delay"], settings["animation"]["changes_per_step"])
+if game_mode == "ai":
+    game_manager.initialize_players("Player 1", "Computer")
+    # The computer plays as player 2
+    from ai_player import AIPlayer
+    game_manager.set_ai_player(1, AIPlayer(game_manager.players[1]))
+else:
+    game_manager.initialize_players("Player 1", "Player 2")
 if game_manager.is_networked:
     game_manager.waiting_for_remote = not game_manager.is_my_turn()
 
+# == Record the game to the replays folder
+os.makedirs(REPLAY_FOLDER, exist_ok=True)
+game_manager.start_recording(os.path.join(REPLAY_FOLDER, time.strftime("cellwars_%Y%m%d_%H%M%S.cwr")))
+
 # == Create action buttons
 action_buttons = []
 
@@ -638,18 +938,40 @@ for i, action in enumerate(game_manager.players[1].actions):
     action_buttons.append(Button(button_rect, action.name, game_manager.players[1].color))
 
 # == Calculate grid coordinates
-grid_surface_width = GRID_SIZE * CELL_SIZE
-grid_surface_height = GRID_SIZE * CELL_SIZE
-grid_x = (SCREEN_WIDTH - GRID_SIZE * CELL_SIZE) // 2
-grid_y = (SCREEN_HEIGHT - GRID_SIZE * CELL_SIZE) // 2
+grid_x = (SCREEN_WIDTH - VIEWPORT_SIZE) // 2
+grid_y = (SCREEN_HEIGHT - VIEWPORT_SIZE) // 2
+
+# == Part of the board that is shown (zoom with the mouse wheel, pan by dragging with the right mouse button)
+viewport = Viewport(pygame.Rect(grid_x, grid_y, VIEWPORT_SIZE, VIEWPORT_SIZE), GRID_WIDTH, GRID_HEIGHT, CELL_SIZE)
+
+# == Overview of the whole board in the top right corner of the view (shown while zoomed in)
+pyramid = OwnershipPyramid(game_manager.grid)
+minimap = Minimap(pygame.Rect(viewport.rect.right - MINIMAP_SIZE, viewport.rect.top, MINIMAP_SIZE, MINIMAP_SIZE),
+                  pyramid, viewport, WHITE)
+
+# == Background worker for the action heatmaps
+heatmap_worker = HeatmapWorker()
+
+# == Background worker for the preview of the move under the mouse
+preview_worker = PreviewWorker()
+
+# == What the mouse can point at (the board and the action buttons)
+hit_index = create_hit_index(action_buttons, game_manager, viewport)
+
+# == Game screen (only redrawn where something changed)
+game_ui = create_game_ui(game_manager, heatmap_worker, preview_worker, font, title_font, action_buttons, viewport, pyramid, minimap, hit_index)
 
 
 # ==================== GAME LOOP ==================== #
 
 running = True
 mouse_grid_x, mouse_grid_y = 0,0
+clock = pygame.time.Clock()
 
 while running:
+    # == Sleep until something happens (input, a network message or the next animation step)
+    events = wait_for_events(get_idle_timeout(game_manager, pygame.time.get_ticks()))
+
     # == Get current time for animation timing
     current_time = pygame.time.get_ticks()
 
@@ -667,13 +989,29 @@ while running:
     mouse_pos = pygame.mouse.get_pos()
 
     # == Handle input
-    running, mouse_grid_x, mouse_grid_y = handle_input(mouse_pos, grid_x, grid_y, game_manager, action_buttons)
+    running, mouse_grid_x, mouse_grid_y = handle_input(events, mouse_pos, viewport, minimap, game_manager, action_buttons, hit_index)
 
     # Update game state (for animation and networking)
     game_manager.update(current_time)
 
+    # == Precalculate heatmaps while the player is choosing
+    update_heatmaps(game_manager, heatmap_worker, viewport)
+
+    # == Simulate the move under the mouse in the background
+    update_preview(game_manager, preview_worker, mouse_grid_x, mouse_grid_y)
+
     # == Render game
-    render_game(screen, game_manager, font, title_font, action_buttons, grid_x, grid_y, mouse_grid_x, mouse_grid_y)
+    render_game(screen, game_ui)
+
+    # == While something is moving, nothing has to happen faster than the frame rate
+    clock.tick(FRAME_RATE)
+
+# == Stop background workers
+heatmap_worker.stop()
+preview_worker.stop()
+
+# == Finish the replay
+game_manager.stop_recording()
 
 # == Network cleanup
 if network_manager:
@@ -0,0 +1,91 @@
+"""
+Overview of the whole board while the viewport is zoomed in.
+"""
+import pygame
+from ui import Widget
+
+
+#-- Minimap Class
+class Minimap(Widget):
+    """
+    A small picture of the whole board with the part the viewport shows outlined.
+    Clicking it moves the viewport there (see center_viewport()).
+
+    The picture comes from the most detailed level of an OwnershipPyramid that fits into the
+    minimap, so drawing it doesn't depend on the board size. The minimap is only shown while
+    the viewport doesn't show the whole board.
+
+           Arguments:
+            rect (pygame.Rect): Area of the screen the minimap may use
+            pyramid (OwnershipPyramid): Ownership of the board
+            viewport (Viewport): The view whose visible part is outlined
+            border_color (tuple): RGB color tuple of the border and the outline
+    """
+    def __init__(self, rect, pyramid, viewport, border_color):
+        super().__init__(rect)
+        self.pyramid = pyramid
+        self.viewport = viewport
+        self.border_color = border_color
+
+    def is_visible(self):
+        """
+        Check if the viewport hides a part of the board (otherwise there is nothing to show).
+        """
+        x0, y0, x1, y1 = self.viewport.get_visible_cells()
+        return (x0, y0, x1, y1) != (0, 0, self.viewport.board_width, self.viewport.board_height)
+
+    def get_state(self):
+        """The board and the visible part of it"""
+        return (self.is_visible(), self.pyramid.grid.version, self.viewport.get_state())
+
+    def get_bounds(self):
+        """The minimap's rectangle while it is shown"""
+        return self.rect if self.is_visible() else None
+
+    def get_board_rect(self):
+        """
+        Get the area the board takes up in the minimap (the board's aspect ratio is kept).
+        """
+        grid = self.pyramid.grid
+        scale = min(self.rect.width / grid.width, self.rect.height / grid.height)
+        board_rect = pygame.Rect(0, 0, max(1, round(grid.width * scale)), max(1, round(grid.height * scale)))
+        board_rect.center = self.rect.center
+        return board_rect
+
+    def draw(self, surface):
+        """
+        Draw the board overview and the outline of the visible part.
+        """
+        if not self.is_visible():
+            return
+
+        surface.fill(self.border_color, self.rect)
+        board_rect = self.get_board_rect()
+
+        # Most detailed level with at most one block per pixel, scaled up to the minimap
+        level = self.pyramid.get_level_for_size(board_rect.width, board_rect.height)
+        image = pygame.surfarray.make_surface(self.pyramid.get_colors(level).transpose(1, 0, 2))
+        surface.blit(pygame.transform.scale(image, board_rect.size), board_rect)
+
+        # Outline of the part the viewport shows
+        x0, y0, x1, y1 = self.viewport.get_visible_cells()
+        scale_x = board_rect.width / self.viewport.board_width
+        scale_y = board_rect.height / self.viewport.board_height
+        outline = pygame.Rect(board_rect.x + int(x0 * scale_x), board_rect.y + int(y0 * scale_y),
+                              max(2, round((x1 - x0) * scale_x)), max(2, round((y1 - y0) * scale_y)))
+        pygame.draw.rect(surface, self.border_color, outline.clip(board_rect), 1)
+
+    def is_over(self, pos):
+        """
+        Check if the given position is over the (shown) minimap.
+        """
+        return self.is_visible() and self.rect.collidepoint(pos)
+
+    def center_viewport(self, pos):
+        """
+        Move the viewport so that the board position under a point of the minimap is in its center.
+        """
+        board_rect = self.get_board_rect()
+        x = (pos[0] - board_rect.x) / board_rect.width * self.viewport.board_width
+        y = (pos[1] - board_rect.y) / board_rect.height * self.viewport.board_height
+        self.viewport.center_on(x, y)
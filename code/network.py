@@ -11,6 +11,10 @@ class NetworkManager:
         self.message_queue = []
         self.default_port = 5555
 
+        # Optional callbacks, called from the receive thread (e.g. to wake up a waiting game loop)
+        self.on_message = None # Called with each received message after it was queued
+        self.on_disconnect = None # Called when the connection is closed
+
     def send_message(self, message):
         """
         Send a message to the connected peer.
@@ -69,6 +73,8 @@ class NetworkManager:
 
                 # Add to queue for processing
                 self.message_queue.append(message)
+                if self.on_message:
+                    self.on_message(message)
 
             except Exception as e:
                 print(f"Error receiving message {e}")
@@ -85,6 +91,13 @@ class NetworkManager:
             return self.message_queue.pop(0)
         return None
 
+    def has_messages(self):
+        """
+        Check if there are received messages that weren't processed yet.
+        """
+
+        return bool(self.message_queue)
+
     def disconnect(self):
         """
         Disconnect from the network.
@@ -109,6 +122,9 @@ class NetworkManager:
 
         print("Disconnected from network")
 
+        if self.on_disconnect:
+            self.on_disconnect()
+
 class NetworkHost (NetworkManager):
     """
     Network manager for the game host.
@@ -0,0 +1,244 @@
+"""
+Downsampled ownership of a grid for overviews of large boards (the minimap, zoomed out views).
+"""
+import numpy as np
+
+
+def downsample(counts, dtype):
+    """
+    Sum the counts (states x height x width) of 2 x 2 neighboring blocks into one block.
+    An odd last row or column forms smaller blocks.
+    """
+    state_count, height, width = counts.shape
+    padded = np.zeros((state_count, height + height % 2, width + width % 2), dtype=dtype)
+    padded[:, :height, :width] = counts
+    return padded.reshape(state_count, padded.shape[1] // 2, 2, padded.shape[2] // 2, 2).sum(axis=(2, 4), dtype=dtype)
+
+
+# Levels 1 to TILE_LEVEL - 1 are stored in tiles of TILE_SIZE x TILE_SIZE cells
+TILE_LEVEL = 6
+TILE_SIZE = 1 << TILE_LEVEL
+
+
+class OwnershipPyramid:
+    """
+    A mipmap of a grid's ownership.
+
+    Level k splits the board into blocks of 2^k x 2^k cells and stores how many cells of every
+    block each player owns (the owner fractions are these counts divided by the block's cells).
+    Level 0 is the grid itself, the last level is a single block covering the whole board.
+
+    The detailed levels (blocks smaller than TILE_SIZE) are stored in tiles of TILE_SIZE x TILE_SIZE
+    cells that only exist where cells were claimed, like the chunks of a TiledGrid, and are built
+    from the claimed parts of the board only. The coarser levels are small and stored whole.
+
+    The pyramid observes its grid: every set_cell() updates one block per level, so the
+    overview stays exact while moves are animated and is never rebuilt per frame.
+
+           Arguments:
+            grid (Grid): The grid to follow (a Grid or TiledGrid)
+    """
+    def __init__(self, grid):
+        self.grid = grid
+
+        # Owned states (the players), in the order of the counts arrays
+        self.states = [state for state in sorted(grid.colors) if state != grid.NEUTRAL]
+        self.state_index = {state: index for index, state in enumerate(self.states)}
+
+        self.counts = [] # Level -> counts array (states x blocks high x blocks wide), None for level 0 and tiled levels
+        self.tiles = {} # (tile x, tile y) -> counts arrays of the tiled levels (index = level, None for level 0)
+        self.tile_levels = 0 # Number of tiled levels
+        self.rebuild()
+        grid.add_observer(self)
+
+    def rebuild(self):
+        """
+        Build all levels from the grid's claimed cells (vectorized).
+        """
+        width, height = self.grid.width, self.grid.height
+        top_level = max(1, (max(width, height) - 1).bit_length())
+        self.tile_levels = min(TILE_LEVEL - 1, top_level)
+        self.counts = [None] * (min(TILE_LEVEL, top_level + 1))
+
+        # Tiles of the detailed levels and the counts of every tile as the first whole level
+        self.tiles = {}
+        tile_counts = np.zeros((len(self.states), -(-height // TILE_SIZE), -(-width // TILE_SIZE)), dtype=self.get_dtype(TILE_LEVEL))
+
+        for tile_x, tile_y in self.grid.get_claimed_blocks(TILE_SIZE):
+            left, top = tile_x * TILE_SIZE, tile_y * TILE_SIZE
+            right, bottom = min(width, left + TILE_SIZE), min(height, top + TILE_SIZE)
+            cells = np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.uint8)
+            cells[:bottom - top, :right - left] = np.frombuffer(self.grid.get_region(left, top, right, bottom),
+                                                                dtype=np.uint8).reshape(bottom - top, right - left)
+
+            tile = [None]
+            level_counts = np.stack([cells == state for state in self.states]).view(np.uint8)
+            for level in range(1, self.tile_levels + 1):
+                level_counts = downsample(level_counts, self.get_dtype(level))
+                tile.append(level_counts)
+            self.tiles[(tile_x, tile_y)] = tile
+            tile_counts[:, tile_y, tile_x] = level_counts.sum(axis=(1, 2))
+
+        if top_level < TILE_LEVEL:
+            return
+
+        level_counts = tile_counts
+        self.counts.append(level_counts)
+        while level_counts.shape[1] > 1 or level_counts.shape[2] > 1:
+            level = len(self.counts)
+            level_counts = downsample(level_counts, self.get_dtype(level))
+            self.counts.append(level_counts)
+
+    def create_tile(self):
+        """
+        Get empty counts arrays for the tiled levels of a tile.
+        """
+        return [None] + [np.zeros((len(self.states), TILE_SIZE >> level, TILE_SIZE >> level), dtype=self.get_dtype(level))
+                         for level in range(1, self.tile_levels + 1)]
+
+    def get_dtype(self, level):
+        """
+        Get the smallest unsigned integer type that can count all cells of a block of a level.
+        """
+        for dtype in (np.uint8, np.uint16):
+            if 4 ** level <= np.iinfo(dtype).max:
+                return dtype
+        return np.uint32
+
+    def cell_changed(self, x, y, old_state, new_state):
+        """
+        Move the cell from its old owner's count to its new owner's count on every level.
+        Called by the grid (see Grid.add_observer()).
+        """
+        old_index = self.state_index.get(old_state)
+        new_index = self.state_index.get(new_state)
+
+        tile = self.tiles.get((x >> TILE_LEVEL, y >> TILE_LEVEL))
+        if tile is None:
+            tile = self.create_tile()
+            self.tiles[(x >> TILE_LEVEL, y >> TILE_LEVEL)] = tile
+
+        tile_x, tile_y = x & (TILE_SIZE - 1), y & (TILE_SIZE - 1)
+        for level in range(1, self.tile_levels + 1):
+            counts = tile[level]
+            block_x, block_y = tile_x >> level, tile_y >> level
+            if old_index is not None:
+                counts[old_index, block_y, block_x] -= 1
+            if new_index is not None:
+                counts[new_index, block_y, block_x] += 1
+
+        for level in range(TILE_LEVEL, len(self.counts)):
+            counts = self.counts[level]
+            block_x, block_y = x >> level, y >> level
+            if old_index is not None:
+                counts[old_index, block_y, block_x] -= 1
+            if new_index is not None:
+                counts[new_index, block_y, block_x] += 1
+
+    def cells_reloaded(self):
+        """
+        All cells were replaced, e.g. by a replay jumping to a keyframe. Called by the grid.
+        """
+        self.rebuild()
+
+    def get_level_count(self):
+        """
+        Get the number of levels, including level 0 (the grid itself).
+        """
+        return len(self.counts)
+
+    def get_level_size(self, level):
+        """
+        Get the number of blocks of a level as (width, height).
+        """
+        return (-(-self.grid.width >> level), -(-self.grid.height >> level))
+
+    def get_level_for_size(self, max_width, max_height):
+        """
+        Get the most detailed level that has at most max_width x max_height blocks.
+        """
+        for level in range(len(self.counts)):
+            width, height = self.get_level_size(level)
+            if width <= max_width and height <= max_height:
+                return level
+        return len(self.counts) - 1
+
+    def get_region_counts(self, level, x0, y0, x1, y1):
+        """
+        Get the number of cells in a block rectangle (x1 and y1 exclusive, clipped to the level)
+        for every state: neutral first, then the players in the order of self.states.
+        """
+        width, height = self.get_level_size(level)
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(width, x1), min(height, y1)
+
+        if level == 0:
+            cells = np.frombuffer(self.grid.get_region(x0, y0, x1, y1), dtype=np.uint8).reshape(y1 - y0, x1 - x0)
+            owned = np.stack([cells == state for state in self.states]).view(np.uint8)
+        elif self.counts[level] is None:
+            owned = self.get_tiled_counts(level, x0, y0, x1, y1)
+        else:
+            owned = self.counts[level][:, y0:y1, x0:x1]
+
+        # Cells per block (smaller at the right and bottom edges of the board), the rest is neutral
+        size = 1 << level
+        rows = np.minimum(size, self.grid.height - np.arange(y0, y1) * size)
+        columns = np.minimum(size, self.grid.width - np.arange(x0, x1) * size)
+        neutral = np.outer(rows, columns).astype(np.int64) - owned.sum(axis=0, dtype=np.int64)
+
+        return np.concatenate([neutral[np.newaxis], owned.astype(np.int64)])
+
+    def get_tiled_counts(self, level, x0, y0, x1, y1):
+        """
+        Get the counts of a block rectangle of a tiled level (clipped to the level) from the tiles
+        overlapping it, zero where there is no tile.
+        """
+        blocks = TILE_SIZE >> level # Blocks per tile in each direction
+        owned = np.zeros((len(self.states), max(0, y1 - y0), max(0, x1 - x0)), dtype=self.get_dtype(level))
+        if x1 <= x0 or y1 <= y0:
+            return owned
+
+        first_x, first_y = x0 // blocks, y0 // blocks
+        last_x, last_y = (x1 - 1) // blocks, (y1 - 1) // blocks
+        if (last_x - first_x + 1) * (last_y - first_y + 1) > len(self.tiles):
+            # Fewer tiles exist than the rectangle covers
+            keys = [key for key in self.tiles if first_x <= key[0] <= last_x and first_y <= key[1] <= last_y]
+        else:
+            keys = [(tile_x, tile_y) for tile_y in range(first_y, last_y + 1) for tile_x in range(first_x, last_x + 1)
+                    if (tile_x, tile_y) in self.tiles]
+
+        for tile_x, tile_y in keys:
+            # Overlap of the tile and the rectangle
+            left, top = max(x0, tile_x * blocks), max(y0, tile_y * blocks)
+            right, bottom = min(x1, (tile_x + 1) * blocks), min(y1, (tile_y + 1) * blocks)
+            owned[:, top - y0:bottom - y0, left - x0:right - x0] = \
+                self.tiles[(tile_x, tile_y)][level][:, top - tile_y * blocks:bottom - tile_y * blocks,
+                                                    left - tile_x * blocks:right - tile_x * blocks]
+        return owned
+
+    def get_owners(self, level, x0, y0, x1, y1):
+        """
+        Get the majority state of every block in a block rectangle (see get_region_counts()).
+        Ties go to neutral, then to the player listed first.
+        """
+        counts = self.get_region_counts(level, x0, y0, x1, y1)
+        candidates = np.array([self.grid.NEUTRAL] + self.states, dtype=np.uint8)
+        return candidates[np.argmax(counts, axis=0)]
+
+    def get_fractions(self, level, x0, y0, x1, y1):
+        """
+        Get the fraction of every block owned by each state (states x blocks high x blocks wide,
+        neutral first), for a block rectangle (see get_region_counts()).
+        """
+        counts = self.get_region_counts(level, x0, y0, x1, y1)
+        return counts / np.maximum(1, counts.sum(axis=0))
+
+    def get_colors(self, level):
+        """
+        Get an RGB image (blocks high x blocks wide x 3) of a whole level: every block has the
+        colors of its owners mixed by the fraction they own, so small territories stay visible.
+        """
+        width, height = self.get_level_size(level)
+        fractions = self.get_fractions(level, 0, 0, width, height)
+        colors = np.array([self.grid.colors[state][:3] for state in [self.grid.NEUTRAL] + self.states], dtype=float)
+        return np.einsum("shw,sc->hwc", fractions, colors).round().astype(np.uint8)
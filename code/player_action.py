@@ -1,3 +1,6 @@
+import importlib
+
+
 class PlayerAction:
     """
     An action that a player can choose.
@@ -5,35 +8,54 @@ class PlayerAction:
     """
 
     def __init__(self, name, description, automaton_class, generations=5,
-                 overwrite_neutral=True, overwrite_enemy=False, cost=1):
+                 overwrite_neutral=True, overwrite_enemy=False, cost=1, rule=None):
         """
         Initialize an action.
 
         Args:
             name: The name of the action
             description: A brief description of what the action does
-            automaton_class: The cellular automaton class to use
+            automaton_class: The cellular automaton class to use, or its location as "module:ClassName"
+                             (the module is then only imported when the automaton is first needed)
             generations: Number of steps the automaton will run
             overwrite_neutral: Whether this action can take over neutral cells
             overwrite_enemy: Whether this action can take over enemy cells
             cost: The cost of using this action (for future balancing)
+            rule: Declarative rule for a RuleAutomaton (see rule_automaton), None for other automata
         """
 
         self.name = name
         self.description = description
-        self.automaton_class = automaton_class
+        self.automaton_reference = automaton_class # Class or "module:ClassName"
         self.generations = generations
         self.overwrite_neutral = overwrite_neutral
         self.overwrite_enemy = overwrite_enemy
         self.cost = cost
+        self.rule = rule
+
+    @property
+    def automaton_class(self):
+        """
+        The cellular automaton class of this action, imported on first use.
+        """
+        if isinstance(self.automaton_reference, str):
+            module_name, class_name = self.automaton_reference.split(":")
+            self.automaton_reference = getattr(importlib.import_module(module_name), class_name)
+        return self.automaton_reference
 
-    def create_automaton(self, grid, player_id):
+    def create_automaton(self, grid, player_id, seed=None):
         """
         Create an instance of this action's automaton.
+        A seed makes the (otherwise random) outcome reproducible.
         """
 
+        # Only rule based automata take a rule
+        extra_arguments = {} if self.rule is None else {"rule": self.rule}
+
         return self.automaton_class(grid,
                                      player_id,
                                     generations = self.generations,
                                     overwrite_neutral = self.overwrite_neutral,
-                                    overwrite_enemy = self.overwrite_enemy)
\ No newline at end of file
+                                    overwrite_enemy = self.overwrite_enemy,
+                                    seed = seed,
+                                    **extra_arguments)
\ No newline at end of file
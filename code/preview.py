@@ -0,0 +1,117 @@
+import threading
+from automaton_cache import shared_cache
+
+
+class Preview:
+    """
+    Outcome of an action started at one cell: the cells it would conquer.
+    Random patterns are run with a fixed seed, so this is one possible outcome.
+    """
+
+    def __init__(self, key, board, player_id, changes):
+        self.key = key # (player_id, action, x, y, board version) of the request
+        self.player_id = player_id
+
+        # Cells that would change owner (automata may also list the player's own starting cell)
+        self.cells = [(x, y) for x, y, _ in changes if board.get_cell(x, y) != player_id]
+
+
+class PreviewWorker:
+    """
+    Simulates the move under the cursor in a background thread, so the player can see
+    where the selected action would spread before clicking.
+
+    Only the newest request matters: a request replaces the one that is still waiting and
+    the result of a run that was overtaken by another request is thrown away. A run that
+    already started can't be interrupted, it finishes in the background, so the game loop
+    never waits for a simulation. The board is copied once per board version, not per request.
+    """
+
+    def __init__(self, seed=0):
+        self.seed = seed
+
+        self.board = None # Copy of the board the previews are calculated on
+        self.board_version = None
+
+        self.current_key = None # Request whose preview is wanted
+        self.job = None # Request waiting for the thread
+        self.preview = None # Newest finished preview
+
+        self.lock = threading.Lock()
+        self.work_available = threading.Event()
+        self.thread = None
+        self.running = False
+
+    def request(self, grid, player_id, action, x, y):
+        """
+        Ask for the preview of an action started at (x, y) - call this every frame while the
+        cursor is over the board. Starts the background thread on first use.
+        """
+        key = (player_id, action, x, y, grid.version)
+        if key == self.current_key:
+            return
+
+        # Snapshot of the board the thread can read while the game changes the real one
+        if grid.version != self.board_version:
+            self.board = grid.copy()
+            self.board_version = grid.version
+
+        with self.lock:
+            self.current_key = key
+            self.job = (key, self.board, player_id, action, x, y)
+
+        self.work_available.set()
+
+        if self.thread is None:
+            self.running = True
+            self.thread = threading.Thread(target=self.work, daemon=True)
+            self.thread.start()
+
+    def clear(self):
+        """
+        No preview is wanted (e.g. the cursor left the board), drop the waiting request.
+        """
+        with self.lock:
+            self.current_key = None
+            self.job = None
+
+    def get_preview(self):
+        """
+        Get the preview of the current request or None if it isn't ready yet.
+        """
+        with self.lock:
+            if self.preview is not None and self.preview.key == self.current_key:
+                return self.preview
+            return None
+
+    def work(self):
+        """
+        Background thread: run the newest request's automaton on the board snapshot.
+        """
+        while self.running:
+            with self.lock:
+                job = self.job
+                self.job = None
+                if job is None:
+                    self.work_available.clear()
+
+            if job is None:
+                # Nothing to do, sleep until request() is called
+                self.work_available.wait()
+                continue
+
+            key, board, player_id, action, x, y = job
+            automaton = action.create_automaton(board, player_id, seed=self.seed)
+            changes = shared_cache.run(automaton, x, y)
+
+            with self.lock:
+                # Keep the result only if the cursor is still on the same cell
+                if key == self.current_key:
+                    self.preview = Preview(key, board, player_id, changes)
+
+    def stop(self):
+        """
+        Stop the background thread.
+        """
+        self.running = False
+        self.work_available.set()
@@ -0,0 +1,48 @@
+"""
+Random patterns from documentation/move_ideas.md that can't be described as a rule.
+Explosive Growth and Viral Spread are rules in actions.json (see rule_automaton).
+This module is only imported when one of its actions is used (see action_registry).
+"""
+from cellular_automaton import CellularAutomaton
+
+
+class ControlledChaos(CellularAutomaton):
+    """
+    Alternates between a predictable and a random phase: even generations expand
+    in a cross (like the Diamond Bomb), odd generations capture random neighbors
+    in all eight directions. The result is a structured core with a chaotic boundary.
+
+    Subclass of CellularAutomaton.
+    """
+
+    def __init__(self, grid, player_id, generations=3, overwrite_neutral=True, overwrite_enemy=False, seed=None):
+        super().__init__(grid, player_id, generations, overwrite_neutral, overwrite_enemy, seed)
+
+        # Chance to capture a neighbor in the random phase
+        self.chaos_probability = 0.3
+
+    def get_parameters(self):
+        """Add the chaos probability to the base parameters"""
+        return super().get_parameters() + (self.chaos_probability,)
+
+    def simulate_step(self, current_x, current_y, temp_grid, can_conquer_func, next_gen_cells):
+        """
+        Expand in a cross (even generations) or to random neighbors (odd generations).
+        """
+        changes = []
+        chaotic = self.current_generation % 2 == 1
+
+        if chaotic:
+            neighbors = ((0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1))
+        else:
+            neighbors = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+        for dx, dy in neighbors:
+            new_x, new_y = current_x + dx, current_y + dy
+
+            if can_conquer_func(new_x, new_y) and (not chaotic or self.random.random() < self.chaos_probability):
+                temp_grid[(new_x, new_y)] = self.player_id
+                next_gen_cells.add((new_x, new_y))
+                changes.append([new_x, new_y, self.player_id])
+
+        return changes
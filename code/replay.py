@@ -0,0 +1,297 @@
+"""
+Replay file format (all numbers big endian):
+
+Header:   "CWRP", version (u8), grid width (u32), grid height (u32)
+Records:  record type (1 byte) followed by the record's data
+
+Move record ("M"):
+    player id (u8), x (u32), y (u32), seed (u64), has seed (u8),
+    action name length (u8), action name (utf-8),
+    change count (u32, NO_CHANGES if the changes were not recorded),
+    changes: x (u32), y (u32), player id (u8) each
+
+Keyframe record ("K"):
+    move index (u32), then one byte per cell (row by row) holding the board
+    right before that move
+
+The file is only ever appended to, so a crashed game still leaves a readable replay.
+"""
+import mmap, struct
+from action_registry import get_registry
+from grid import Grid
+from journal import ChangeJournal
+
+MAGIC = b"CWRP"
+VERSION = 1
+
+HEADER = struct.Struct(">4sBII")
+MOVE = struct.Struct(">BIIQBB")
+CHANGE_COUNT = struct.Struct(">I")
+CHANGE = struct.Struct(">IIB")
+KEYFRAME = struct.Struct(">I")
+
+MOVE_RECORD = b"M"
+KEYFRAME_RECORD = b"K"
+NO_CHANGES = 0xFFFFFFFF
+
+
+class ReplayRecorder:
+    """
+    Writes every move of a game to a replay file.
+    Every keyframe_interval moves the whole board is stored as well, so the
+    replay player never has to re-simulate more than keyframe_interval moves.
+    """
+
+    def __init__(self, path, grid, keyframe_interval=10, record_changes=True):
+        """
+        Args:
+            path: File to write the replay to
+            grid: The game grid (needed for its size and the keyframes)
+            keyframe_interval: Number of moves between two keyframes
+            record_changes: Whether to store the change list of each move (otherwise moves are re-simulated)
+        """
+        self.grid = grid
+        self.keyframe_interval = keyframe_interval
+        self.record_changes = record_changes
+        self.move_count = 0
+
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, grid.width, grid.height))
+        self.file.flush()
+
+    def record_move(self, player_id, action_name, x, y, seed=None, changes=None):
+        """
+        Append a move. Call this before the move's changes are applied to the grid.
+        """
+        if self.file is None:
+            return
+
+        # Store the board before the move every keyframe_interval moves
+        if self.move_count % self.keyframe_interval == 0:
+            self.file.write(KEYFRAME_RECORD + KEYFRAME.pack(self.move_count))
+            self.grid.write_cells(self.file)
+
+        name_bytes = action_name.encode("utf-8")
+        record = bytearray(MOVE_RECORD)
+        record += MOVE.pack(player_id, x, y, seed or 0, seed is not None, len(name_bytes))
+        record += name_bytes
+
+        if self.record_changes and changes is not None:
+            record += CHANGE_COUNT.pack(len(changes))
+            for change_x, change_y, change_player_id in changes:
+                record += CHANGE.pack(change_x, change_y, change_player_id)
+        else:
+            record += CHANGE_COUNT.pack(NO_CHANGES)
+
+        self.file.write(record)
+        self.file.flush()
+        self.move_count += 1
+
+    def close(self):
+        """
+        Close the replay file.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ReplayPlayer:
+    """
+    Reads a replay file and restores the board after any number of moves.
+
+    Seeking starts from the closest keyframe before the requested move and
+    applies the moves in between, either from their recorded changes or by
+    re-simulating them with their seed. Moving forward from the last position
+    only applies the new moves and moving back a few moves undoes them
+    (see ChangeJournal), so scrubbing through a replay stays fast.
+    """
+
+    def __init__(self, path, actions=None):
+        """
+        Args:
+            path: Replay file to read
+            actions: PlayerActions by name, needed to re-simulate moves recorded without changes
+                     (actions not given here are taken from the action registry)
+        """
+        # Map the file instead of reading it, keyframes are then copied straight from the page cache
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.width, self.height = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a Cell Wars replay")
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay version {version}")
+
+        self.actions = actions or {}
+        self.moves = [] # Offset of each move record
+        self.keyframes = {} # Move index -> offset of the keyframe's cells
+        self.index_records()
+
+        # Board of the last seek, reused when seeking forward or a few moves back
+        self.grid = None
+        self.journal = None # Moves applied to the board since it was last loaded, for stepping back
+        self.position = None
+
+    @property
+    def move_count(self):
+        return len(self.moves)
+
+    def close(self):
+        """
+        Unmap the replay file. Boards returned by seek() stay usable.
+        """
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def index_records(self):
+        """
+        Find the position of every record without decoding the changes.
+        An incomplete record at the end (e.g. the game crashed) is ignored.
+        """
+        offset = HEADER.size
+        board_size = self.width * self.height
+
+        while offset < len(self.data):
+            record_type = self.data[offset:offset + 1]
+            offset += 1
+
+            if record_type == KEYFRAME_RECORD:
+                if offset + KEYFRAME.size + board_size > len(self.data):
+                    break
+                move_index, = KEYFRAME.unpack_from(self.data, offset)
+                self.keyframes[move_index] = offset + KEYFRAME.size
+                offset += KEYFRAME.size + board_size
+
+            elif record_type == MOVE_RECORD:
+                if offset + MOVE.size > len(self.data):
+                    break
+                name_length = MOVE.unpack_from(self.data, offset)[-1]
+                count_offset = offset + MOVE.size + name_length
+                if count_offset + CHANGE_COUNT.size > len(self.data):
+                    break
+                change_count, = CHANGE_COUNT.unpack_from(self.data, count_offset)
+                end = count_offset + CHANGE_COUNT.size
+                if change_count != NO_CHANGES:
+                    end += change_count * CHANGE.size
+                if end > len(self.data):
+                    break
+                self.moves.append(offset)
+                offset = end
+
+            else:
+                raise ValueError(f"Unknown replay record at offset {offset - 1}")
+
+    def get_move(self, move_index):
+        """
+        Decode a move.
+        Returns a dictionary with player_id, action_name, x, y, seed and changes (None if not recorded).
+        """
+        offset = self.moves[move_index]
+        player_id, x, y, seed, has_seed, name_length = MOVE.unpack_from(self.data, offset)
+        offset += MOVE.size
+
+        action_name = self.data[offset:offset + name_length].decode("utf-8")
+        offset += name_length
+
+        change_count, = CHANGE_COUNT.unpack_from(self.data, offset)
+        offset += CHANGE_COUNT.size
+
+        changes = None
+        if change_count != NO_CHANGES:
+            changes = [list(change) for change in CHANGE.iter_unpack(self.data[offset:offset + change_count * CHANGE.size])]
+
+        return {
+            "player_id": player_id,
+            "action_name": action_name,
+            "x": x,
+            "y": y,
+            "seed": seed if has_seed else None,
+            "changes": changes
+        }
+
+    def seek(self, move_index):
+        """
+        Get the board after the first move_index moves (0 = board at the start).
+        The returned grid is reused by the next seek, copy it to keep it.
+        """
+        move_index = max(0, min(move_index, self.move_count))
+
+        # Closest keyframe at or before the requested move
+        keyframe_index = max((index for index in self.keyframes if index <= move_index), default=None)
+
+        # Step back by undoing the last moves if there are fewer of them than moves after the keyframe
+        if (self.position is not None and move_index < self.position
+                and self.position - move_index <= min(self.journal.move_count, move_index - (keyframe_index or 0))):
+            while self.position > move_index:
+                self.journal.undo()
+                self.position -= 1
+            return self.grid
+
+        # Continue from the current position if that is closer than the keyframe
+        if self.position is not None and (keyframe_index or 0) <= self.position <= move_index:
+            start = self.position
+        elif keyframe_index is not None:
+            if self.grid is None:
+                self.create_grid()
+            offset = self.keyframes[keyframe_index]
+            self.grid.load_bytes(self.data[offset:offset + self.width * self.height])
+            start = keyframe_index
+        else:
+            # No keyframe before the move: start from an empty board
+            self.create_grid()
+            start = 0
+
+        for index in range(start, move_index):
+            # Moves undone by an earlier seek are made again from the journal
+            if not self.journal.redo():
+                self.journal.begin_move()
+                self.apply_move(self.get_move(index))
+
+        self.position = move_index
+        return self.grid
+
+    def create_grid(self):
+        """
+        Start with an empty board, recorded by a new journal.
+        """
+        self.grid = Grid(self.width, self.height, 1)
+        self.journal = ChangeJournal(self.grid)
+
+    def apply_move(self, move):
+        """
+        Apply a decoded move to the replay's grid, re-simulating it if no changes were recorded.
+        """
+        changes = move["changes"]
+
+        if changes is None:
+            action = self.actions.get(move["action_name"])
+            if action is None:
+                registry = get_registry()
+                if move["action_name"] not in registry.definitions:
+                    raise ValueError(f"Can't re-simulate unknown action {move['action_name']}")
+                action = registry.create_action(move["action_name"])
+                self.actions[move["action_name"]] = action
+
+            automaton = action.create_automaton(self.grid, move["player_id"], seed=move["seed"])
+            changes = automaton.set_starting_cell(move["x"], move["y"]) + automaton.run()
+
+        for x, y, player_id in changes:
+            self.grid.set_cell(x, y, player_id)
@@ -0,0 +1,234 @@
+"""
+Declarative automata: a pattern described as data instead of a simulate_step() loop.
+
+A rule is a dictionary (e.g. from actions.json):
+
+    {
+        "neighborhood": [[dx, dy, probability], ...],   cells a cell can capture, relative to it
+        "decay": 0.8,                                  probabilities are multiplied by decay ** generation
+        "generations": 5,                              default number of generations (optional)
+        "overwrite_neutral": true,                     default overwrite rules (optional)
+        "overwrite_enemy": false
+    }
+
+Every generation, each cell captured in the previous generation tries to capture each of
+its neighborhood cells with the offset's probability. Attempts are independent, so a cell
+is captured if any attempt on it succeeds and the order of the attempts doesn't matter.
+That allows one step to be a handful of array operations over all (frontier cell, offset)
+pairs at once: a rule is compiled once into a RuleKernel which runs on a stack of board windows.
+"""
+import json
+import numpy as np
+from cellular_automaton import CellularAutomaton
+
+# Rule keys that are action settings rather than part of the pattern
+ACTION_SETTINGS = ("generations", "overwrite_neutral", "overwrite_enemy")
+
+# Compiled kernels by rule key, every rule is only compiled once
+compiled_kernels = {}
+kernels_by_rule = {} # id(rule) -> (rule, kernel)
+
+
+def get_rule_key(rule):
+    """
+    Get a canonical, hashable form of the pattern part of a rule.
+    """
+    pattern = {key: value for key, value in rule.items() if key not in ACTION_SETTINGS}
+    return json.dumps(pattern, sort_keys=True)
+
+
+def compile_rule(rule):
+    """
+    Compile a rule into a RuleKernel, or return the kernel compiled earlier for the same rule.
+    Rules are treated as read-only once they were compiled.
+    """
+    # Actions pass the same rule dictionary every time, which skips building the key
+    known = kernels_by_rule.get(id(rule))
+    if known is not None and known[0] is rule:
+        return known[1]
+
+    key = get_rule_key(rule)
+    kernel = compiled_kernels.get(key)
+    if kernel is None:
+        kernel = RuleKernel(rule)
+        compiled_kernels[key] = kernel
+
+    # Keep a reference to the rule, so its id can't be reused by another dictionary
+    kernels_by_rule[id(rule)] = (rule, kernel)
+    return kernel
+
+
+class RuleKernel:
+    """
+    A rule prepared for vectorized execution: the offsets as arrays and the probabilities
+    of every offset in every generation as a lookup table.
+    """
+
+    def __init__(self, rule):
+        neighborhood = rule.get("neighborhood")
+        if not neighborhood:
+            raise ValueError("A rule needs a neighborhood")
+
+        self.key = get_rule_key(rule)
+        self.offsets = [(int(dx), int(dy)) for dx, dy, probability in neighborhood]
+        self.offset_x = np.array([dx for dx, dy in self.offsets])
+        self.offset_y = np.array([dy for dx, dy in self.offsets])
+        self.probabilities = np.array([float(probability) for dx, dy, probability in neighborhood])
+        self.decay = float(rule.get("decay", 1.0))
+
+        if any(dx == 0 and dy == 0 for dx, dy in self.offsets):
+            raise ValueError("A neighborhood offset can't be (0, 0)")
+        if np.any(self.probabilities < 0) or np.any(self.probabilities > 1) or self.decay < 0:
+            raise ValueError("Rule probabilities must be between 0 and 1 and the decay positive")
+
+        # Distance the pattern can jump per generation (diagonals count as one)
+        self.radius = max(max(abs(dx), abs(dy)) for dx, dy in self.offsets)
+
+        self.tables = {} # Number of generations -> probability table
+
+    def get_table(self, generations):
+        """
+        Get the probability of every offset (columns) in every generation (rows).
+        """
+        table = self.tables.get(generations)
+        if table is None:
+            decay = self.decay ** np.arange(max(1, generations))
+            table = np.minimum(1.0, decay[:, np.newaxis] * self.probabilities)
+            self.tables[generations] = table
+        return table
+
+    def is_deterministic(self, generations):
+        """
+        Check if the rule makes no random decisions (every probability is 0 or 1).
+        """
+        table = self.get_table(generations)
+        return bool(np.all((table == 0) | (table == 1)))
+
+    def step(self, boards, frontier, can_conquer_states, probabilities, rng):
+        """
+        Run one generation: every frontier cell attacks all its neighborhood cells at once.
+
+        Args:
+            boards: Board windows (count x height x width)
+            frontier: Instance, x and y arrays of the cells captured in the last generation
+            can_conquer_states: Function telling which cell states may be captured (array -> bool array)
+            probabilities: Probability of each offset in this generation (a row of get_table())
+            rng: NumPy random generator
+
+        Returns:
+            Instance, x and y arrays of the cells captured in this generation (each cell once)
+        """
+        count, height, width = boards.shape
+        instances, cell_x, cell_y = frontier
+
+        # One attack per frontier cell (rows) and offset (columns), the ones inside the window are kept
+        target_x = cell_x[:, np.newaxis] + self.offset_x
+        target_y = cell_y[:, np.newaxis] + self.offset_y
+        rows, columns = np.nonzero((target_x >= 0) & (target_x < width) & (target_y >= 0) & (target_y < height))
+        attack_instances, attack_x, attack_y = instances[rows], target_x[rows, columns], target_y[rows, columns]
+
+        # Attacks on cells that may be captured succeed with the offset's probability
+        success = can_conquer_states(boards[attack_instances, attack_y, attack_x])
+        success[success] = rng.random(np.count_nonzero(success)) < probabilities[columns[success]]
+
+        # A cell attacked successfully more than once is only captured once
+        cells = np.unique((attack_instances[success] * height + attack_y[success]) * width + attack_x[success])
+        return cells // (height * width), cells % width, cells // width % height
+
+
+class RuleAutomaton(CellularAutomaton):
+    """
+    A cellular automaton driven by a declarative rule (see the module documentation).
+    Single runs and batches use the same compiled NumPy kernel.
+
+    Subclass of CellularAutomaton.
+    """
+
+    def __init__(self, grid, player_id, generations=5, overwrite_neutral=True, overwrite_enemy=False, seed=None, rule=None):
+        super().__init__(grid, player_id, generations, overwrite_neutral, overwrite_enemy, seed)
+
+        if rule is None:
+            raise ValueError("RuleAutomaton needs a rule")
+
+        self.rule = rule
+        self.kernel = compile_rule(rule)
+
+        # Rules whose probabilities are all 0 or 1 always give the same result
+        self.deterministic = self.kernel.is_deterministic(generations)
+
+    def get_parameters(self):
+        """Add the rule to the base parameters"""
+        return super().get_parameters() + (self.kernel.key,)
+
+    def reach(self):
+        """The pattern can jump the kernel's radius per generation"""
+        return self.generations * self.kernel.radius
+
+    def create_instance(self, seed=None):
+        """Create a fresh automaton with the same rule and settings"""
+        return type(self)(self.grid, self.player_id, self.generations,
+                          self.overwrite_neutral, self.overwrite_enemy, seed=seed, rule=self.rule)
+
+    def run(self):
+        """
+        Run the rule from the starting cell.
+        Simulates and collects changes without applying them to the grid.
+        """
+        if not self.possible_cells:
+            return []
+
+        # Draw the kernel's seed from the automaton's own generator, so seeded runs can be repeated
+        rng = np.random.default_rng(self.random.getrandbits(64))
+        x, y = next(iter(self.possible_cells))
+        return self.run_rule(x, y, 1, rng, collect_changes=True)["changes"][0][1:]
+
+    def run_batch(self, x, y, count, seed=None, collect_changes=False):
+        """
+        Run count instances of the rule from the same starting cell at once.
+        """
+        return self.run_rule(x, y, count, np.random.default_rng(seed), collect_changes)
+
+    def run_rule(self, x, y, count, rng, collect_changes=False):
+        """
+        Run count instances on a stack of board windows (count x height x width).
+        Returns the same dictionary as run_batch().
+        """
+        conquered = np.zeros(count, dtype=np.int64)
+        captured = np.zeros(count, dtype=np.int64)
+        all_changes = [[] for _ in range(count)] if collect_changes else None
+
+        if not (0 <= x < self.grid.width and 0 <= y < self.grid.height) or count == 0:
+            return {"conquered": conquered, "captured": captured, "changes": all_changes}
+
+        window, x0, y0 = self.get_batch_window(x, y)
+        boards = np.repeat(window[np.newaxis], count, axis=0)
+        enemy = (window != self.grid.NEUTRAL) & (window != self.player_id)
+
+        # Starting cell
+        start_x, start_y = x - x0, y - y0
+        conquered[:] = window[start_y, start_x] != self.player_id
+        captured[:] = enemy[start_y, start_x]
+        boards[:, start_y, start_x] = self.player_id
+        if collect_changes:
+            for changes in all_changes:
+                changes.append([x, y, self.player_id])
+
+        # Frontier: instance, x and y of every cell captured in the last generation
+        frontier = (np.arange(count), np.full(count, start_x), np.full(count, start_y))
+        table = self.kernel.get_table(self.generations)
+
+        for generation in range(self.generations):
+            frontier = self.kernel.step(boards, frontier, self.can_conquer_states, table[generation], rng)
+            instances, cell_x, cell_y = frontier
+            if instances.size == 0:
+                break
+
+            boards[instances, cell_y, cell_x] = self.player_id
+            conquered += np.bincount(instances, minlength=count)
+            captured += np.bincount(instances[enemy[cell_y, cell_x]], minlength=count)
+
+            if collect_changes:
+                for instance, change_x, change_y in zip(instances.tolist(), (cell_x + x0).tolist(), (cell_y + y0).tolist()):
+                    all_changes[instance].append([change_x, change_y, self.player_id])
+
+        return {"conquered": conquered, "captured": captured, "changes": all_changes}
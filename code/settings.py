@@ -0,0 +1,249 @@
+"""
+Game settings: board, turns, animation speed, display, network and actions.
+
+The defaults below are overridden by a settings file and then by command line options:
+
+    python3 main.py --config big_board.toml --width 2000 --height 2000 --tiled --step-delay 0
+
+A settings file is JSON (.json) or TOML (.toml, needs Python 3.11 or the tomli package) and
+holds any part of DEFAULT_SETTINGS, e.g.
+
+    {"board": {"width": 400, "height": 300}, "animation": {"changes_per_step": 50}}
+
+Without --config, settings.json or settings.toml next to this file is used if it exists.
+Networked players should use the same board, turn and action settings.
+"""
+import argparse, copy, json, os
+from importlib import import_module, util
+
+SETTINGS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FILES = [os.path.join(SETTINGS_FOLDER, name) for name in ("settings.json", "settings.toml")]
+
+DEFAULT_SETTINGS = {
+    "board": {
+        "width": 20,  # Number of cells in each direction (boards larger than the viewport can be zoomed and panned)
+        "height": 20,
+        "cell_size": 20,  # Initial size of each cell in pixels
+        "tiled": False  # Store the board in chunks that are only allocated when claimed (for very large boards)
+    },
+    "game": {
+        "turns": 5  # Turns of each player
+    },
+    "animation": {
+        "step_delay": 50,  # Milliseconds between animation steps
+        "changes_per_step": 1,  # Number of cells to update per animation step
+        "frame_rate": 60  # Frames per second of the game loop while something is moving
+    },
+    "display": {
+        "video_driver": None  # SDL video driver, e.g. "dummy" to run without a window (None = SDL's choice)
+    },
+    "engine": {
+        "kernels": True  # Run the built-in patterns on compiled kernels if Numba is installed
+    },
+    "network": {
+        "port": 5555
+    },
+    "actions": {
+        "config": None,  # Extra actions file in the format of actions.json (its loadout replaces the default one)
+        "loadout": None,  # Names of the actions every player gets (None = the loadout of the action files)
+        "generations": {}  # Action name -> number of generations
+    }
+}
+
+# Tables whose keys are free (names) instead of settings
+FREE_TABLES = ["actions.generations"]
+
+# Settings that can be left unset (None), with the type of their value when set
+OPTIONAL_SETTINGS = {
+    "display.video_driver": str,
+    "actions.config": str,
+    "actions.loadout": list
+}
+
+
+def load_file(path):
+    """
+    Read a settings file (JSON or TOML, by its extension).
+    """
+    if path.endswith(".toml"):
+        # tomllib is part of Python 3.11+, tomli is the same parser for older versions
+        module_name = next((name for name in ("tomllib", "tomli") if util.find_spec(name) is not None), None)
+        if module_name is None:
+            raise ValueError(f"Reading {path} needs Python 3.11 or the tomli package, use a JSON file otherwise")
+        with open(path, "rb") as file:
+            return import_module(module_name).load(file)
+
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def merge(settings, overrides, section=None):
+    """
+    Override settings in place with the values of a (partial) settings dictionary.
+    Raises ValueError for unknown settings and values of the wrong type (None only for OPTIONAL_SETTINGS).
+    """
+    for key, value in overrides.items():
+        name = f"{section}.{key}" if section else key
+        if key not in settings:
+            raise ValueError(f"Unknown setting {name}")
+
+        default = settings[key]
+        if isinstance(default, dict):
+            if not isinstance(value, dict):
+                raise ValueError(f"{name} must be a table of settings")
+            if name in FREE_TABLES:
+                default.update(value)
+            else:
+                merge(default, value, name)
+        elif name in OPTIONAL_SETTINGS:
+            expected_type = OPTIONAL_SETTINGS[name]
+            if value is not None and not isinstance(value, expected_type):
+                raise ValueError(f"{name} must be of type {expected_type.__name__}, not {type(value).__name__}")
+            settings[key] = value
+        elif not isinstance(value, type(default)):
+            raise ValueError(f"{name} must be of type {type(default).__name__}, not {type(value).__name__}")
+        elif isinstance(value, bool) and isinstance(default, int) and not isinstance(default, bool):
+            raise ValueError(f"{name} must be a number")
+        else:
+            settings[key] = value
+
+
+def parse_generations(text):
+    """
+    Parse a --generations option ("Action name=count").
+    """
+    name, separator, count = text.rpartition("=")
+    if not separator or not name:
+        raise argparse.ArgumentTypeError(f"expected NAME=COUNT, got {text!r}")
+    try:
+        return name, int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{count!r} is not a number of generations")
+
+
+def create_parser():
+    """
+    Create the command line parser. Every option's dest is the setting it overrides.
+    """
+    parser = argparse.ArgumentParser(description="Cell Wars - a two-player game based on cellular automata.")
+    parser.add_argument("--config", metavar="FILE", help="settings file (JSON or TOML)")
+
+    board = parser.add_argument_group("board")
+    board.add_argument("--width", dest="board.width", type=int, metavar="CELLS", help="board width in cells")
+    board.add_argument("--height", dest="board.height", type=int, metavar="CELLS", help="board height in cells")
+    board.add_argument("--cell-size", dest="board.cell_size", type=int, metavar="PIXELS", help="initial cell size in pixels")
+    board.add_argument("--tiled", dest="board.tiled", action="store_true", default=None,
+                       help="store the board in chunks (for very large boards)")
+
+    game = parser.add_argument_group("game")
+    game.add_argument("--turns", dest="game.turns", type=int, metavar="TURNS", help="turns of each player")
+    game.add_argument("--step-delay", dest="animation.step_delay", type=int, metavar="MS",
+                      help="milliseconds between animation steps")
+    game.add_argument("--changes-per-step", dest="animation.changes_per_step", type=int, metavar="CELLS",
+                      help="cells updated per animation step")
+    game.add_argument("--frame-rate", dest="animation.frame_rate", type=int, metavar="FPS",
+                      help="frame rate while something is moving")
+
+    engine = parser.add_argument_group("display and engine")
+    engine.add_argument("--video-driver", dest="display.video_driver", metavar="DRIVER",
+                        help='SDL video driver, e.g. "dummy" to run without a window')
+    engine.add_argument("--no-kernels", dest="engine.kernels", action="store_false", default=None,
+                        help="don't use the compiled Numba kernels")
+    engine.add_argument("--port", dest="network.port", type=int, metavar="PORT", help="network port to host or join on")
+
+    actions = parser.add_argument_group("actions")
+    actions.add_argument("--actions", dest="actions.config", metavar="FILE",
+                         help="extra actions file in the format of actions.json")
+    actions.add_argument("--loadout", dest="actions.loadout", type=lambda text: [name.strip() for name in text.split(",")],
+                         metavar="NAMES", help="comma separated names of the actions every player gets")
+    actions.add_argument("--generations", dest="actions.generations", type=parse_generations, action="append",
+                         metavar="NAME=COUNT", help="number of generations of an action (can be repeated)")
+    return parser
+
+
+def parse_arguments(parser, argv=None):
+    """
+    Parse command line options (default: sys.argv) with a parser from create_parser().
+    Returns the settings file (or None) and the overridden settings as a partial settings dictionary.
+    """
+    arguments = vars(parser.parse_args(argv))
+    config = arguments.pop("config")
+
+    overrides = {}
+    for name, value in arguments.items():
+        if value is None:
+            continue
+        if name == "actions.generations":
+            value = dict(value)
+
+        section, key = name.split(".")
+        overrides.setdefault(section, {})[key] = value
+
+    return config, overrides
+
+
+def load_settings(argv=None):
+    """
+    Get the settings: the defaults, overridden by the settings file and the command line options.
+    Exits with a usage message if an option or the settings file is invalid.
+    """
+    parser = create_parser()
+    config, overrides = parse_arguments(parser, argv)
+    settings = copy.deepcopy(DEFAULT_SETTINGS)
+
+    if config is None:
+        config = next((path for path in DEFAULT_FILES if os.path.exists(path)), None)
+
+    if config is not None:
+        try:
+            merge(settings, load_file(config))
+        except (OSError, ValueError) as error:
+            parser.error(f"{config}: {error}")
+
+    try:
+        merge(settings, overrides)
+        check(settings)
+    except ValueError as error:
+        parser.error(str(error))
+
+    return settings
+
+
+def check(settings):
+    """
+    Raise ValueError for settings that can't be used.
+    """
+    if settings["board"]["width"] < 1 or settings["board"]["height"] < 1 or settings["board"]["cell_size"] < 1:
+        raise ValueError("The board and its cells need a size of at least 1")
+    if settings["game"]["turns"] < 1:
+        raise ValueError("A game needs at least one turn")
+    if settings["animation"]["step_delay"] < 0 or settings["animation"]["changes_per_step"] < 1:
+        raise ValueError("The animation needs a step delay of at least 0 and at least one change per step")
+    if settings["animation"]["frame_rate"] < 1:
+        raise ValueError("The frame rate must be at least 1")
+    if not 0 < settings["network"]["port"] < 65536:
+        raise ValueError("The network port must be between 1 and 65535")
+    if any(not isinstance(count, int) or isinstance(count, bool) or count < 0
+           for count in settings["actions"]["generations"].values()):
+        raise ValueError("Generations must be whole numbers of at least 0")
+    if settings["actions"]["loadout"] is not None and not all(isinstance(name, str) for name in settings["actions"]["loadout"]):
+        raise ValueError("actions.loadout must be a list of action names")
+
+
+def apply_action_settings(registry, actions):
+    """
+    Apply the "actions" settings to an ActionRegistry: load the extra actions file,
+    change the generations of actions and select the loadout.
+    Raises KeyError for actions that aren't registered.
+    """
+    if actions["config"]:
+        registry.load_config(actions["config"])
+
+    for name, generations in actions["generations"].items():
+        registry.configure(name, generations=generations)
+
+    if actions["loadout"]:
+        for name in actions["loadout"]:
+            if name not in registry.definitions:
+                raise KeyError(f"Unknown action {name}")
+        registry.loadout = list(actions["loadout"])
@@ -0,0 +1,430 @@
+from collections import deque
+import numpy as np
+
+
+def spread_along_rows(labels, same_right):
+    """
+    Give every horizontal run of same-state cells the smallest label in the run.
+    """
+    height, width = labels.shape
+
+    # A run starts at the beginning of every row and wherever the state changes
+    run_start = np.ones((height, width), dtype=bool)
+    run_start[:, 1:] = ~same_right
+    starts = np.nonzero(run_start.reshape(-1))[0]
+
+    run_minimum = np.minimum.reduceat(labels.reshape(-1), starts)
+    run_length = np.diff(np.append(starts, height * width))
+    return np.repeat(run_minimum, run_length).reshape(height, width)
+
+
+def label_components(states):
+    """
+    Label the connected areas of a board (cells connected up, down, left or right with the same state).
+    Pure NumPy: every cell starts with its own index as label. Then every horizontal and
+    vertical run of same-state cells takes the smallest label in the run, and pointer jumping
+    spreads labels further, until nothing changes anymore.
+
+    Args:
+        states: 2-D array of cell states
+
+    Returns:
+        2-D int array where every area is labeled with the smallest flat index of its cells
+    """
+    height, width = states.shape
+    labels = np.arange(height * width, dtype=np.int64).reshape(height, width)
+
+    # Which neighbor pairs belong to the same area
+    same_right = states[:, 1:] == states[:, :-1]
+    same_down = (states[1:, :] == states[:-1, :]).T
+
+    while True:
+        previous_labels = labels
+
+        # Spread the smallest label along rows, then along columns
+        labels = spread_along_rows(labels, same_right)
+        labels = spread_along_rows(np.ascontiguousarray(labels.T), same_down).T
+
+        # Pointer jumping: a label is a cell index, follow it to that cell's (smaller) label
+        flat_labels = labels.reshape(-1)
+        while True:
+            jumped = flat_labels[flat_labels]
+            if np.array_equal(jumped, flat_labels):
+                break
+            flat_labels = jumped
+        labels = flat_labels.reshape(height, width)
+
+        if np.array_equal(labels, previous_labels):
+            return labels
+
+
+class TerritoryAnalyzer:
+    """
+    Territory statistics of a grid: connected regions per player, the largest region
+    and neutral pockets enclosed by a single player.
+
+    Player regions are tracked with a union-find structure that is updated cell by cell
+    while moves are animated, so the region statistics are always current. Union-find can
+    only merge regions: when a player loses a cell that connected parts of a region, searches
+    from its neighbors run in lockstep until all but one have explored their part, so only
+    the parts that were cut off are relabeled, not the region they left.
+
+    Conquering neutral cells can split pockets, so the pockets are recalculated with the
+    vectorized labeling when they are asked for and the board changed, but only once a move
+    is applied (see begin_changes()). The labeling only covers the rectangle of chunks that
+    hold claimed cells, so it doesn't grow with the size of the board.
+    """
+
+    # Claimed cells are looked for in blocks of this many cells (the default chunk size of a TiledGrid)
+    BLOCK_SIZE = 64
+
+    def __init__(self, grid):
+        self.grid = grid
+
+        # Union-find: every owned cell (flat index) points to a node, nodes point to their parent.
+        # Nodes aren't reused, so a lost cell's node can stay in the tree for the cells below it.
+        self.node = {}
+        self.parent = {}
+        self.next_node = 0
+        self.region_size = {} # Root -> number of cells
+        self.region_player = {} # Root -> player
+        self.region_counts = {} # Player -> number of regions
+        self.largest_region = {} # Player -> size of the largest region
+        self.largest_outdated = set() # Players whose largest region may have shrunk
+
+        # Neutral pockets: player -> list of pockets (each a list of flat indices)
+        self.pockets = {}
+
+        self.pockets_outdated = False # Board changed since the pockets were calculated
+        self.changing = False # A move is being applied, see begin_changes()
+
+        self.relabel()
+
+    def create_node(self):
+        """
+        Create a new union-find node that is its own root.
+        """
+        node = self.next_node
+        self.next_node += 1
+        self.parent[node] = node
+        return node
+
+    def find(self, node):
+        """
+        Find the root of a node's region (with path halving).
+        """
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(self, node, other_node, player_id):
+        """
+        Merge the regions of two nodes of the same player.
+        """
+        root = self.find(node)
+        other_root = self.find(other_node)
+        if root == other_root:
+            return
+
+        # Attach the smaller region to the larger one
+        if self.region_size[root] < self.region_size[other_root]:
+            root, other_root = other_root, root
+
+        self.parent[other_root] = root
+        self.region_size[root] += self.region_size.pop(other_root)
+        del self.region_player[other_root]
+        self.region_counts[player_id] -= 1
+        self.largest_region[player_id] = max(self.largest_region.get(player_id, 0), self.region_size[root])
+
+    def add_region(self, player_id, size):
+        """
+        Create the root of a new region.
+        """
+        root = self.create_node()
+        self.region_size[root] = size
+        self.region_player[root] = player_id
+        self.region_counts[player_id] = self.region_counts.get(player_id, 0) + 1
+        self.largest_region[player_id] = max(self.largest_region.get(player_id, 0), size)
+        return root
+
+    def get_neighbors(self, x, y, player_id):
+        """
+        Get the neighbors (up, right, down, left) of a cell that the player owns.
+        """
+        return [(neighbor_x, neighbor_y) for neighbor_x, neighbor_y in ((x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y))
+                if self.grid.get_cell(neighbor_x, neighbor_y) == player_id]
+
+    def cell_changed(self, x, y, old_state, new_state):
+        """
+        Update the statistics after a cell changed from old_state to new_state.
+        Call this after the change was applied to the grid.
+        """
+        if old_state == new_state:
+            return
+
+        self.pockets_outdated = True
+        if old_state != self.grid.NEUTRAL:
+            self.remove_cell(x, y, old_state)
+        if new_state != self.grid.NEUTRAL:
+            self.add_cell(x, y, new_state)
+
+    def add_cell(self, x, y, player_id):
+        """
+        A player conquered a cell: a new single cell region, merged with the neighboring regions.
+        """
+        index = y * self.grid.width + x
+        node = self.add_region(player_id, 1)
+        self.node[index] = node
+
+        for neighbor_x, neighbor_y in self.get_neighbors(x, y, player_id):
+            neighbor_node = self.node.get(neighbor_y * self.grid.width + neighbor_x)
+            if neighbor_node is not None:
+                self.union(node, neighbor_node, player_id)
+
+    def remove_cell(self, x, y, player_id):
+        """
+        A player lost a cell: its region shrinks, disappears or falls apart.
+        """
+        node = self.node.pop(y * self.grid.width + x, None)
+        if node is None:
+            return
+
+        root = self.find(node)
+        self.region_size[root] -= 1
+        self.largest_outdated.add(player_id)
+
+        neighbors = self.get_neighbors(x, y, player_id)
+        if not neighbors:
+            # The region was only this cell
+            del self.region_size[root]
+            del self.region_player[root]
+            self.region_counts[player_id] -= 1
+        elif len(neighbors) > 1:
+            self.split_region(root, player_id, neighbors)
+
+    def split_region(self, root, player_id, starts):
+        """
+        Find out if the neighbors of a lost cell are still connected. A search from every neighbor
+        takes one cell per turn. Searches that meet are joined. When at most one group of searches
+        is still running, every finished group has explored a part that was cut off, so the cost
+        depends on the size of the cut off parts and not on the remaining region.
+        """
+        count = len(starts)
+        groups = list(range(count)) # Union-find over the searches
+
+        def find_group(search):
+            while groups[search] != search:
+                groups[search] = groups[groups[search]]
+                search = groups[search]
+            return search
+
+        visited = {start: search for search, start in enumerate(starts)} # Cell -> search that reached it
+        queues = [deque([start]) for start in starts]
+        cells = [[start] for start in starts]
+
+        while True:
+            running = {find_group(search) for search in range(count) if queues[search]}
+            all_groups = {find_group(search) for search in range(count)}
+            if len(all_groups) == 1:
+                return # Still connected
+            if len(running) <= 1:
+                break
+
+            for search in range(count):
+                if not queues[search]:
+                    continue
+                x, y = queues[search].popleft()
+                for neighbor in self.get_neighbors(x, y, player_id):
+                    other_search = visited.get(neighbor)
+                    if other_search is None:
+                        visited[neighbor] = search
+                        queues[search].append(neighbor)
+                        cells[search].append(neighbor)
+                    elif find_group(other_search) != find_group(search):
+                        groups[find_group(other_search)] = find_group(search)
+
+        # The running group (or the largest part if all finished) stays in the old region
+        parts = {}
+        for search in range(count):
+            parts.setdefault(find_group(search), []).extend(cells[search])
+        kept = next(iter(running)) if running else max(parts, key=lambda group: len(parts[group]))
+
+        for group, part in parts.items():
+            if group == kept:
+                continue
+            new_root = self.add_region(player_id, len(part))
+            self.region_size[root] -= len(part)
+            for x, y in part:
+                self.node[y * self.grid.width + x] = new_root
+
+    def get_claimed_area(self):
+        """
+        Get the rectangle of blocks with claimed cells, one cell larger on every side (clipped
+        to the board), as x0, y0, x1, y1 (x1 and y1 exclusive), or None if no cell is claimed.
+        All cells around the rectangle are neutral and connected to the board edge.
+        """
+        blocks = self.grid.get_claimed_blocks(self.BLOCK_SIZE)
+        if not blocks:
+            return None
+
+        size = self.BLOCK_SIZE
+        x0 = max(0, min(block_x for block_x, block_y in blocks) * size - 1)
+        y0 = max(0, min(block_y for block_x, block_y in blocks) * size - 1)
+        x1 = min(self.grid.width, (max(block_x for block_x, block_y in blocks) + 1) * size + 1)
+        y1 = min(self.grid.height, (max(block_y for block_x, block_y in blocks) + 1) * size + 1)
+        return x0, y0, x1, y1
+
+    def label_claimed_area(self):
+        """
+        Label the connected areas of the claimed area (see label_components()).
+        Returns the states, the labels and the area's top left corner, or None if no cell is claimed.
+        """
+        area = self.get_claimed_area()
+        if area is None:
+            return None
+
+        x0, y0, x1, y1 = area
+        states = np.frombuffer(self.grid.get_region(x0, y0, x1, y1), dtype=np.uint8).reshape(y1 - y0, x1 - x0)
+        return states, label_components(states), x0, y0
+
+    def relabel(self):
+        """
+        Recalculate all regions and pockets from scratch (vectorized).
+        """
+        self.node = {}
+        self.parent = {}
+        self.next_node = 0
+        self.region_size = {}
+        self.region_player = {}
+        self.region_counts = {}
+        self.largest_region = {}
+        self.largest_outdated = set()
+
+        labeled = self.label_claimed_area()
+        if labeled is None:
+            self.pockets = {}
+            self.pockets_outdated = False
+            return
+
+        states, labels, x0, y0 = labeled
+        flat_states = states.reshape(-1)
+        flat_labels = labels.reshape(-1)
+        area_width = states.shape[1]
+
+        # One node per region, every cell points directly to it
+        owned = np.nonzero(flat_states != self.grid.NEUTRAL)[0]
+        labels_found, region_index, sizes = np.unique(flat_labels[owned], return_inverse=True, return_counts=True)
+        roots = [self.add_region(int(flat_states[label]), size) for label, size in zip(labels_found.tolist(), sizes.tolist())]
+
+        cell_indices = (owned // area_width + y0) * self.grid.width + owned % area_width + x0
+        self.node = dict(zip(cell_indices.tolist(), [roots[index] for index in region_index.tolist()]))
+
+        self.find_pockets(labeled)
+
+    def find_pockets(self, labeled=None):
+        """
+        Find the neutral areas that don't touch the board edge and are surrounded by one player only.
+        Labels the claimed area first if no labels are given.
+        """
+        if labeled is None:
+            labeled = self.label_claimed_area()
+
+        self.pockets = {}
+        self.pockets_outdated = False
+        if labeled is None:
+            return
+
+        states, labels, x0, y0 = labeled
+        neutral = states == self.grid.NEUTRAL
+        if not neutral.any():
+            return
+
+        # Neutral areas touching the edge of the claimed area are connected to the board edge
+        edge_labels = np.unique(np.concatenate((labels[0][neutral[0]], labels[-1][neutral[-1]],
+                                                labels[:, 0][neutral[:, 0]], labels[:, -1][neutral[:, -1]])))
+
+        # Collect (neutral area, neighboring player) pairs in all four directions
+        pairs = []
+        for area, neighbor_area, area_states, neighbor_states in (
+                (labels[:, :-1], labels[:, 1:], states[:, :-1], states[:, 1:]),
+                (labels[:, 1:], labels[:, :-1], states[:, 1:], states[:, :-1]),
+                (labels[:-1, :], labels[1:, :], states[:-1, :], states[1:, :]),
+                (labels[1:, :], labels[:-1, :], states[1:, :], states[:-1, :])):
+            border = (area_states == self.grid.NEUTRAL) & (neighbor_states != self.grid.NEUTRAL)
+            pairs.append(np.stack((area[border], neighbor_states[border].astype(np.int64)), axis=1))
+
+        pairs = np.unique(np.concatenate(pairs), axis=0)
+        if len(pairs) == 0:
+            return
+
+        # Keep the areas with exactly one neighboring player and no edge contact
+        areas, neighbor_counts = np.unique(pairs[:, 0], return_counts=True)
+        enclosed = areas[(neighbor_counts == 1) & ~np.isin(areas, edge_labels)]
+        owners = dict(pairs[np.isin(pairs[:, 0], enclosed)].tolist())
+
+        flat_labels = labels.reshape(-1)
+        area_width = states.shape[1]
+        neutral_indices = np.nonzero(neutral.reshape(-1) & np.isin(flat_labels, enclosed))[0]
+        cell_indices = (neutral_indices // area_width + y0) * self.grid.width + neutral_indices % area_width + x0
+
+        pocket_cells = {}
+        for index, label in zip(cell_indices.tolist(), flat_labels[neutral_indices].tolist()):
+            pocket_cells.setdefault(label, []).append(index)
+
+        for label, cells in pocket_cells.items():
+            self.pockets.setdefault(owners[label], []).append(cells)
+
+    def begin_changes(self):
+        """
+        A move is about to be applied cell by cell: postpone the pocket search until end_changes().
+        Regions are still updated with every cell.
+        """
+        self.changing = True
+
+    def end_changes(self):
+        """
+        The move is applied: bring the statistics up to date.
+        """
+        self.changing = False
+        self.update()
+
+    def update(self):
+        """
+        Bring the pockets up to date (only if the board changed and no move is being applied).
+        """
+        if self.pockets_outdated and not self.changing:
+            self.find_pockets()
+
+    def get_largest_region(self, player_id):
+        """
+        Get the size of a player's largest region, recounted if the player lost cells since.
+        """
+        if player_id in self.largest_outdated:
+            self.largest_outdated.discard(player_id)
+            self.largest_region[player_id] = max((size for root, size in self.region_size.items()
+                                                  if self.region_player[root] == player_id), default=0)
+        return self.largest_region.get(player_id, 0)
+
+    def get_stats(self, player_id):
+        """
+        Get the territory statistics of a player as a dictionary:
+        number of regions, size of the largest region, number of enclosed neutral pockets and their cells.
+        """
+        self.update()
+        pockets = self.pockets.get(player_id, [])
+        return {
+            "regions": self.region_counts.get(player_id, 0),
+            "largest_region": self.get_largest_region(player_id),
+            "enclosed_pockets": len(pockets),
+            "enclosed_cells": sum(len(cells) for cells in pockets)
+        }
+
+    def get_pocket_cells(self, player_id):
+        """
+        Get the coordinates of all neutral cells in pockets enclosed by a player.
+        """
+        self.update()
+        width = self.grid.width
+        return [(index % width, index // width) for cells in self.pockets.get(player_id, []) for index in cells]
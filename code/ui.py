@@ -1,9 +1,235 @@
 import pygame
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 
 WHITE = (240, 246, 239)
 
+def wait_for_events(timeout=None):
+    """
+    Sleep until an event arrives (input, window or posted events) or the timeout has passed,
+    instead of redrawing a screen that didn't change.
+
+    Args:
+        timeout (int): Longest time to sleep in milliseconds, None to sleep until the next event
+                       and 0 to only collect the pending events
+
+    Returns:
+        list: The events, empty if the timeout passed without any
+    """
+    if timeout is None:
+        events = [pygame.event.wait()]
+    elif timeout > 0:
+        event = pygame.event.wait(int(timeout))
+        events = [] if event.type == pygame.NOEVENT else [event]
+    else:
+        events = []
+
+    return events + pygame.event.get()
+
+
+#-- LazyFont Class
+class LazyFont:
+    """
+    A font that is only loaded from its file when it is first used.
+    Behaves like the pygame.font.Font it wraps (render(), size(), ...).
+
+           Arguments:
+            path (str): Font file
+            size (int): Font size in points
+    """
+    def __init__(self, path, size):
+        self.path = path
+        self.size_points = size
+        self.font = None
+
+    def load(self):
+        """
+        Get the wrapped pygame font, loading it (and the font module) on first use.
+        """
+        if self.font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            self.font = pygame.font.Font(self.path, self.size_points)
+        return self.font
+
+    def __getattr__(self, name):
+        # Only called for attributes LazyFont doesn't have itself: forward them to the font
+        return getattr(self.load(), name)
+
+
+#-- TextCache Class
+class TextCache:
+    """
+    Keeps rendered text surfaces, so text that didn't change since the last frame
+    isn't rasterized again. The least recently used surfaces are dropped when the cache is full.
+
+           Arguments:
+            max_size (int): Number of surfaces to keep
+    """
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.surfaces = OrderedDict() # (font, text, color) -> surface, least recently used first
+
+    def render(self, font, text, color):
+        """
+        Get the surface of a text, rendering it (antialiased) only if it isn't cached.
+
+        Args:
+            font: Pygame font (or LazyFont) to use
+            text (str): Text to render
+            color (tuple): RGB color tuple for the text
+
+        Returns:
+            pygame.Surface: The rendered text (shared, don't draw on it)
+        """
+        key = (font, text, tuple(color))
+        surface = self.surfaces.get(key)
+
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_size:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+
+        return surface
+
+    def clear(self):
+        """
+        Drop all cached surfaces.
+        """
+        self.surfaces.clear()
+
+
+# Cache shared by all text drawn through render_text() and the buttons
+text_cache = TextCache()
+
+
+def render_text(font, text, color):
+    """
+    Render a text with the shared text cache (see TextCache.render()).
+    """
+    return text_cache.render(font, text, color)
+
+
+#-- Widget Class
+class Widget(ABC):
+    """
+    Base class of the retained UI elements drawn by a UILayer, subclasses implement draw().
+    A widget remembers the state it was last drawn in (get_state()) and the area it covered,
+    so the layer only redraws widgets whose state changed.
+
+           Arguments:
+            rect (pygame.Rect): Position and size of the widget
+    """
+    def __init__(self, rect):
+        self.rect = rect
+        self.dirty = True # Needs to be drawn again
+        self.drawn_state = None
+        self.drawn_rect = None # Area covered by the last draw, None if nothing was drawn
+
+    def get_state(self):
+        """
+        Get everything the widget's look depends on (compared with ==).
+        """
+        return None
+
+    def get_bounds(self):
+        """
+        Get the area the widget covers when drawn in its current state, or None if it draws nothing.
+        """
+        return self.rect
+
+    def update(self):
+        """
+        Mark the widget dirty if its state changed since it was last drawn.
+        Returns True if the widget is dirty.
+        """
+        state = self.get_state()
+        if state != self.drawn_state:
+            self.drawn_state = state
+            self.dirty = True
+        return self.dirty
+
+    @abstractmethod
+    def draw(self, surface):
+        """
+        Draw the widget on the given surface.
+        """
+
+
+#-- Label Class
+class Label(Widget):
+    """
+    A line of text. The text and color can be functions, which are called to get the current
+    value, so the label follows a game value and is only redrawn when the text changes.
+
+           Arguments:
+            font: Pygame font (or LazyFont) to use
+            text (str or function): Text to display, None or "" to hide the label
+            color (tuple or function): RGB color tuple for the text
+            position: Where to put the text, as a pygame.Rect keyword (e.g. center=(x, y))
+    """
+    def __init__(self, font, text, color, **position):
+        super().__init__(None)
+        self.font = font
+        self.text = text
+        self.color = color
+        self.position = position
+
+    def get_state(self):
+        """The shown text and its color"""
+        text = self.text() if callable(self.text) else self.text
+        color = self.color() if callable(self.color) else self.color
+        return (text, color)
+
+    def get_bounds(self):
+        """The text's rectangle at the label's position"""
+        text, color = self.drawn_state
+        if not text:
+            return None
+        return render_text(self.font, text, color).get_rect(**self.position)
+
+    def draw(self, surface):
+        """
+        Draw the text on the given surface.
+        """
+        text, color = self.drawn_state
+        if text:
+            text_surface = render_text(self.font, text, color)
+            surface.blit(text_surface, text_surface.get_rect(**self.position))
+
+
+#-- Panel Class
+class Panel(Widget):
+    """
+    A widget drawn by a function, e.g. a part of the game that isn't a simple text or button.
+
+           Arguments:
+            rect (pygame.Rect): Area the function draws in
+            draw_function (function): Called with the surface to draw the panel
+            state_function (function): Returns what the drawing depends on, the panel
+                                       is redrawn when the returned value changes
+    """
+    def __init__(self, rect, draw_function, state_function):
+        super().__init__(rect)
+        self.draw_function = draw_function
+        self.state_function = state_function
+
+    def get_state(self):
+        """The state given by the panel's state function"""
+        return self.state_function()
+
+    def draw(self, surface):
+        """
+        Draw the panel on the given surface.
+        """
+        self.draw_function(surface)
+
+
 #-- Button Class
-class Button:
+class Button(Widget):
     """
     Create a button with a given rectangle, text and color.
 
@@ -11,22 +237,35 @@ class Button:
             rect (pygame.Rect): Position and size of button
             text (str): Text to display on button
             color (tuple): RGB color tuple for the button
+            font: Pygame font for the text when the button is drawn by a UILayer
     """
-    def __init__(self, rect, text, color):
-        self.rect = rect
+    def __init__(self, rect, text, color, font=None):
+        super().__init__(rect)
         self.text = text
         self.color = color
+        self.font = font
         self.hover = False
         self.selected = False
 
-    def draw(self, surface, font):
+    def get_state(self):
+        """The button looks different when hovered or selected"""
+        return (self.text, self.color, self.hover, self.selected)
+
+    def get_bounds(self):
+        """The button including its selection highlight"""
+        return self.rect.inflate(10, 10)
+
+    def draw(self, surface, font=None):
         """
         Draw the button on the given surface.
 
         Args:
             surface: Pygame surface to draw on
-            font: Pygame font to use for text
+            font: Pygame font to use for text (default: the button's font)
         """
+        if font is None:
+            font = self.font
+
         # Draw Button BG
         if self.hover:
             # Brighten color when hovered
@@ -46,7 +285,7 @@ class Button:
             pygame.draw.rect(surface, WHITE, self.rect.inflate(10, 10), 3)
 
         # Draw Button text
-        text_surface = font.render(self.text, True, WHITE)
+        text_surface = render_text(font, self.text, WHITE)
         text_rect = text_surface.get_rect(center=self.rect.center)
         surface.blit(text_surface, text_rect)
 
@@ -63,4 +302,152 @@ class Button:
         return self.rect.collidepoint(pos)
 
 
+#-- HitIndex Class
+class HitIndex:
+    """
+    Finds what is under a screen position without testing every area.
+
+    The screen is split into a uniform grid of buckets, allocated once for the screen size.
+    Every bucket lists the areas overlapping it, so a lookup only tests the few areas of one
+    bucket, no matter how many buttons there are.
+
+           Arguments:
+            size (tuple): Width and height of the screen
+            bucket_size (int): Width and height of a bucket in pixels
+    """
+    def __init__(self, size, bucket_size=50):
+        self.bucket_size = bucket_size
+        self.columns = -(-size[0] // bucket_size)
+        self.rows = -(-size[1] // bucket_size)
+        self.buckets = [[] for _ in range(self.columns * self.rows)] # Row by row, (rect, target) pairs
+        self.hovered = None # Target found by the last hover()
+
+    def add(self, rect, target):
+        """
+        Register an area and what it stands for (returned by find()), on top of the existing areas.
+        """
+        rect = pygame.Rect(rect)
+        first_column, last_column = max(0, rect.left // self.bucket_size), min(self.columns - 1, (rect.right - 1) // self.bucket_size)
+        first_row, last_row = max(0, rect.top // self.bucket_size), min(self.rows - 1, (rect.bottom - 1) // self.bucket_size)
+
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                self.buckets[row * self.columns + column].append((rect, target))
+
+    def find(self, pos):
+        """
+        Get the target of the topmost area containing the position, or None
+        (also for positions outside the screen).
+        """
+        column, row = pos[0] // self.bucket_size, pos[1] // self.bucket_size
+        if not (0 <= column < self.columns and 0 <= row < self.rows):
+            return None
+
+        for rect, target in reversed(self.buckets[row * self.columns + column]):
+            if rect.collidepoint(pos):
+                return target
+        return None
+
+    def hover(self, pos):
+        """
+        Find the target under the mouse position and remember it as the hovered one.
+        """
+        self.hovered = self.find(pos)
+        return self.hovered
+
+
+#-- UILayer Class
+class UILayer:
+    """
+    Retained-mode screen: static elements are drawn once into a background surface,
+    widgets are only redrawn when their state changed, and only the changed areas
+    have to be sent to the display.
+
+           Arguments:
+            size (tuple): Width and height of the screen
+            background_color (tuple): RGB color tuple of the background
+    """
+    def __init__(self, size, background_color):
+        self.background = pygame.Surface(size)
+        self.background.fill(background_color)
+        self.widgets = [] # Drawn in this order, later widgets are on top
+        self.full_redraw = True
+
+    def add_static(self, draw_function):
+        """
+        Draw something that never changes (e.g. a title) into the background.
+
+        Args:
+            draw_function (function): Called once with the background surface
+        """
+        draw_function(self.background)
+        self.full_redraw = True
+
+    def add(self, widget):
+        """
+        Add a widget on top of the existing ones.
+        Returns the widget.
+        """
+        self.widgets.append(widget)
+        return widget
 
+    def invalidate(self):
+        """
+        Redraw the whole screen on the next render() (e.g. after another screen was shown).
+        """
+        self.full_redraw = True
+
+    def render(self, surface):
+        """
+        Bring the surface up to date.
+
+        Returns:
+            list: Rectangles of the surface that changed (for pygame.display.update())
+        """
+        for widget in self.widgets:
+            widget.update()
+
+        if self.full_redraw:
+            self.full_redraw = False
+            surface.blit(self.background, (0, 0))
+            for widget in self.widgets:
+                self.draw_widget(surface, widget)
+            return [surface.get_rect()]
+
+        # Areas to restore: where the dirty widgets were and where they will be
+        redraw = [widget.dirty for widget in self.widgets]
+        areas = []
+        for widget in self.widgets:
+            if widget.dirty:
+                areas.extend(area for area in (widget.drawn_rect, widget.get_bounds()) if area is not None)
+
+        if not areas:
+            return []
+
+        # Widgets overlapping a restored area would be partly erased, so they are restored
+        # and drawn again as a whole, which can in turn uncover more widgets
+        changed = True
+        while changed:
+            changed = False
+            for index, widget in enumerate(self.widgets):
+                if not redraw[index] and widget.drawn_rect is not None and widget.drawn_rect.collidelist(areas) != -1:
+                    redraw[index] = True
+                    areas.append(widget.drawn_rect)
+                    changed = True
+
+        for area in areas:
+            surface.blit(self.background, area, area)
+
+        for index, widget in enumerate(self.widgets):
+            if redraw[index]:
+                self.draw_widget(surface, widget)
+
+        return areas
+
+    def draw_widget(self, surface, widget):
+        """
+        Draw a widget and remember the area it covered.
+        """
+        widget.draw(surface)
+        widget.drawn_rect = widget.get_bounds()
+        widget.dirty = False
@@ -0,0 +1,267 @@
+"""
+A camera on the board: zoom, pan and drawing of the visible cells only.
+
+Boards can be far larger than the window. The viewport shows a part of the board at one of
+the ZOOM_LEVELS and draws it with a level of detail that depends on the zoom:
+
+    zoom >= GRID_LINE_ZOOM   cells with grid lines, like Grid.draw()
+    1 <= zoom                one pixel per cell, scaled up, without grid lines
+    zoom < 1                 blocks of cells aggregated into one pixel (the state most cells
+                             of the block have), read from an OwnershipPyramid if there is one,
+                             so the cost depends on the window and not on the board
+"""
+import numpy as np
+import pygame
+
+# Pixels per cell. Levels below 1 draw a block of 1 / zoom x 1 / zoom cells as one pixel.
+ZOOM_LEVELS = [1 / 16, 1 / 8, 1 / 4, 1 / 2, 1, 2, 3, 4, 6, 8, 12, 16, 20, 24, 32, 48]
+
+# Grid lines are only drawn when cells are at least this many pixels wide
+GRID_LINE_ZOOM = 6
+
+
+class Viewport:
+    """
+    The part of the board shown in a rectangle of the screen.
+
+    The position is kept in board pixels at the current zoom (scroll_x, scroll_y is the board
+    pixel in the top left corner), so panning is smooth and cells always start on whole pixels.
+
+           Arguments:
+            rect (pygame.Rect): Area of the screen the board is drawn in
+            board_width (int): Width of the board in cells
+            board_height (int): Height of the board in cells
+            zoom (float): Initial zoom (pixels per cell), the closest of the ZOOM_LEVELS is used
+    """
+    def __init__(self, rect, board_width, board_height, zoom=20):
+        self.rect = pygame.Rect(rect)
+        self.board_width = board_width
+        self.board_height = board_height
+
+        self.zoom_index = min(range(len(ZOOM_LEVELS)), key=lambda index: abs(ZOOM_LEVELS[index] - zoom))
+        self.scroll_x = 0
+        self.scroll_y = 0
+        self.clamp()
+
+    @property
+    def zoom(self):
+        """Pixels per cell"""
+        return ZOOM_LEVELS[self.zoom_index]
+
+    def get_state(self):
+        """
+        Get everything the drawn view depends on (for redrawing only when it changed).
+        """
+        return (self.zoom_index, self.scroll_x, self.scroll_y)
+
+    def get_board_size(self):
+        """
+        Get the size of the whole board in pixels at the current zoom.
+        """
+        return (int(np.ceil(self.board_width * self.zoom)), int(np.ceil(self.board_height * self.zoom)))
+
+    def clamp(self):
+        """
+        Keep the board in view: a board smaller than the viewport is centered,
+        a larger one can't be scrolled past its edges.
+        """
+        board_pixel_width, board_pixel_height = self.get_board_size()
+
+        if board_pixel_width <= self.rect.width:
+            self.scroll_x = -((self.rect.width - board_pixel_width) // 2)
+        else:
+            self.scroll_x = min(max(0, self.scroll_x), board_pixel_width - self.rect.width)
+
+        if board_pixel_height <= self.rect.height:
+            self.scroll_y = -((self.rect.height - board_pixel_height) // 2)
+        else:
+            self.scroll_y = min(max(0, self.scroll_y), board_pixel_height - self.rect.height)
+
+    def pan(self, dx, dy):
+        """
+        Move the view by a number of screen pixels (e.g. the mouse movement while dragging the board).
+        """
+        self.scroll_x -= int(dx)
+        self.scroll_y -= int(dy)
+        self.clamp()
+
+    def set_zoom(self, zoom_index, anchor=None):
+        """
+        Change to another of the ZOOM_LEVELS.
+        The board point under the anchor (a screen position, default: the center) stays in place.
+        """
+        zoom_index = min(max(0, zoom_index), len(ZOOM_LEVELS) - 1)
+        if zoom_index == self.zoom_index:
+            return
+
+        if anchor is None:
+            anchor = self.rect.center
+
+        # Board position under the anchor in cells
+        anchor_x, anchor_y = anchor[0] - self.rect.x, anchor[1] - self.rect.y
+        cell_x = (self.scroll_x + anchor_x) / self.zoom
+        cell_y = (self.scroll_y + anchor_y) / self.zoom
+
+        self.zoom_index = zoom_index
+        self.scroll_x = int(round(cell_x * self.zoom - anchor_x))
+        self.scroll_y = int(round(cell_y * self.zoom - anchor_y))
+        self.clamp()
+
+    def zoom_in(self, anchor=None):
+        """Zoom in by one level around the anchor (see set_zoom())"""
+        self.set_zoom(self.zoom_index + 1, anchor)
+
+    def zoom_out(self, anchor=None):
+        """Zoom out by one level around the anchor (see set_zoom())"""
+        self.set_zoom(self.zoom_index - 1, anchor)
+
+    def fit_board(self):
+        """
+        Zoom to the largest level that shows the whole board.
+        """
+        fitting = [index for index, zoom in enumerate(ZOOM_LEVELS)
+                   if self.board_width * zoom <= self.rect.width and self.board_height * zoom <= self.rect.height]
+        self.zoom_index = fitting[-1] if fitting else 0
+        self.clamp()
+
+    def center_on(self, x, y):
+        """
+        Scroll the view so that a board position (in cells) is in its center.
+        """
+        self.scroll_x = int(x * self.zoom) - self.rect.width // 2
+        self.scroll_y = int(y * self.zoom) - self.rect.height // 2
+        self.clamp()
+
+    def screen_to_cell(self, pos):
+        """
+        Get the cell under a screen position, or None if there is no cell of the board.
+        """
+        if not self.rect.collidepoint(pos):
+            return None
+
+        cell_x = int((self.scroll_x + pos[0] - self.rect.x) // self.zoom)
+        cell_y = int((self.scroll_y + pos[1] - self.rect.y) // self.zoom)
+        if 0 <= cell_x < self.board_width and 0 <= cell_y < self.board_height:
+            return cell_x, cell_y
+        return None
+
+    def get_cell_rect(self, x, y):
+        """
+        Get the screen rectangle of a cell (at least one pixel, even when zoomed out).
+        """
+        size = max(1, int(self.zoom))
+        return pygame.Rect(self.rect.x + int(x * self.zoom) - self.scroll_x,
+                           self.rect.y + int(y * self.zoom) - self.scroll_y, size, size)
+
+    def get_visible_cells(self):
+        """
+        Get the rectangle of cells that are at least partly visible as x0, y0, x1, y1 (x1 and y1 exclusive).
+        When zoomed out, the rectangle is extended to whole blocks of aggregated cells.
+        """
+        block = self.get_block_size()
+        x0 = max(0, int(self.scroll_x // self.zoom) // block * block)
+        y0 = max(0, int(self.scroll_y // self.zoom) // block * block)
+        x1 = min(self.board_width, int(np.ceil((self.scroll_x + self.rect.width) / self.zoom)))
+        y1 = min(self.board_height, int(np.ceil((self.scroll_y + self.rect.height) / self.zoom)))
+        return x0, y0, max(x0, x1), max(y0, y1)
+
+    def get_block_size(self):
+        """
+        Get how many cells (in each direction) are aggregated into one pixel.
+        """
+        return max(1, int(round(1 / self.zoom)))
+
+    def draw(self, surface, grid, linecolor, pyramid=None):
+        """
+        Draw the visible part of a grid into the viewport's rectangle of the surface.
+        When zoomed out, the blocks are taken from the grid's OwnershipPyramid if one is given,
+        otherwise they are aggregated from the visible cells.
+        """
+        x0, y0, x1, y1 = self.get_visible_cells()
+        previous_clip = surface.get_clip()
+        surface.set_clip(self.rect)
+        surface.fill(linecolor, self.rect)
+
+        if x1 > x0 and y1 > y0:
+            # Cell states of the visible rectangle, one pixel per cell (or per block)
+            block = self.get_block_size()
+            if block > 1 and pyramid is not None:
+                # Block sizes are powers of two, like the pyramid's levels
+                states = pyramid.get_owners(block.bit_length() - 1, x0 // block, y0 // block, -(-x1 // block), -(-y1 // block))
+            else:
+                states = np.frombuffer(grid.get_region(x0, y0, x1, y1), dtype=np.uint8).reshape(y1 - y0, x1 - x0)
+                if block > 1:
+                    states = aggregate_blocks(states, block, sorted(grid.colors))
+
+            # Color every pixel with a palette lookup and scale the image to the zoom
+            palette = get_palette(grid.colors)
+            image = pygame.surfarray.make_surface(palette[states].transpose(1, 0, 2))
+            if self.zoom > 1:
+                image = pygame.transform.scale(image, (image.get_width() * int(self.zoom), image.get_height() * int(self.zoom)))
+
+            left = self.rect.x + int(x0 * self.zoom) - self.scroll_x
+            top = self.rect.y + int(y0 * self.zoom) - self.scroll_y
+            surface.blit(image, (left, top))
+
+            if self.zoom >= GRID_LINE_ZOOM:
+                self.draw_grid_lines(surface, x0, y0, x1, y1, left, top, linecolor)
+
+        surface.set_clip(previous_clip)
+
+    def draw_grid_lines(self, surface, x0, y0, x1, y1, left, top, linecolor):
+        """
+        Draw the outline of every visible cell like Grid.draw() does (a one pixel border
+        inside each cell), as one line per row and column border instead of one rectangle per cell.
+        """
+        zoom = int(self.zoom)
+        right = left + (x1 - x0) * zoom - 1
+        bottom = top + (y1 - y0) * zoom - 1
+
+        for column in range(x1 - x0):
+            x = left + column * zoom
+            pygame.draw.line(surface, linecolor, (x, top), (x, bottom))
+            pygame.draw.line(surface, linecolor, (x + zoom - 1, top), (x + zoom - 1, bottom))
+
+        for row in range(y1 - y0):
+            y = top + row * zoom
+            pygame.draw.line(surface, linecolor, (left, y), (right, y))
+            pygame.draw.line(surface, linecolor, (left, y + zoom - 1), (right, y + zoom - 1))
+
+
+def aggregate_blocks(states, block, candidates):
+    """
+    Downsample a 2-D array of cell states: every block x block square becomes the one
+    of the candidate states most of its cells have (squares at the edges may be smaller).
+    """
+    height, width = states.shape
+    padded_height = -(-height // block) * block
+    padded_width = -(-width // block) * block
+
+    # Cells outside the board are marked 255, so they count for no state
+    if (padded_height, padded_width) != (height, width):
+        padded = np.full((padded_height, padded_width), 255, dtype=np.uint8)
+        padded[:height, :width] = states
+        states = padded
+
+    # Cells per state and block, summed along the rows first (contiguous in memory, which is much faster)
+    counts = [(states == state).view(np.uint8)
+              .reshape(padded_height, padded_width // block, block).sum(axis=2, dtype=np.uint16)
+              .reshape(padded_height // block, block, padded_width // block).sum(axis=1, dtype=np.uint16)
+              for state in candidates[1:]]
+
+    # The first candidate (usually neutral) has all cells of the board the others don't have
+    rows = np.minimum(block, height - np.arange(padded_height // block) * block)
+    columns = np.minimum(block, width - np.arange(padded_width // block) * block)
+    counts.insert(0, np.outer(rows, columns).astype(np.uint16) - sum(counts))
+
+    return np.asarray(candidates, dtype=np.uint8)[np.argmax(np.stack(counts), axis=0)]
+
+
+def get_palette(colors):
+    """
+    Get a lookup table (256 x 3) from cell state to RGB color.
+    """
+    palette = np.zeros((256, 3), dtype=np.uint8)
+    for state, color in colors.items():
+        palette[state] = color[:3]
+    return palette
@@ -0,0 +1,4 @@
+import os, sys
+
+# The game's modules import each other by name, like main.py run from the code folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "code"))
@@ -0,0 +1,23 @@
+from importlib import metadata
+import pytest
+import action_registry
+from action_registry import ActionRegistry, ENTRY_POINT_GROUP, get_registry
+
+
+def test_registry_is_created_on_first_use(monkeypatch):
+    monkeypatch.setattr(action_registry, "default_registry", None)
+    registry = get_registry()
+    assert registry.loadout and set(registry.loadout) <= set(registry.get_names())
+    assert get_registry() is registry
+
+
+def test_broken_entry_point_warns(monkeypatch):
+    entry_points = metadata.EntryPoints([
+        metadata.EntryPoint("Good Pattern", "my_patterns:GoodPattern", ENTRY_POINT_GROUP),
+        metadata.EntryPoint("x" * 300, "my_patterns:LongName", ENTRY_POINT_GROUP)])
+    monkeypatch.setattr(metadata, "entry_points", lambda: entry_points)
+
+    registry = ActionRegistry()
+    with pytest.warns(UserWarning, match="LongName"):
+        registry.load_entry_points()
+    assert registry.get_names() == ["Good Pattern"]
@@ -0,0 +1,44 @@
+import time
+from ai_player import AIPlayer, simulate_candidate, simulate_pool_task
+from game_manager import GameManager
+
+
+def create_game():
+    game_manager = GameManager(80, 60, 5)
+    game_manager.initialize_players("Player 1", "Computer")
+    for x in range(10, 40):
+        game_manager.grid.set_cell(x, 30, 2)
+        game_manager.grid.set_cell(x, 31, 1)
+    return game_manager
+
+
+def test_pool_simulates_the_shared_board():
+    game_manager = create_game()
+    grid = game_manager.grid
+    ai = AIPlayer(game_manager.players[1], use_process_pool=True, workers=2)
+    try:
+        for move in range(2):
+            ai.prepare_pool(grid)
+            for action in ai.player.actions:
+                future = ai.process_pool.submit(simulate_pool_task, ai.pool_move, action, 2, 20, 32, 4, 3)
+                assert future.result() == simulate_candidate(grid, action, 2, 20, 32, 4, first_seed=3)
+
+            # The next move sees the changed board
+            for x in range(15, 25):
+                grid.set_cell(x, 32, 2)
+    finally:
+        ai.close()
+
+
+def test_pool_keeps_the_deadline():
+    game_manager = create_game()
+    ai = AIPlayer(game_manager.players[1], time_budget=0.3, use_process_pool=True, workers=2, seed=0)
+    try:
+        ai.prepare_pool(game_manager.grid) # Starting the pool isn't part of the time budget
+
+        start = time.perf_counter()
+        move = ai.choose_move(game_manager.grid)
+        assert time.perf_counter() - start < 0.3 + 0.2
+        assert move is not None and move[0] in ai.player.actions
+    finally:
+        ai.close()
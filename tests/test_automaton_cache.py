@@ -0,0 +1,73 @@
+from action_registry import get_registry
+from automaton_cache import AutomatonCache
+from grid import Grid
+
+
+def create_automaton(grid, name, seed=None):
+    return get_registry().create_action(name).create_automaton(grid, 1, seed=seed)
+
+
+def run_directly(grid, name, x, y, seed=None):
+    automaton = create_automaton(grid, name, seed)
+    return automaton.set_starting_cell(x, y) + automaton.run()
+
+
+def test_cached_result_equals_direct_run():
+    grid = Grid(60, 60, 5)
+    grid.set_cell(32, 30, 2)
+    cache = AutomatonCache()
+
+    for name in ("Diamond Bomb", "Snake Attack", "Root Growth", "Hydra"):
+        for seed in (1, 2):
+            expected = run_directly(grid, name, 30, 30, seed)
+            assert cache.run(create_automaton(grid, name, seed), 30, 30) == expected
+            assert cache.run(create_automaton(grid, name, seed), 30, 30) == expected
+    # Diamond Bomb is deterministic, its second seed reuses the first result
+    assert cache.get_stats()["hits"] == 9
+
+
+def test_key_depends_on_cells_in_reach_only():
+    grid = Grid(100, 100, 5)
+    cache = AutomatonCache()
+    automaton = create_automaton(grid, "Diamond Bomb")
+    key = cache.make_key(automaton, 20, 20)
+
+    # Far away: same key, nearby: different key
+    grid.set_cell(90, 90, 2)
+    assert cache.make_key(create_automaton(grid, "Diamond Bomb"), 20, 20) == key
+    grid.set_cell(21, 20, 2)
+    assert cache.make_key(create_automaton(grid, "Diamond Bomb"), 20, 20) != key
+
+
+def test_seeds_and_parameters_are_part_of_the_key():
+    grid = Grid(40, 40, 5)
+    cache = AutomatonCache()
+
+    # Random patterns: only seeded runs are cached, and per seed
+    assert cache.make_key(create_automaton(grid, "Root Growth"), 5, 5) is None
+    assert cache.make_key(create_automaton(grid, "Root Growth", 1), 5, 5) != cache.make_key(create_automaton(grid, "Root Growth", 2), 5, 5)
+
+    # Deterministic patterns ignore the seed
+    assert cache.make_key(create_automaton(grid, "Diamond Bomb", 1), 5, 5) == cache.make_key(create_automaton(grid, "Diamond Bomb", 2), 5, 5)
+
+    automaton = create_automaton(grid, "Diamond Bomb")
+    key = cache.make_key(automaton, 5, 5)
+    automaton.generations += 1
+    assert cache.make_key(automaton, 5, 5) != key
+
+
+def test_cached_results_cant_be_modified():
+    grid = Grid(40, 40, 5)
+    cache = AutomatonCache()
+    first = cache.run(create_automaton(grid, "Diamond Bomb"), 10, 10)
+    first[0][2] = 99
+    assert cache.run(create_automaton(grid, "Diamond Bomb"), 10, 10)[0][2] == 1
+
+
+def test_least_recently_used_results_are_evicted():
+    grid = Grid(40, 40, 5)
+    cache = AutomatonCache(max_size=2)
+    for x in (5, 10, 15):
+        cache.run(create_automaton(grid, "Diamond Bomb"), x, 5)
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.get_stats()["size"] == 2
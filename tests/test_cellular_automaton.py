@@ -0,0 +1,52 @@
+import random
+import numpy as np
+import pytest
+import automaton_kernels
+from cellular_automaton import MultiHeadSnake
+from grid import Grid
+
+
+def create_board():
+    """A board with enemy walls the snakes have to get around."""
+    grid = Grid(40, 30, 5)
+    for y in range(5, 25):
+        grid.set_cell(14, y, 2)
+        grid.set_cell(26, y, 2)
+    return grid
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_seeded_run_equals_single_run_batch(monkeypatch, seed):
+    # Seeded runs use the vectorized engine (the kernels draw other random numbers)
+    monkeypatch.setattr(automaton_kernels, "enabled", False)
+    grid = create_board()
+
+    automaton = MultiHeadSnake(grid, 1, overwrite_enemy=False, seed=seed)
+    changes = automaton.set_starting_cell(20, 15) + automaton.run()
+
+    # run() seeds the engine with the first number of the automaton's generator
+    engine_seed = random.Random(seed).getrandbits(64)
+    batch = MultiHeadSnake(grid, 1, overwrite_enemy=False).run_batch(20, 15, 1, seed=engine_seed, collect_changes=True)
+    assert batch["changes"][0] == changes
+    assert batch["conquered"][0] == len(changes)
+
+
+@pytest.mark.parametrize("size, heads, generations", [(7, 3, 8), (9, 4, 10), (5, 5, 6)])
+def test_kernel_moves_heads_together(size, heads, generations):
+    # On a crowded board heads often want the same cell: the kernel has to follow the
+    # engine's rules (all heads move at once, the first one wins) to give the same outcomes
+    grid = Grid(size, size, 5)
+    automaton = MultiHeadSnake(grid, 1, generations=generations)
+    automaton.heads = heads
+    center = size // 2
+    count = 5000
+
+    engine = automaton.run_snakes(center, center, count, heads, np.random.default_rng(0))["conquered"] - 1
+
+    window, x0, y0 = automaton.get_batch_window(center, center)
+    moves_x, moves_y, lengths = automaton_kernels.walk_snakes(
+        window, center - x0, center - y0, count, heads, generations, automaton.random_turn_chance,
+        1, grid.NEUTRAL, True, True, 1)
+
+    assert abs(lengths.mean() - engine.mean()) < 0.3
+    assert lengths.max() <= size * size - 1
@@ -0,0 +1,153 @@
+import random
+import pytest
+from grid import Grid, TiledGrid, zobrist_key, zobrist_hash
+
+
+def fill_randomly(grid, count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        grid.set_cell(rng.randrange(grid.width), rng.randrange(grid.height), rng.choice([0, 1, 2, 2]))
+
+
+@pytest.fixture(params=[Grid, TiledGrid])
+def grid(request):
+    if request.param is TiledGrid:
+        return TiledGrid(90, 70, 5, chunk_size=16)
+    return Grid(90, 70, 5)
+
+
+def test_set_and_get_cell(grid):
+    grid.set_cell(3, 4, 1)
+    assert grid.get_cell(3, 4) == 1
+    assert grid.count_cells(1) == 1
+
+    # Cells outside the board are ignored
+    grid.set_cell(-1, 0, 1)
+    grid.set_cell(grid.width, 0, 1)
+    assert grid.count_cells(1) == 1
+
+
+def test_bytes_round_trip(grid):
+    fill_randomly(grid, 2000)
+    copy = grid.copy()
+    copy.load_bytes(bytes(grid.width * grid.height))
+    assert copy.count_cells(2) == 0
+    copy.load_bytes(grid.to_bytes())
+
+    assert copy.to_bytes() == grid.to_bytes()
+    assert copy.diff(grid) == []
+    assert copy.count_cells(2) == grid.count_cells(2)
+
+
+def test_zobrist_keys_match_vectorized_version():
+    import numpy as np
+
+    indices = np.array([0, 7, 123456, 2 ** 40])
+    states = np.array([1, 2, 3, 255])
+    expected = 0
+    for index, state in zip(indices.tolist(), states.tolist()):
+        expected ^= zobrist_key(index, state)
+    assert zobrist_hash(indices, states) == expected
+
+
+def test_incremental_hash_equals_recalculation(grid):
+    assert grid.get_hash() == 0
+    fill_randomly(grid, 3000)
+    assert grid.get_hash() == grid.calculate_hash()
+
+    # Reloaded and copied boards keep the same hash
+    copy = grid.copy()
+    assert copy.get_hash() == grid.get_hash()
+    grid.load_bytes(grid.to_bytes())
+    assert grid.get_hash() == copy.get_hash()
+
+
+def test_hash_after_changes(grid):
+    fill_randomly(grid, 500)
+    rng = random.Random(1)
+    changes = [[rng.randrange(grid.width), rng.randrange(grid.height), rng.choice([0, 1, 2])] for _ in range(300)]
+    changes.append([-1, 0, 1])
+
+    expected = grid.get_hash_after(changes)
+    for x, y, state in changes:
+        grid.set_cell(x, y, state)
+    assert grid.get_hash() == expected == grid.calculate_hash()
+
+
+def test_same_board_same_hash_in_both_grid_classes():
+    grid = Grid(90, 70, 5)
+    tiled_grid = TiledGrid(90, 70, 5, chunk_size=16)
+    fill_randomly(grid, 2000, seed=3)
+    fill_randomly(tiled_grid, 2000, seed=3)
+    assert grid.get_hash() == tiled_grid.get_hash()
+
+
+def test_snapshot_round_trip(grid, tmp_path):
+    fill_randomly(grid, 1500)
+    grid.colors[2] = (1, 2, 3)
+    path = str(tmp_path / "board.cwg")
+    grid.save(path)
+
+    loaded = type(grid).load(path, 5)
+    assert type(loaded) is type(grid)
+    assert (loaded.width, loaded.height) == (grid.width, grid.height)
+    assert loaded.to_bytes() == grid.to_bytes()
+    assert loaded.colors[2] == (1, 2, 3)
+    assert loaded.count_cells(1) == grid.count_cells(1)
+    assert loaded.get_hash() == grid.get_hash()
+    assert loaded.find_nearest_cell(0, 0, 1) == grid.find_nearest_cell(0, 0, 1)
+
+    # Changes go to the loaded board, not to the file
+    loaded.set_cell(0, 0, 1 if loaded.get_cell(0, 0) != 1 else 2)
+    assert type(grid).load(path, 5).to_bytes() == grid.to_bytes()
+
+
+def test_snapshots_load_into_either_grid_class(tmp_path):
+    grid = Grid(70, 50, 5)
+    fill_randomly(grid, 800)
+    path = str(tmp_path / "board.cwg")
+    grid.save(path)
+
+    tiled_grid = TiledGrid.load(path, 5, chunk_size=16)
+    assert tiled_grid.to_bytes() == grid.to_bytes()
+    assert tiled_grid.get_hash() == grid.get_hash()
+
+    # Neutral areas aren't allocated
+    tiled_grid.save(path)
+    assert len(TiledGrid.load(path, 5, chunk_size=16).chunks) == len(tiled_grid.chunks)
+    assert Grid.load(path, 5).to_bytes() == grid.to_bytes()
+
+
+def test_broken_snapshots_are_rejected(tmp_path):
+    path = tmp_path / "board.cwg"
+    Grid(10, 10, 5).save(str(path))
+    data = path.read_bytes()
+
+    path.write_bytes(data[:-1])
+    for grid_class in (Grid, TiledGrid):
+        with pytest.raises(ValueError):
+            grid_class.load(str(path), 5)
+
+    path.write_bytes(b"XXXX" + data[4:])
+    with pytest.raises(ValueError):
+        TiledGrid.load(str(path), 5)
+
+
+def brute_force_frontier(grid, player_id):
+    return {(x, y) for y in range(grid.height) for x in range(grid.width)
+            if grid.get_cell(x, y) == player_id and grid.is_frontier_cell(x, y)}
+
+
+def test_frontiers_follow_changes_and_reloads(grid):
+    fill_randomly(grid, 1500)
+    assert grid.get_frontier(2) == brute_force_frontier(grid, 2)
+
+    # Reloading only marks the frontiers outdated, they are rebuilt on first use
+    other = grid.copy()
+    fill_randomly(other, 500, seed=5)
+    grid.load_bytes(other.to_bytes())
+    assert grid.frontiers is None
+    fill_randomly(grid, 200, seed=6)
+    copy = grid.copy()
+    assert grid.get_frontier(1) == brute_force_frontier(grid, 1)
+    assert copy.get_frontier(2) == brute_force_frontier(grid, 2)
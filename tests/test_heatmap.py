@@ -0,0 +1,64 @@
+import time
+from action_registry import get_registry
+from grid import Grid
+from heatmap import Heatmap, HeatmapWorker
+
+
+def get_actions():
+    registry = get_registry()
+    return [registry.create_action(name) for name in registry.get_names()[:2]]
+
+
+def test_invalidate_resets_cells_in_reach():
+    grid = Grid(100, 80, 5)
+    heatmap = Heatmap(grid.copy(), get_actions()[0], 1, 1)
+    for y in range(80):
+        for x in range(100):
+            heatmap.add_sample(x, y, 0, 5)
+
+    heatmap.invalidate([(50, 40)])
+    reach = heatmap.reach
+    assert heatmap.get_value(50 + reach, 40 - reach) is None
+    assert heatmap.get_value(50 + reach + 1, 40) == 5
+    assert heatmap.get_value(50, 40 + reach + 1) == 5
+
+    # A sample of a simulation started before the change is thrown away
+    heatmap.add_sample(50, 40, 0, 5)
+    assert heatmap.get_value(50, 40) is None
+
+
+def wait_for(condition, timeout=10):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end
+        time.sleep(0.01)
+
+
+def test_worker_follows_the_board():
+    grid = Grid(40, 30, 5)
+    actions = get_actions()
+    worker = HeatmapWorker(samples=1)
+    try:
+        worker.update(grid, 1, actions, actions[0], (0, 0, 10, 10))
+        heatmap = worker.get_heatmap(1, actions[0])
+        wait_for(lambda: heatmap.is_complete((0, 0, 10, 10)))
+
+        # Changes reach the worker's board through the observer, without copying the board again
+        board = worker.board
+        for x in range(3, 8):
+            grid.set_cell(x, 4, 2)
+        worker.update(grid, 1, actions, actions[0], (0, 0, 10, 10))
+        wait_for(lambda: not worker.changes)
+        with worker.lock:
+            assert worker.board is board and not board.diff(grid)
+        assert worker.get_heatmap(1, actions[0]) is heatmap
+
+        # A reloaded board is copied again and the heatmaps start over
+        grid.load_bytes(bytes(40 * 30))
+        worker.update(grid, 1, actions, actions[0], (0, 0, 10, 10))
+        with worker.lock:
+            assert worker.board is not board and not worker.board.diff(grid)
+        assert worker.get_heatmap(1, actions[0]) is not heatmap
+    finally:
+        worker.stop()
+    assert not grid.observers
@@ -0,0 +1,80 @@
+import random
+import pytest
+from grid import Grid, TiledGrid
+from journal import ChangeJournal
+
+
+@pytest.fixture(params=[Grid, TiledGrid])
+def grid(request):
+    return request.param(30, 20, 5)
+
+
+def random_move(rng, grid):
+    return [[rng.randrange(grid.width), rng.randrange(grid.height), rng.choice([0, 1, 2])] for _ in range(rng.randrange(1, 20))]
+
+
+def test_undo_and_redo_round_trip(grid):
+    rng = random.Random(0)
+    journal = ChangeJournal(grid)
+    boards = [grid.to_bytes()]
+    for _ in range(15):
+        journal.apply(random_move(rng, grid))
+        boards.append(grid.to_bytes())
+
+    for board in reversed(boards[:-1]):
+        assert journal.undo()
+        assert grid.to_bytes() == board
+    assert not journal.undo()
+
+    for board in boards[1:]:
+        assert journal.redo()
+        assert grid.to_bytes() == board
+    assert not journal.redo()
+
+
+def test_new_move_drops_redo(grid):
+    journal = ChangeJournal(grid)
+    journal.apply([[0, 0, 1]])
+    journal.apply([[1, 0, 1]])
+    journal.undo()
+    assert journal.get_redo_count() == 1
+
+    journal.apply([[2, 0, 2]])
+    assert journal.get_redo_count() == 0
+    assert grid.get_cell(1, 0) == 0
+
+
+def test_checkpoint_restore(grid):
+    rng = random.Random(1)
+    journal = ChangeJournal(grid)
+    journal.apply(random_move(rng, grid))
+    checkpoint = journal.checkpoint()
+    board = grid.to_bytes()
+
+    # Changes made directly on the grid are recorded too
+    grid.set_cell(5, 5, 2)
+    journal.apply(random_move(rng, grid))
+    journal.restore(checkpoint)
+    assert grid.to_bytes() == board
+
+
+def test_stale_checkpoint_is_rejected(grid):
+    journal = ChangeJournal(grid)
+    journal.apply([[0, 0, 1]])
+    checkpoint = journal.checkpoint()
+    journal.undo()
+    journal.apply([[1, 1, 2]])
+    with pytest.raises(ValueError):
+        journal.restore(checkpoint)
+
+    checkpoint = journal.checkpoint()
+    grid.load_bytes(grid.to_bytes())
+    with pytest.raises(ValueError):
+        journal.restore(checkpoint)
+
+
+def test_closed_journal_stops_recording(grid):
+    journal = ChangeJournal(grid)
+    journal.close()
+    grid.set_cell(0, 0, 1)
+    assert journal.changes == []
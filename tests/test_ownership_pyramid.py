@@ -0,0 +1,59 @@
+import random
+import numpy as np
+import pytest
+from grid import Grid, TiledGrid
+from ownership_pyramid import OwnershipPyramid
+
+
+def brute_force_counts(grid, level, states):
+    """Count the cells of every state in every block of a level by looking at each cell."""
+    size = 1 << level
+    width, height = -(-grid.width // size), -(-grid.height // size)
+    counts = np.zeros((len(states), height, width), dtype=np.int64)
+    for y in range(grid.height):
+        for x in range(grid.width):
+            counts[states.index(grid.get_cell(x, y)), y // size, x // size] += 1
+    return counts
+
+
+@pytest.mark.parametrize("grid_class, width, height", [
+    (Grid, 20, 20), (Grid, 37, 29), (Grid, 130, 70), (TiledGrid, 150, 90), (TiledGrid, 1, 1)])
+def test_counts_equal_brute_force(grid_class, width, height):
+    rng = random.Random(0)
+    grid = grid_class(width, height, 5)
+    for _ in range(300):
+        grid.set_cell(rng.randrange(width), rng.randrange(height), rng.choice([0, 1, 2]))
+
+    pyramid = OwnershipPyramid(grid)
+    # Changes after building are followed incrementally
+    for _ in range(1500):
+        grid.set_cell(rng.randrange(width), rng.randrange(height), rng.choice([0, 0, 1, 2]))
+
+    states = [grid.NEUTRAL] + pyramid.states
+    for level in range(pyramid.get_level_count()):
+        level_width, level_height = pyramid.get_level_size(level)
+        counts = pyramid.get_region_counts(level, 0, 0, level_width, level_height)
+        assert np.array_equal(counts, brute_force_counts(grid, level, states)), level
+
+    # The last level is one block holding the whole board
+    assert pyramid.get_level_size(pyramid.get_level_count() - 1) == (1, 1)
+
+
+def test_region_of_a_level():
+    grid = TiledGrid(200, 100, 5, chunk_size=16)
+    grid.set_cell(130, 70, 1)
+    pyramid = OwnershipPyramid(grid)
+
+    counts = pyramid.get_region_counts(2, 30, 15, 40, 20)
+    assert counts.shape == (len(pyramid.states) + 1, 5, 10)
+    assert counts[1 + pyramid.states.index(1), 17 - 15, 32 - 30] == 1
+    assert pyramid.get_owners(0, 130, 70, 131, 71)[0, 0] == 1
+
+
+def test_reload_rebuilds():
+    grid = Grid(50, 50, 5)
+    pyramid = OwnershipPyramid(grid)
+    other = Grid(50, 50, 5)
+    other.set_cell(10, 10, 2)
+    grid.load_bytes(other.to_bytes())
+    assert pyramid.get_region_counts(pyramid.get_level_count() - 1, 0, 0, 1, 1)[1 + pyramid.states.index(2), 0, 0] == 1
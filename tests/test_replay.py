@@ -0,0 +1,71 @@
+import random
+import pytest
+from grid import Grid
+from replay import ReplayPlayer, ReplayRecorder
+
+
+@pytest.fixture
+def replay(tmp_path):
+    """A replay of 25 random moves and the board after every move."""
+    rng = random.Random(0)
+    grid = Grid(20, 15, 5)
+    path = str(tmp_path / "game.cwr")
+    boards = [grid.to_bytes()]
+
+    with ReplayRecorder(path, grid, keyframe_interval=4) as recorder:
+        for move in range(25):
+            changes = [[rng.randrange(20), rng.randrange(15), move % 2 + 1] for _ in range(rng.randrange(1, 10))]
+            recorder.record_move(move % 2 + 1, "Hydra", changes[0][0], changes[0][1], seed=move, changes=changes)
+            for x, y, state in changes:
+                grid.set_cell(x, y, state)
+            boards.append(grid.to_bytes())
+
+    return path, boards
+
+
+def test_moves_are_decoded(replay):
+    path, boards = replay
+    with ReplayPlayer(path) as player:
+        assert player.move_count == 25
+        move = player.get_move(3)
+        assert move["action_name"] == "Hydra"
+        assert move["seed"] == 3
+        assert move["player_id"] == 2
+
+
+def test_seek_to_keyframes_and_between(replay):
+    path, boards = replay
+    with ReplayPlayer(path) as player:
+        assert sorted(player.keyframes) == [0, 4, 8, 12, 16, 20, 24]
+        for move_index in (0, 4, 7, 8, 25, 24, 13, 12, 1, 11, 10):
+            assert player.seek(move_index).to_bytes() == boards[move_index]
+
+
+def test_scrubbing_matches_fresh_seeks(replay):
+    path, boards = replay
+    rng = random.Random(1)
+    with ReplayPlayer(path) as player:
+        for _ in range(60):
+            move_index = rng.randrange(26)
+            assert player.seek(move_index).to_bytes() == boards[move_index]
+
+
+def test_incomplete_last_record_is_ignored(replay, tmp_path):
+    path, boards = replay
+    with open(path, "rb") as file:
+        data = file.read()
+    truncated = str(tmp_path / "crashed.cwr")
+    with open(truncated, "wb") as file:
+        file.write(data[:-3])
+
+    with ReplayPlayer(truncated) as player:
+        assert player.move_count == 24
+        assert player.seek(24).to_bytes() == boards[24]
+
+
+def test_close_releases_the_file(replay):
+    path, boards = replay
+    player = ReplayPlayer(path)
+    player.seek(5)
+    player.close()
+    assert player.data is None
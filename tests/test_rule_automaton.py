@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from grid import Grid
+from rule_automaton import RuleAutomaton, compile_rule
+
+CROSS = {"neighborhood": [[0, -1, 1.0], [1, 0, 1.0], [0, 1, 1.0], [-1, 0, 1.0]]}
+RAGGED = {"neighborhood": [[0, -1, 0.9], [1, 0, 0.5], [0, 1, 0.9], [-1, 0, 0.5], [2, 2, 0.3]], "decay": 0.8}
+
+
+def test_rules_are_compiled_once():
+    assert compile_rule(CROSS) is compile_rule(CROSS)
+    assert compile_rule(dict(CROSS)) is compile_rule(CROSS)
+    assert compile_rule(dict(CROSS, generations=9)) is compile_rule(CROSS)
+
+
+@pytest.mark.parametrize("rule", [{}, {"neighborhood": [[0, 0, 1.0]]}, {"neighborhood": [[1, 0, 1.5]]},
+                                  {"neighborhood": [[1, 0, 0.5]], "decay": -1}])
+def test_invalid_rules(rule):
+    with pytest.raises(ValueError):
+        compile_rule(rule)
+
+
+def test_certain_rule_is_deterministic_diamond():
+    grid = Grid(30, 30, 5)
+    automaton = RuleAutomaton(grid, 1, generations=3, rule=CROSS)
+    assert automaton.deterministic
+    assert automaton.reach() == 3
+
+    changes = automaton.set_starting_cell(15, 15) + automaton.run()
+    cells = {(x, y) for x, y, state in changes}
+    assert cells == {(x, y) for x in range(30) for y in range(30) if abs(x - 15) + abs(y - 15) <= 3}
+    assert len(changes) == len(cells)
+
+
+def test_enemy_cells_are_respected():
+    grid = Grid(30, 30, 5)
+    grid.set_cell(16, 15, 2)
+    automaton = RuleAutomaton(grid, 1, generations=3, overwrite_enemy=False, rule=CROSS)
+    changes = automaton.set_starting_cell(15, 15) + automaton.run()
+    assert (16, 15) not in {(x, y) for x, y, state in changes}
+
+
+def test_seeded_runs_repeat():
+    grid = Grid(40, 40, 5)
+    results = []
+    for _ in range(2):
+        automaton = RuleAutomaton(grid, 1, generations=4, seed=7, rule=RAGGED)
+        results.append(automaton.set_starting_cell(20, 20) + automaton.run())
+    assert results[0] == results[1]
+
+
+def test_batch_counts_match_changes():
+    grid = Grid(40, 40, 5)
+    grid.set_cell(21, 20, 2)
+    automaton = RuleAutomaton(grid, 1, generations=4, overwrite_enemy=True, rule=RAGGED)
+    result = automaton.run_batch(20, 20, 50, seed=3, collect_changes=True)
+
+    for conquered, captured, changes in zip(result["conquered"], result["captured"], result["changes"]):
+        cells = {(x, y) for x, y, state in changes}
+        assert len(cells) == len(changes) == conquered
+        assert captured == ((21, 20) in cells)
+
+    again = automaton.run_batch(20, 20, 50, seed=3)
+    assert np.array_equal(again["conquered"], result["conquered"])
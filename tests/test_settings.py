@@ -0,0 +1,63 @@
+import copy
+import json
+import pytest
+import settings
+
+
+def load(tmp_path, content, argv=()):
+    path = tmp_path / "settings.json"
+    path.write_text(json.dumps(content))
+    return settings.load_settings(["--config", str(path), *argv])
+
+
+def test_defaults_without_file(monkeypatch):
+    monkeypatch.setattr(settings, "DEFAULT_FILES", [])
+    assert settings.load_settings([]) == settings.DEFAULT_SETTINGS
+
+
+def test_file_and_command_line_override(tmp_path):
+    loaded = load(tmp_path, {"board": {"width": 400}, "actions": {"generations": {"Hydra": 3}}},
+                  ["--width", "500", "--height", "60", "--generations", "Snake Attack=4", "--tiled"])
+    assert loaded["board"]["width"] == 500
+    assert loaded["board"]["height"] == 60
+    assert loaded["board"]["tiled"] is True
+    assert loaded["actions"]["generations"] == {"Hydra": 3, "Snake Attack": 4}
+
+
+def test_merge_rejects_unknown_and_mistyped_settings():
+    defaults = copy.deepcopy(settings.DEFAULT_SETTINGS)
+    for overrides in ({"board": {"depth": 3}},
+                      {"board": {"width": "wide"}},
+                      {"board": {"tiled": 1}},
+                      {"board": {"width": True}},
+                      {"board": 5},
+                      {"animation": {"step_delay": None}},
+                      {"actions": {"loadout": "Hydra"}},
+                      {"display": {"video_driver": 5}},
+                      {"actions": {"config": 5}}):
+        with pytest.raises(ValueError):
+            settings.merge(copy.deepcopy(defaults), overrides)
+
+
+def test_optional_settings_accept_none_and_their_type():
+    loaded = copy.deepcopy(settings.DEFAULT_SETTINGS)
+    settings.merge(loaded, {"display": {"video_driver": "dummy"}, "actions": {"loadout": ["Hydra"], "config": None}})
+    assert loaded["display"]["video_driver"] == "dummy"
+    assert loaded["actions"]["loadout"] == ["Hydra"]
+
+
+@pytest.mark.parametrize("content", [
+    {"animation": {"step_delay": None}},
+    {"actions": {"loadout": [1]}},
+    {"board": {"width": 0}},
+    {"network": {"port": 70000}},
+    {"actions": {"generations": {"Hydra": -1}}},
+])
+def test_invalid_settings_exit_with_usage_error(tmp_path, content):
+    with pytest.raises(SystemExit):
+        load(tmp_path, content)
+
+
+def test_bad_generations_option():
+    with pytest.raises(SystemExit):
+        settings.parse_arguments(settings.create_parser(), ["--generations", "Hydra"])
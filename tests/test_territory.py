@@ -0,0 +1,122 @@
+import random
+from collections import deque
+import pytest
+from grid import Grid, TiledGrid
+from territory import TerritoryAnalyzer
+
+
+def brute_force_stats(grid):
+    """Count regions, largest regions and enclosed pockets per player by flood filling the whole board."""
+    seen = set()
+    regions, largest, pockets = {}, {}, {}
+    for start_y in range(grid.height):
+        for start_x in range(grid.width):
+            if (start_x, start_y) in seen:
+                continue
+            state = grid.get_cell(start_x, start_y)
+            seen.add((start_x, start_y))
+            queue, size, touches_edge, neighbor_players = deque([(start_x, start_y)]), 0, False, set()
+            while queue:
+                x, y = queue.popleft()
+                size += 1
+                for neighbor_x, neighbor_y in ((x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y)):
+                    if not (0 <= neighbor_x < grid.width and 0 <= neighbor_y < grid.height):
+                        touches_edge = True
+                        continue
+                    neighbor_state = grid.get_cell(neighbor_x, neighbor_y)
+                    if neighbor_state != state:
+                        neighbor_players.add(neighbor_state)
+                    elif (neighbor_x, neighbor_y) not in seen:
+                        seen.add((neighbor_x, neighbor_y))
+                        queue.append((neighbor_x, neighbor_y))
+
+            if state != grid.NEUTRAL:
+                regions[state] = regions.get(state, 0) + 1
+                largest[state] = max(largest.get(state, 0), size)
+            elif not touches_edge and len(neighbor_players) == 1:
+                pockets.setdefault(neighbor_players.pop(), []).append(size)
+
+    return {player: {
+        "regions": regions.get(player, 0),
+        "largest_region": largest.get(player, 0),
+        "enclosed_pockets": len(pockets.get(player, [])),
+        "enclosed_cells": sum(pockets.get(player, []))
+    } for player in (1, 2)}
+
+
+def get_stats(territory):
+    return {player: territory.get_stats(player) for player in (1, 2)}
+
+
+@pytest.mark.parametrize("grid_class, width, height", [(Grid, 30, 20), (Grid, 150, 90), (TiledGrid, 150, 90)])
+def test_stats_follow_changes(grid_class, width, height):
+    rng = random.Random(0)
+    grid = grid_class(width, height, 5)
+    territory = TerritoryAnalyzer(grid)
+    assert get_stats(territory) == brute_force_stats(grid)
+
+    # Blobs and lines of both players, drawn over each other so regions merge, shrink and split
+    for move in range(40):
+        player = rng.choice([1, 2])
+        x, y = rng.randrange(width), rng.randrange(height)
+        territory.begin_changes()
+        for _ in range(rng.randrange(5, 60)):
+            old_state = grid.get_cell(x, y)
+            new_state = grid.NEUTRAL if rng.random() < 0.1 else player
+            grid.set_cell(x, y, new_state)
+            territory.cell_changed(x, y, old_state, new_state)
+            x = min(width - 1, max(0, x + rng.choice([-1, 0, 1])))
+            y = min(height - 1, max(0, y + rng.choice([-1, 0, 1])))
+
+            # Regions are up to date while the move is applied
+            expected = brute_force_stats(grid) if grid_class is Grid and width < 50 else None
+            if expected:
+                for player_id in (1, 2):
+                    stats = territory.get_stats(player_id)
+                    assert (stats["regions"], stats["largest_region"]) == \
+                           (expected[player_id]["regions"], expected[player_id]["largest_region"])
+        territory.end_changes()
+
+        assert get_stats(territory) == brute_force_stats(grid), move
+
+    # Starting from scratch gives the same result
+    assert get_stats(TerritoryAnalyzer(grid)) == get_stats(territory)
+
+
+def test_split_region():
+    grid = Grid(20, 10, 5)
+    for x in range(2, 15):
+        grid.set_cell(x, 5, 1)
+    territory = TerritoryAnalyzer(grid)
+    assert territory.get_stats(1)["regions"] == 1
+
+    # Cutting the line in two
+    grid.set_cell(6, 5, 2)
+    territory.cell_changed(6, 5, 1, 2)
+    assert (territory.get_stats(1)["regions"], territory.get_stats(1)["largest_region"]) == (2, 8)
+
+    # Joining the parts again
+    grid.set_cell(6, 5, 1)
+    territory.cell_changed(6, 5, 2, 1)
+    assert (territory.get_stats(1)["regions"], territory.get_stats(1)["largest_region"]) == (1, 13)
+
+
+def test_pockets_far_from_the_origin():
+    # Pockets are only searched around the claimed cells, the result must not depend on where they are
+    grid = TiledGrid(5000, 5000, 1, chunk_size=64)
+    for x, y in ((4000, 4000), (4950, 4950), (4994, 10)):
+        for offset in range(5):
+            for cell_x, cell_y in ((x + offset, y), (x + offset, y + 4), (x, y + offset), (x + 4, y + offset)):
+                grid.set_cell(cell_x, cell_y, 1)
+
+    territory = TerritoryAnalyzer(grid)
+    assert territory.get_stats(1)["enclosed_pockets"] == 3
+    assert territory.get_stats(1)["enclosed_cells"] == 27
+    assert (4001, 4001) in territory.get_pocket_cells(1)
+
+    # A square cut by the board edge isn't a pocket
+    for offset in range(5):
+        grid.set_cell(4995 + offset, 20, 2)
+        grid.set_cell(4995 + offset, 24, 2)
+        grid.set_cell(4995, 20 + offset, 2)
+    assert TerritoryAnalyzer(grid).get_stats(2)["enclosed_pockets"] == 0